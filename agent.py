@@ -5,10 +5,12 @@ import inspect
 import os
 import json
 import sys
+import threading
 import traceback
 from typing import Any, Optional, Dict, List
-from python.helpers import extract_tools, rate_limiter, files, errors
+from python.helpers import extract_tools, rate_limiter, files, errors, response_cache, tracing, memory_query, dreamteam, context_budget, model_router, resilient_stream, prompt_cache, output_reducer, artifacts, history
 from python.helpers.print_style import PrintStyle
+from python.helpers.execution_context import ExecutionContext
 from langchain.schema import AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -24,11 +26,32 @@ class AgentConfig:
     utility_model: BaseChatModel
     embeddings_model: Embeddings
     big_brain_model: Optional[BaseChatModel] = None
+    big_brain_context_tokens: int = 4000
+    model_routing: bool = False
+    routing_escalate_after: int = 2
+    routing_deescalate_after: int = 3
+    model_prices: dict[str, tuple[float, float]] = field(default_factory=dict)  # model id: (USD per 1M input, per 1M output tokens)
     dreamteam_model1: Optional[BaseChatModel] = None
     dreamteam_model2: Optional[BaseChatModel] = None
+    dreamteam_topology: str = "independent"
+    dreamteam_timeout_seconds: float = 120
+    dreamteam_timeouts: dict[str, float] = field(default_factory=dict)  # per member, members are named "Member 1", "Member 2", e.g. {"Member 1": 60}
+    dreamteam_quorum: int = 0
+    dreamteam_critique_rounds: int = 1
+    work_dir: str = field(default_factory=lambda: files.get_abs_path("work_dir"))
     memory_subdir: str = ""
     auto_memory_count: int = 3
     auto_memory_skip: int = 2
+    memory_search_mode: str = "hybrid"
+    memory_backend: str = "chroma"
+    memory_search_scope: str = "all"
+    memory_decay_half_life_days: float = 0
+    memory_query_max_chars: int = 2000
+    memory_query_multi: bool = True
+    memory_dedup_mode: str = "defer"  # skip, merge (utility model call on save), defer (merged in the background) or off
+    memory_dedup_threshold: float = 0.8
+    memory_consolidate_every: int = 50
+    memory_consolidate_threshold: float = 0.9
     rate_limit_seconds: int = 60
     rate_limit_requests: int = 15
     rate_limit_input_tokens: int = 1000000
@@ -37,7 +60,26 @@ class AgentConfig:
     msgs_keep_start: int = 5
     msgs_keep_end: int = 10
     response_timeout_seconds: int = 60
+    stream_first_token_timeout: float = 60
+    stream_chunk_timeout: float = 30
+    stream_max_retries: int = 2
+    stream_backoff_seconds: float = 1.0
+    chat_hedge_model: Optional[BaseChatModel] = None
+    hedge_latency_percentile: float = 0.95
+    hedge_min_samples: int = 20
     max_tool_response_length: int = 3000
+    tool_output_reducer: bool = True
+    tool_output_store: bool = True
+    tool_output_summary_threshold: int = 0
+    utility_cache_enabled: bool = True
+    utility_cache_persist: bool = False
+    utility_cache_max_entries: int = 512
+    utility_cache_ttl_seconds: int = 3600
+    knowledge_timeout_seconds: float = 30
+    knowledge_source_timeouts: dict[str, float] = field(default_factory=lambda: {"perplexity": 25, "duckduckgo": 10, "memory": 10})
+    knowledge_max_tokens: int = 1500
+    tracing_file: str = ""
+    tracing_otlp_endpoint: str = ""
     code_exec_docker_enabled: bool = True
     code_exec_docker_name: str = "agent-zero-exe"
     code_exec_docker_image: str = "frdel/agent-zero-exe:latest"
@@ -54,16 +96,26 @@ class Agent:
     paused = False
     streaming_agent = None
     
-    def __init__(self, number: int, config: AgentConfig):
+    def __init__(self, number: int, config: AgentConfig, context: Optional[ExecutionContext] = None):
         self.config = config       
         self.number = number
         self.agent_name = f"Agent {self.number}"
+        self.context = context or ExecutionContext(
+            work_dir=self.config.work_dir,
+            memory_subdir=self.config.memory_subdir,
+            logger=logging.getLogger(f"agent.{self.number}"))
         self.system_prompt = files.read_file("./prompts/agent.system.md").replace("{", "{{").replace("}", "}}")
         self.tools_prompt = files.read_file("./prompts/agent.tools.md").replace("{", "{{").replace("}", "}}")
-        self.history = []
+        self.history = history.History()
         self.last_message = ""
+        self.last_user_message = ""
+        self.task_summary = ""
         self.intervention_message = ""
         self.intervention_status = False
+        # only the agent the user talks to takes part in keyboard interventions, background members do not
+        self.interactive = True
+        # set to end a running message loop early, e.g. a DreamTeam member that ran out of time
+        self.stop_requested = threading.Event()
         self.rate_limiter = rate_limiter.RateLimiter(
             max_calls=self.config.rate_limit_requests,
             max_input_tokens=self.config.rate_limit_input_tokens,
@@ -73,8 +125,30 @@ class Agent:
         self.data = {}
         self.last_response_time = 0
         self.last_token_usage = 0
+        self.last_prompt_cache_usage: dict[str, int] = {}
+        self.prompt_cache_totals: dict[str, int] = {}
         self.memory_usage = 0
-        os.chdir(files.get_abs_path("./work_dir"))
+        self.chat_stream = resilient_stream.ResilientStream(
+            first_token_timeout=self.config.stream_first_token_timeout,
+            chunk_timeout=self.config.stream_chunk_timeout,
+            max_retries=self.config.stream_max_retries,
+            backoff=self.config.stream_backoff_seconds,
+            rate_limiter=self.rate_limiter,
+            hedge_percentile=self.config.hedge_latency_percentile,
+            hedge_min_samples=self.config.hedge_min_samples)
+        self.router = None
+        if self.config.model_routing and self.config.big_brain_model is not None:
+            self.router = model_router.ModelRouter(self.config.chat_model, self.config.big_brain_model,
+                                                   escalate_after=self.config.routing_escalate_after,
+                                                   deescalate_after=self.config.routing_deescalate_after,
+                                                   prices=self.config.model_prices)
+        tracing.configure(jsonl_path=self.config.tracing_file, otlp_endpoint=self.config.tracing_otlp_endpoint)
+        self.utility_cache = None
+        if self.config.utility_cache_enabled:
+            self.utility_cache = response_cache.get_cache(
+                max_entries=self.config.utility_cache_max_entries,
+                ttl_seconds=self.config.utility_cache_ttl_seconds,
+                db_path=os.path.join(self.context.get_memory_dir(), "utility_cache.db") if self.config.utility_cache_persist else None)
 
     def get_memory_context(self) -> str:
         return self.fetch_memories(True)
@@ -90,9 +164,22 @@ class Agent:
         if self.config.big_brain_model is None:
             return "BigBrain model is not configured."
         try:
-            context = self.get_conversation_context()
+            context = self.get_bigbrain_context(query)
             full_query = f"Conversation context:\n{context}\n\nNew query: {query}\n\nAs BigBrain, provide a comprehensive and insightful analysis."
-            response = self.config.big_brain_model.invoke(full_query)
+
+            # streamed through the same printer as the main loop and the shared rate limiter
+            PrintStyle(bold=True, font_color="green", padding=True, background_color="white").print(f"{self.agent_name}: BigBrain:")
+            printer = PrintStyle(italic=True, font_color="#b3ffd9", padding=False)
+            response = ""
+            with tracing.span("bigbrain", self, model=response_cache.get_model_id(self.config.big_brain_model), input_tokens=int(len(full_query)/4)) as span:
+                stream_start = time.time()
+                for content in self.stream_model(self.config.big_brain_model, full_query):
+                    if self.handle_intervention(response): break
+                    if content and not response: span.set(first_token_ms=(time.time() - stream_start) * 1000)
+                    printer.stream(content)
+                    response += content
+                span.set(output_tokens=int(len(response)/4))
+
             bigbrain_response = self.process_big_brain_response(response)
             self.append_message(f"BigBrain: {bigbrain_response}")
             return f"I consulted with BigBrain, and here's what it says:\n\n{bigbrain_response}"
@@ -101,6 +188,17 @@ class Agent:
             self.append_message(error_message, human=True)
             return error_message
 
+    def get_bigbrain_context(self, query: str) -> str:
+        # recent turns, task summary and memories relevant to the query, within big_brain_context_tokens
+        memories = []
+        if self.config.auto_memory_count > 0:
+            try:
+                from python.tools import memory_tool
+                memories = [doc.page_content for doc in memory_tool.search_documents(self, query, self.config.auto_memory_count)]
+            except Exception as e:
+                self.context.logger.warning("BigBrain memory lookup failed: %s", e)
+        return context_budget.build(query, self.history, self.task_summary, memories, self.config.big_brain_context_tokens)
+
     def process_big_brain_response(self, response):
         if hasattr(response, 'content'):
             response = response.content
@@ -114,17 +212,30 @@ class Agent:
         try:
             context = self.get_conversation_context()
             full_query = f"Conversation context:\n{context}\n\nNew query: {query}\n\nCollaborate to solve this problem."
-            
-            response1 = self.config.dreamteam_model1.invoke(full_query)
-            response1_content = self.extract_content(response1)
-            self.append_message(f"DreamTeam Model 1: {response1_content}")
-            
-            full_query2 = f"{full_query}\n\nFirst model's response: {response1_content}\n\nProvide your perspective and build upon or critique the first response."
-            response2 = self.config.dreamteam_model2.invoke(full_query2)
-            response2_content = self.extract_content(response2)
-            self.append_message(f"DreamTeam Model 2: {response2_content}")
-            
-            consolidated_response = self.consolidate_dreamteam_responses([response1_content, response2_content])
+
+            team = dreamteam.DreamTeam(
+                {"Member 1": lambda prompt: self.call_model(self.config.dreamteam_model1, prompt),
+                 "Member 2": lambda prompt: self.call_model(self.config.dreamteam_model2, prompt)},
+                topology=self.config.dreamteam_topology,
+                timeouts=self.config.dreamteam_timeouts,
+                default_timeout=self.config.dreamteam_timeout_seconds,
+                quorum=self.config.dreamteam_quorum,
+                critique_rounds=self.config.dreamteam_critique_rounds)
+
+            with tracing.span("dreamteam", self, topology=self.config.dreamteam_topology) as span:
+                drafts = team.run(full_query)
+                for draft in drafts:
+                    if draft.ok: self.append_message(f"DreamTeam {draft.member}: {draft.content}")
+                    else: self.context.logger.warning("DreamTeam %s: %s", draft.member, draft.error)
+                span.set(answered=sum(d.ok for d in drafts))
+
+                PrintStyle(bold=True, font_color="orange", padding=True, background_color="white").print(f"{self.agent_name}: DreamTeam conclusion:")
+                printer = PrintStyle(italic=True, font_color="orange", padding=False)
+                consolidated_response = dreamteam.consolidate(full_query, drafts, lambda prompt: self.stream_model(self.config.utility_model, prompt), printer.stream)
+
+            if not consolidated_response:
+                errors_text = "; ".join(f"{d.member}: {d.error}" for d in drafts)
+                raise RuntimeError(f"no DreamTeam model answered ({errors_text})")
             self.append_message(f"DreamTeam Conclusion: {consolidated_response}")
             
             return f"After consulting with the DreamTeam, here's the consolidated conclusion:\n\n{consolidated_response}"
@@ -134,112 +245,140 @@ class Agent:
             return error_message
 
     def consolidate_dreamteam_responses(self, responses):
-        consolidation_prompt = "Based on the DreamTeam's responses, provide a consolidated conclusion:"
-        for i, response in enumerate(responses):
-            consolidation_prompt += f"\n\nModel {i+1} response: {response}"
-        
-        consolidated_response = self.config.utility_model.invoke(consolidation_prompt)
-        return self.extract_content(consolidated_response)
+        drafts = [dreamteam.Draft(member=f"Member {i+1}", content=response) for i, response in enumerate(responses)]
+        return dreamteam.consolidate("", drafts, lambda prompt: self.stream_model(self.config.utility_model, prompt))
+
+    def call_model(self, model, prompt: str) -> str:
+        return "".join(self.stream_model(model, prompt))
+
+    def stream_model(self, model, prompt: str):
+        # helper model calls go through the shared rate limiter like the main chat model
+        call = self.rate_limiter.limit_call_and_input(int(len(prompt)/4))
+        response = ""
+        for chunk in model.stream(prompt):
+            if isinstance(chunk, str): content = chunk
+            elif hasattr(chunk, "content"): content = str(chunk.content)
+            else: content = str(chunk)
+            response += content
+            yield content
+        self.rate_limiter.set_output_tokens(int(len(response)/4), call)
 
     def extract_content(self, response):
         return response.content if hasattr(response, 'content') else str(response)
 
     def message_loop(self, msg: str):
+        start_time = time.time()
         try:
-            printer = PrintStyle(italic=True, font_color="#b3ffd9", padding=False)    
-            user_message = files.read_file("./prompts/fw.user_message.md", message=msg)
-            self.append_message(user_message, human=True)
-            memories = self.fetch_memories(True)
-            
-            max_iterations = 5  # Limit the number of iterations to prevent infinite loops
-            iteration_count = 0
-            start_time = time.time()
-
-            while iteration_count < max_iterations:
-                Agent.streaming_agent = self
-                agent_response = ""
-                self.intervention_status = False
-
-                try:
-                    system = self.system_prompt + "\n\n" + self.tools_prompt
-                    memories = self.fetch_memories()
-                    if memories: system += "\n\n" + memories
-
-                    prompt = ChatPromptTemplate.from_messages([
-                        SystemMessage(content=system),
-                        MessagesPlaceholder(variable_name="messages") ])
-                    
-                    inputs = {"messages": self.history}
-                    chain = prompt | self.config.chat_model
-
-                    formatted_inputs = prompt.format(messages=self.history)
-                    tokens = int(len(formatted_inputs)/4)     
-                    self.rate_limiter.limit_call_and_input(tokens)
-                    
-                    PrintStyle(bold=True, font_color="green", padding=True, background_color="white").print(f"{self.agent_name}: Starting a message:")
-                                            
-                    for chunk in chain.stream(inputs):
-                        if self.handle_intervention(agent_response): break
-
-                        if isinstance(chunk, str): content = chunk
-                        elif hasattr(chunk, "content"): content = str(chunk.content)
-                        else: content = str(chunk)
-                        
-                        if content:
-                            printer.stream(content)
-                            agent_response += content
-
-                    self.rate_limiter.set_output_tokens(int(len(agent_response)/4))
-                    
-                    if not self.handle_intervention(agent_response):
-                        if self.last_message == agent_response:
-                            self.append_message(agent_response)
-                            warning_msg = files.read_file("./prompts/fw.msg_repeat.md")
-                            self.append_message(warning_msg, human=True)
-                            PrintStyle(font_color="orange", padding=True).print(warning_msg)
-                            break  # Exit the loop if the message is repeated
-                        else:
-                            self.append_message(agent_response)
-                            tools_result = self.process_tools(agent_response)
-                            if tools_result:
-                                return tools_result
-                            if self.is_query_complete(agent_response):
-                                break  # Exit the loop if the query is deemed complete
-
-                except Exception as e:
-                    error_message = errors.format_error(e)
-                    msg_response = files.read_file("./prompts/fw.error.md", error=error_message)
-                    self.append_message(msg_response, human=True)
-                    PrintStyle(font_color="red", padding=True).print(msg_response)
-                    break  # Exit the loop on error
-
-                iteration_count += 1
-
-            end_time = time.time()
-            self.last_response_time = end_time - start_time
-            self.last_token_usage = self.rate_limiter.get_total_tokens()
-            self.update_memory_usage()
-
-            if iteration_count == max_iterations:
-                return "I apologize, but I seem to be having trouble providing a complete answer. Let me know if you'd like me to try a different approach or if you have any other questions."
-
-            return agent_response
+            with tracing.span("message_loop", self, agent_name=self.agent_name):
+                printer = PrintStyle(italic=True, font_color="#b3ffd9", padding=False)    
+                self.last_user_message = msg
+                user_message = files.read_file("./prompts/fw.user_message.md", message=msg)
+                self.append_message(user_message, human=True)
+                memories = self.fetch_memories(True)
+                
+                max_iterations = 5  # Limit the number of iterations to prevent infinite loops
+                iteration_count = 0
+
+                while iteration_count < max_iterations and not self.stop_requested.is_set():
+                    if self.interactive: Agent.streaming_agent = self
+                    agent_response = ""
+                    self.intervention_status = False
+
+                    with tracing.span("iteration", self, iteration=iteration_count):
+                        try:
+                            # stable system prompt first and memories after the history, so the prefix can be cached
+                            system = self.system_prompt + "\n\n" + self.tools_prompt
+                            memories = self.fetch_memories()
+
+                            # the router picks the cheap or the escalated model for this step
+                            route, chat_model = self.router.select() if self.router else ("chat", self.config.chat_model)
+                            model_id = response_cache.get_model_id(chat_model)
+
+                            prompt, inputs = self.build_chat_prompt(chat_model, system, memories)
+                            chain = prompt | chat_model
+
+                            formatted_inputs = prompt.format(**inputs)
+                            tokens = int(len(formatted_inputs)/4)     
+
+                            with tracing.span("llm_call", self, model=model_id, route=route, input_tokens=tokens) as llm_span:
+                                call = self.rate_limiter.limit_call_and_input(tokens)
+                                
+                                PrintStyle(bold=True, font_color="green", padding=True, background_color="white").print(f"{self.agent_name}: Starting a message:")
+                                                        
+                                # deadlines, retries and the optional hedged request live in the resilient stream
+                                hedge = None
+                                if self.config.chat_hedge_model:
+                                    hedge_prompt, hedge_inputs = self.build_chat_prompt(self.config.chat_hedge_model, system, memories)
+                                    hedge = lambda: (hedge_prompt | self.config.chat_hedge_model).stream(hedge_inputs) # type: ignore
+                                stream_start = time.time()
+                                for content in self.chat_stream.stream(lambda: chain.stream(inputs), hedge, tokens, call):
+                                    if self.handle_intervention(agent_response): break
+                                    
+                                    if content:
+                                        if not agent_response: llm_span.set(first_token_ms=(time.time() - stream_start) * 1000)
+                                        printer.stream(content)
+                                        agent_response += content
+
+                                self.rate_limiter.set_output_tokens(int(len(agent_response)/4), self.chat_stream.last_call)
+                                llm_span.set(output_tokens=int(len(agent_response)/4), source=self.chat_stream.last_source)
+                                self.update_prompt_cache_usage(tokens, llm_span)
+                                if self.router:
+                                    self.router.record(route, model_id, tokens, int(len(agent_response)/4),
+                                                       (time.time() - stream_start) * 1000, llm_span.attributes.get("first_token_ms", 0.0))
+                                    if model_router.is_low_confidence(agent_response): self.route_signal("low_confidence")
+                            
+                            if not self.handle_intervention(agent_response):
+                                if self.last_message == agent_response:
+                                    self.route_signal("repeat")
+                                    self.append_message(agent_response)
+                                    warning_msg = files.read_file("./prompts/fw.msg_repeat.md")
+                                    self.append_message(warning_msg, human=True)
+                                    PrintStyle(font_color="orange", padding=True).print(warning_msg)
+                                    break  # Exit the loop if the message is repeated
+                                else:
+                                    self.append_message(agent_response)
+                                    tools_result = self.process_tools(agent_response)
+                                    if tools_result:
+                                        return tools_result
+                                    if self.is_query_complete(agent_response):
+                                        break  # Exit the loop if the query is deemed complete
+
+                        except Exception as e:
+                            self.route_signal("error")
+                            error_message = errors.format_error(e)
+                            msg_response = files.read_file("./prompts/fw.error.md", error=error_message)
+                            self.append_message(msg_response, human=True)
+                            PrintStyle(font_color="red", padding=True).print(msg_response)
+                            break  # Exit the loop on error
+                        finally:
+                            if self.router: self.router.end_step()
+
+                    iteration_count += 1
+
+                if iteration_count == max_iterations:
+                    return "I apologize, but I seem to be having trouble providing a complete answer. Let me know if you'd like me to try a different approach or if you have any other questions."
+
+                return agent_response
 
         except Exception as e:
             error_message = f"Unexpected error in message_loop: {str(e)}"
-            logger.error(error_message)
-            logger.error(traceback.format_exc())
+            self.context.logger.error(error_message)
+            self.context.logger.error(traceback.format_exc())
             return f"An unexpected error occurred: {error_message}"
         finally:
-            Agent.streaming_agent = None
+            if self.interactive and Agent.streaming_agent is self: Agent.streaming_agent = None
+            # metrics are updated on every exit path, including tool results that end the loop
+            self.last_response_time = time.time() - start_time
+            self.last_token_usage = self.rate_limiter.get_total_tokens()
+            self.update_memory_usage()
+            if self.router: self.context.logger.info("Routing stats: %s", json.dumps(self.get_routing_stats()))
 
     def append_message(self, msg: str, human: bool = False):
         message_type = "human" if human else "ai"
-        if self.history and self.history[-1].type == message_type:
-            self.history[-1].content += "\n\n" + msg
-        else:
-            new_message = HumanMessage(content=msg) if human else AIMessage(content=msg)
-            self.history.append(new_message)
+        # same type messages are merged into the last entry, only a new entry can push the history over the limit
+        count = len(self.history)
+        self.history.append(message_type, msg)
+        if len(self.history) > count:
             self.cleanup_history(self.config.msgs_keep_max, self.config.msgs_keep_start, self.config.msgs_keep_end)
         if message_type == "ai":
             self.last_message = msg
@@ -256,10 +395,12 @@ class Agent:
         else:
             self.memory_skip_counter = self.config.auto_memory_skip
             from python.tools import memory_tool
-            messages = self.concat_messages(self.history)
-            memories = memory_tool.search(self, messages)
+            # compact queries from the current task instead of the whole history, so the cost stays flat
+            queries = memory_query.build(self, self.config.memory_query_max_chars, self.config.memory_query_multi)
+            if not queries: return ""
+            memories = memory_tool.search_multi(self, queries)
             input = {
-                "conversation_history": messages,
+                "conversation_history": self.get_conversation_context()[-self.config.memory_query_max_chars * 2:],
                 "raw_memories": memories
             }
             cleanup_prompt = files.read_file("./prompts/msg.memory_cleanup.md").replace("{", "{{")       
@@ -267,7 +408,21 @@ class Agent:
             return clean_memories
 
     def concat_messages(self, messages):
-        return "\n".join([f"{msg.type}: {msg.content}" for msg in messages])
+        return history.concat(messages)
+
+    def reduce_tool_output(self, tool_name: str, text: str) -> str:
+        if not self.config.tool_output_reducer: return text
+        text = text.strip()
+        summarize = None
+        if self.config.tool_output_summary_threshold:
+            system = files.read_file("./prompts/msg.tool_output_summary.md")
+            summarize = lambda output: self.send_adhoc_message(system, output, "")
+        with tracing.span("tool_output_reduce", self, tool_name=tool_name, chars=len(text)) as span:
+            reduction = output_reducer.reduce(text, self.config.max_tool_response_length,
+                                              store=self.artifacts if self.config.tool_output_store else None,
+                                              summarize=summarize, summary_threshold=self.config.tool_output_summary_threshold)
+            span.set(reduced_chars=len(reduction.text), steps=",".join(reduction.steps), artifact_id=reduction.artifact_id)
+        return reduction.text
 
     def get_conversation_context(self):
         # Return the last few messages from the conversation history
@@ -287,26 +442,84 @@ class Agent:
             PrintStyle(bold=True, font_color="orange", padding=True, background_color="white").print(f"{self.agent_name}: {output_label}:")
             printer = PrintStyle(italic=True, font_color="orange", padding=False)                
 
-        formatted_inputs = prompt.format()
-        tokens = int(len(formatted_inputs)/4)     
-        self.rate_limiter.limit_call_and_input(tokens)
-    
-        for chunk in chain.stream({}):
-            if self.handle_intervention(): break
+        with tracing.span("utility_call", self, label=output_label, model=response_cache.get_model_id(self.config.utility_model)) as span:
+            cache_key = None
+            if self.utility_cache:
+                if response_cache.is_cacheable(self.config.utility_model):
+                    cache_key = response_cache.ResponseCache.make_key(response_cache.get_model_id(self.config.utility_model), system, msg)
+                    cached = self.utility_cache.get(cache_key)
+                    span.set(cache_hit=cached is not None)
+                    if cached is not None:
+                        # replay through the same printer so the output looks like a live response
+                        for content in response_cache.replay_chunks(cached):
+                            if printer: printer.stream(content)
+                        return cached
+                else: self.utility_cache.record_bypass()
+
+            formatted_inputs = prompt.format()
+            tokens = int(len(formatted_inputs)/4)     
+            call = self.rate_limiter.limit_call_and_input(tokens)
+        
+            interrupted = False
+            for chunk in chain.stream({}):
+                if self.handle_intervention(): 
+                    interrupted = True
+                    break
 
-            if isinstance(chunk, str): content = chunk
-            elif hasattr(chunk, "content"): content = str(chunk.content)
-            else: content = str(chunk)
+                if isinstance(chunk, str): content = chunk
+                elif hasattr(chunk, "content"): content = str(chunk.content)
+                else: content = str(chunk)
 
-            if printer: printer.stream(content)
-            response += content
+                if printer: printer.stream(content)
+                response += content
 
-        self.rate_limiter.set_output_tokens(int(len(response)/4))
+            self.rate_limiter.set_output_tokens(int(len(response)/4), call)
+            span.set(input_tokens=tokens, output_tokens=int(len(response)/4))
 
-        return response
+            # never cache a response cut short by the user
+            if cache_key and not interrupted and response:
+                self.utility_cache.put(cache_key, response) # type: ignore
+
+            return response
+
+    def build_chat_prompt(self, model, system: str, memories: str = ""):
+        dynamic = files.read_file("./prompts/agent.memory.md", memories=memories) if memories else ""
+        system_message, messages = prompt_cache.build(model, system, self.history.to_messages(), dynamic)
+        prompt = ChatPromptTemplate.from_messages([system_message, MessagesPlaceholder(variable_name="messages")])
+        return prompt, {"messages": messages}
+
+    def update_prompt_cache_usage(self, estimated_tokens: int, span=None):
+        # provider reported usage of the last chat call, falls back to the estimate when nothing is reported
+        usage = prompt_cache.merge_usage(self.chat_stream.last_metadata)
+        usage["input_tokens"] = usage["input_tokens"] or estimated_tokens
+        self.last_prompt_cache_usage = usage
+        for key, value in usage.items():
+            self.prompt_cache_totals[key] = self.prompt_cache_totals.get(key, 0) + value
+        if span is not None: span.set(cached_tokens=usage["cached_tokens"], cache_write_tokens=usage["cache_write_tokens"])
+
+    def get_prompt_cache_stats(self):
+        totals = dict(self.prompt_cache_totals)
+        input_tokens = totals.get("input_tokens", 0)
+        totals["cached_ratio"] = round(totals.get("cached_tokens", 0) / input_tokens, 3) if input_tokens else 0.0
+        return {"last": dict(self.last_prompt_cache_usage), "total": totals}
+
+    def route_signal(self, kind: str):
+        if self.router: self.router.signal(kind)
+
+    def get_routing_stats(self):
+        return self.router.get_stats() if self.router else None
+
+    @property
+    def artifacts(self) -> artifacts.ArtifactStore:
+        # large tool outputs, shared by all agents with the same memory, resolved on use so it follows the context
+        return artifacts.get_store(self.context.get_artifacts_dir())
+
+    def get_utility_cache_stats(self):
+        return self.utility_cache.stats if self.utility_cache else None
 
     def handle_intervention(self, progress:str="") -> bool:
-        while self.paused: time.sleep(0.1)
+        if self.stop_requested.is_set(): return True
+        while self.interactive and self.paused: time.sleep(0.1)
         if self.intervention_message and not self.intervention_status:
             if progress.strip(): self.append_message(progress)
             user_msg = files.read_file("./prompts/fw.intervention.md", user_message=self.intervention_message)
@@ -327,15 +540,20 @@ class Agent:
                         tool_args,
                         msg)
                 
-            if self.handle_intervention(): return
-            tool.before_execution(**tool_args)
-            if self.handle_intervention(): return
-            response = tool.execute(**tool_args)
-            if self.handle_intervention(): return
-            tool.after_execution(response)
-            if self.handle_intervention(): return
-            if response.break_loop: return response.message
+            with tracing.span("tool", self, tool_name=tool_name):
+                if self.handle_intervention(): return
+                tool.before_execution(**tool_args)
+                if self.handle_intervention(): return
+                response = tool.execute(**tool_args)
+                if type(tool).__name__ == "Unknown" or "Traceback (most recent call last)" in str(response.message):
+                    self.route_signal("tool_error")
+                if self.handle_intervention(): return
+                if not response.break_loop: response.message = self.reduce_tool_output(tool_name, response.message)
+                tool.after_execution(response)
+                if self.handle_intervention(): return
+                if response.break_loop: return response.message
         else:
+            self.route_signal("misformat")
             msg = files.read_file("prompts/fw.msg_misformat.md")
             self.append_message(msg, human=True)
             PrintStyle(font_color="red", padding=True).print(msg)
@@ -373,15 +591,15 @@ class Agent:
 
         new_middle_part = self.replace_middle_messages(middle_part)
 
-        self.history = first_x + new_middle_part + last_y
+        self.history = history.History(first_x + new_middle_part + last_y)
 
         return self.history
 
     def replace_middle_messages(self,middle_messages):
         cleanup_prompt = files.read_file("./prompts/fw.msg_cleanup.md")
         summary = self.send_adhoc_message(system=cleanup_prompt,msg=self.concat_messages(middle_messages), output_label="Mid messages cleanup summary")
-        new_human_message = HumanMessage(content=summary)
-        return [new_human_message]
+        self.task_summary = summary
+        return [history.Entry("human", summary)]
 
     def get_data(self, field:str):
         return self.data.get(field, None)
@@ -399,13 +617,12 @@ class Agent:
         return self.memory_usage
 
     def update_memory_usage(self):
-        # This is a simplified method to estimate memory usage
-        # In a real-world scenario, you might want to use a more accurate method
-        self.memory_usage = sys.getsizeof(self.history) / 1024  # Convert to KB
+        # count the history entries and their contents, not just the list
+        self.memory_usage = self.history.size() / 1024  # Convert to KB
 
     def get_context_size(self):
-        # Estimate the context size based on the total characters in the history
-        return sum(len(msg.content) for msg in self.history)
+        # total characters in the history, kept up to date on append
+        return self.history.chars
 
     def is_query_complete(self, response):
         # Implement logic to determine if the query has been sufficiently answered
@@ -2,9 +2,11 @@
 
 import os
 import shutil
+import threading
 from typing import Dict, Any, List
 from PyQt6.QtCore import QObject, pyqtSignal
 from agent import Agent, AgentConfig
+from python.helpers import dreamteam
 import models
 import logging
 
@@ -13,6 +15,8 @@ logger = logging.getLogger(__name__)
 class AgentWrapper(QObject):
     message_processed = pyqtSignal(str)
     agent_output = pyqtSignal(str)
+    agent_stream = pyqtSignal(str)
+    metrics_updated = pyqtSignal(dict)
 
     def __init__(self, settings: Dict[str, Any]):
         super().__init__()
@@ -21,8 +25,9 @@ class AgentWrapper(QObject):
         self.main_agent = Agent(number=0, config=self.config)
         self.chat_history = []
         self.memory = {}
-        self.work_dir = os.path.join(os.getcwd(), "work_dir")
+        self.work_dir = self.main_agent.context.work_dir
         self.active_tools = {}
+        self.member_locks: Dict[int, threading.Lock] = {}
 
     def create_agent_config(self) -> AgentConfig:
         chat_model = self.get_model('Chat')
@@ -59,17 +64,27 @@ class AgentWrapper(QObject):
             raise ValueError(f"Unsupported embedding company: {company}")
 
     def message_loop(self, message: str) -> str:
-        os.chdir(self.work_dir)
         self.agent_output.emit(f"User: {message}\n")
+        totals = self.main_agent.get_prompt_cache_stats()["total"]
         response = self.main_agent.message_loop(message)
         self.agent_output.emit(f"Agent 0: {response}\n")
+        self.metrics_updated.emit(self.get_loop_metrics(totals))
         self.message_processed.emit(response)
         return response
 
+    def get_loop_metrics(self, totals_before: Dict[str, Any]) -> Dict[str, Any]:
+        # response time and the prompt tokens of all chat calls of the last message loop, cached ones included
+        totals = self.main_agent.get_prompt_cache_stats()["total"]
+        used = lambda key: totals.get(key, 0) - totals_before.get(key, 0)
+        return {"response_time": self.main_agent.last_response_time,
+                "tokens_used": used("input_tokens"),
+                "cached_tokens": used("cached_tokens"),
+                "routing": self.main_agent.get_routing_stats()}
+
     def call_bigbrain(self, message: str) -> str:
         bigbrain = self.main_agent.get_data("bigbrain")
         if bigbrain is None:
-            bigbrain = Agent(self.main_agent.number + 1, self.config)
+            bigbrain = Agent(self.main_agent.number + 1, self.config, self.main_agent.context.derive("bigbrain"))
             bigbrain.set_data("superior", self.main_agent)
             self.main_agent.set_data("bigbrain", bigbrain)
 
@@ -79,21 +94,48 @@ class AgentWrapper(QObject):
         return response
 
     def call_dreamteam(self, message: str) -> str:
-        dreamteam = self.main_agent.get_data("dreamteam")
-        if dreamteam is None:
-            dreamteam = [Agent(self.main_agent.number + 2, self.config), Agent(self.main_agent.number + 3, self.config)]
-            for agent in dreamteam:
+        dreamteam_agents = self.main_agent.get_data("dreamteam")
+        if dreamteam_agents is None:
+            dreamteam_agents = [Agent(self.main_agent.number + n, self.config, self.main_agent.context.derive(f"dreamteam{n - 1}")) for n in (2, 3)]
+            for agent in dreamteam_agents:
                 agent.set_data("superior", self.main_agent)
-            self.main_agent.set_data("dreamteam", dreamteam)
+                agent.interactive = False
+            self.main_agent.set_data("dreamteam", dreamteam_agents)
 
         self.agent_output.emit(f"Agent 0 to DreamTeam: {message}\n")
-        response1 = dreamteam[0].message_loop(message)
-        self.agent_output.emit(f"DreamTeam Agent 1 to Agent 0: {response1}\n")
-        response2 = dreamteam[1].message_loop(f"{message}\n\nConsider this input as well: {response1}")
-        self.agent_output.emit(f"DreamTeam Agent 2 to Agent 0: {response2}\n")
-        combined_response = f"DreamTeam Response:\nAgent 1: {response1}\nAgent 2: {response2}"
+        # both agents work at the same time, the utility model streams one conclusion from their answers
+        members = {f"Member {i + 1}": agent for i, agent in enumerate(dreamteam_agents)}
+        team = dreamteam.DreamTeam(
+            {name: lambda prompt, agent=agent: self.run_member(agent, prompt) for name, agent in members.items()},
+            topology=self.config.dreamteam_topology,
+            timeouts=self.config.dreamteam_timeouts,
+            default_timeout=self.config.dreamteam_timeout_seconds,
+            quorum=self.config.dreamteam_quorum,
+            critique_rounds=self.config.dreamteam_critique_rounds)
+        drafts = team.run(message)
+        for draft in drafts:
+            # a member left behind by its deadline stops at its next step instead of running on
+            if not draft.ok: members[draft.member].stop_requested.set()
+            self.agent_output.emit(f"DreamTeam {draft.member} to Agent 0: {draft.content or draft.error}\n")
+
+        self.agent_output.emit("DreamTeam conclusion:\n")
+        conclusion = dreamteam.consolidate(message, drafts, lambda prompt: self.main_agent.stream_model(self.config.utility_model, prompt),
+                                           self.agent_stream.emit)
+        answers = "\n".join(f"{d.member}: {d.content or d.error}" for d in drafts)
+        combined_response = f"DreamTeam Response:\n{answers}\n\nConclusion: {conclusion}"
         return combined_response
 
+    def run_member(self, agent: Agent, prompt: str) -> str:
+        # one message loop per agent at a time, a loop still running from an earlier call is not joined by a second one
+        lock = self.member_locks.setdefault(agent.number, threading.Lock())
+        if not lock.acquire(blocking=False):
+            raise RuntimeError(f"{agent.agent_name} is still busy with the previous DreamTeam request")
+        try:
+            agent.stop_requested.clear()
+            return agent.message_loop(prompt)
+        finally:
+            lock.release()
+
     def get_memory(self) -> Dict[str, Any]:
         return self.main_agent.get_data("memory") or {}
 
@@ -101,10 +143,16 @@ class AgentWrapper(QObject):
         self.main_agent.set_data("memory", memory)
 
     def get_context_size(self) -> int:
-        return len(self.main_agent.history)
+        # shown as tokens in the gui, the message count was reported before
+        return self.main_agent.history.tokens
 
     def set_work_dir(self, new_work_dir):
         self.work_dir = new_work_dir
+        # subordinate contexts follow, leased shells are restarted in the new directory
+        self.main_agent.context.set_work_dir(new_work_dir)
+
+    def close(self):
+        self.main_agent.context.close()
 
     def save_file(self, file_name: str, content: str):
         file_path = os.path.join(self.work_dir, file_name)
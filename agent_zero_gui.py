@@ -21,8 +21,10 @@ from components.file_manager import FileManagerPanel
 from components.settings_panel import SettingsPanel
 from components.terminal_view import TerminalView, TerminalHandler
 from components.prompt_manager import PromptManager
+from components.performance_metrics import PerformanceMetricsWidget
 
 from agent_wrapper import AgentWrapper
+from python.helpers import files
 
 logging.basicConfig(filename='agent_zero.log', level=logging.DEBUG,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -166,6 +168,9 @@ class AgentZeroGUI(QMainWindow):
         scroll_prompt.setWidgetResizable(True)
         self.tab_widget.addTab(scroll_prompt, "Prompts")
 
+        self.performance_metrics = PerformanceMetricsWidget(self)
+        self.tab_widget.addTab(self.performance_metrics, "Metrics")
+
         main_splitter.addWidget(self.tab_widget)
         main_splitter.setSizes([2*self.width()//3, self.width()//3])
 
@@ -257,6 +262,8 @@ class AgentZeroGUI(QMainWindow):
             settings = self.settings_panel.get_current_settings()
             self.agent_wrapper = AgentWrapper(settings)
             self.agent_wrapper.agent_output.connect(self.terminal_view.append_output)
+            self.agent_wrapper.agent_stream.connect(self.terminal_view.stream_output)
+            self.agent_wrapper.metrics_updated.connect(lambda metrics: self.performance_metrics.update_metrics(**metrics))
             self.agent_controls.set_agent(self.agent_wrapper)
             self.statusBar().showMessage("Agent setup complete")
         except Exception as e:
@@ -361,7 +368,7 @@ class AgentZeroGUI(QMainWindow):
         project_name, ok = QInputDialog.getText(self, "New Project", "Enter project name:")
         if ok and project_name:
             self.current_project = project_name
-            project_dir = os.path.join("projects", project_name)
+            project_dir = files.get_abs_path("projects", project_name)
             os.makedirs(project_dir, exist_ok=True)
             self.file_manager.set_work_dir(project_dir)
             if self.agent_wrapper:
@@ -369,7 +376,7 @@ class AgentZeroGUI(QMainWindow):
             self.statusBar().showMessage(f"Created new project: {project_name}")
 
     def open_project(self):
-        project_dir = QFileDialog.getExistingDirectory(self, "Open Project", "projects")
+        project_dir = QFileDialog.getExistingDirectory(self, "Open Project", files.get_abs_path("projects"))
         if project_dir:
             try:
                 self.current_project = os.path.basename(project_dir)
@@ -387,7 +394,7 @@ class AgentZeroGUI(QMainWindow):
             QMessageBox.warning(self, "No Project", "No project is currently open.")
             return
         
-        project_dir = os.path.join("projects", self.current_project)
+        project_dir = files.get_abs_path("projects", self.current_project)
         os.makedirs(project_dir, exist_ok=True)
         
         try:
@@ -420,7 +427,7 @@ class AgentZeroGUI(QMainWindow):
             self.save_project()
         
         self.current_project = None
-        work_dir = os.path.join(os.getcwd(), "work_dir")
+        work_dir = files.get_abs_path("work_dir")
         self.file_manager.set_work_dir(work_dir)
         if self.agent_wrapper:
             self.agent_wrapper.set_work_dir(work_dir)
@@ -428,7 +435,7 @@ class AgentZeroGUI(QMainWindow):
         self.statusBar().showMessage("Project closed")
 
     def load_project_data(self):
-        project_dir = os.path.join("projects", self.current_project)
+        project_dir = files.get_abs_path("projects", self.current_project)
         
         try:
             chat_history_path = os.path.join(project_dir, "chat_history.json")
@@ -449,7 +456,7 @@ class AgentZeroGUI(QMainWindow):
 
     def view_readme(self):
         try:
-            readme_path = os.path.join(os.getcwd(), "README.md")
+            readme_path = files.get_abs_path("README.md")
             if os.path.exists(readme_path):
                 with open(readme_path, 'r') as file:
                     content = file.read()
@@ -528,6 +535,8 @@ class AgentZeroGUI(QMainWindow):
         QMessageBox.critical(self, title, message)
 
     def closeEvent(self, event):
+        if self.agent_wrapper:
+            self.agent_wrapper.close()
         sys.stdout = sys.__stdout__
         sys.stderr = sys.__stderr__
         super().closeEvent(event)
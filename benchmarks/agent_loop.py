@@ -0,0 +1,158 @@
+"""
+End-to-end agent loop benchmark with per-phase timings.
+
+Runs scripted scenarios of increasing length through Agent.message_loop using a stub chat model,
+a stub utility model and stub embeddings, so no network access is needed. Timings are written as JSON.
+
+    python benchmarks/agent_loop.py --scenarios small,medium,large --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.prompts import ChatPromptTemplate
+from agent import Agent, AgentConfig
+from python.helpers import extract_tools
+from python.tools import code_execution_tool
+from benchmarks import scenarios
+from benchmarks.stubs import ScriptedChatModel, StubEmbeddings
+
+class PhaseTimer:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.request_start = 0.0
+
+    def record(self, phase: str, seconds: float):
+        self.samples.setdefault(phase, []).append(seconds)
+
+    def mark_first_token(self, prefix: str, when: float):
+        if self.request_start: self.record(f"{prefix}_first_token", when - self.request_start)
+
+    def wrap(self, func, phase: str, mark_request: bool = False):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self.record(phase, end - start)
+                if mark_request: self.request_start = end
+        return wrapper
+
+    def report(self) -> dict:
+        result = {}
+        for phase, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[phase] = {
+                "count": len(samples),
+                "total_ms": sum(samples) * 1000,
+                "mean_ms": statistics.fmean(samples) * 1000,
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return result
+
+@contextlib.contextmanager
+def patched(target, name: str, replacement):
+    # attributes inherited by a class are removed again rather than copied onto it
+    own = name in getattr(target, "__dict__", {})
+    original = getattr(target, name)
+    setattr(target, name, replacement)
+    try: yield
+    finally:
+        if own: setattr(target, name, original)
+        else: delattr(target, name)
+
+def create_agent(timer: PhaseTimer, turns: list[list[str]], args) -> Agent:
+    chat = ScriptedChatModel(responses=[r for t in turns for r in t], default_response=scenarios.tool_call("response", text="Done."),
+                             first_token_delay=args.first_token_delay, chunk_delay=args.chunk_delay, timer=timer, phase_prefix="llm")
+    utility = ScriptedChatModel(default_response="No relevant memories on the topic found.", timer=timer, phase_prefix="utility")
+    config = AgentConfig(
+        chat_model=chat,
+        utility_model=utility,
+        embeddings_model=StubEmbeddings(),
+        memory_subdir=os.path.join("benchmark", uuid.uuid4().hex),
+        auto_memory_count=args.auto_memory_count,
+        rate_limit_requests=0,
+        rate_limit_input_tokens=0,
+        code_exec_docker_enabled=False,
+        code_exec_ssh_enabled=False,
+        utility_cache_enabled=not args.no_utility_cache,
+    )
+    agent = Agent(number=0, config=config)
+    agent.fetch_memories = timer.wrap(agent.fetch_memories, "memory_fetch")
+    agent.cleanup_history = timer.wrap(agent.cleanup_history, "history_compaction")
+    agent.process_tools = timer.wrap(agent.process_tools, "tool_dispatch")
+    agent.rate_limiter.limit_call_and_input = timer.wrap(agent.rate_limiter.limit_call_and_input, "rate_limit_wait", mark_request=True)
+    return agent
+
+def run_scenario(name: str, turns: list[list[str]], args) -> dict:
+    timer = PhaseTimer()
+    agent = create_agent(timer, turns, args)
+    format_prompt = ChatPromptTemplate.format
+    parse = extract_tools.json_parse_dirty
+    terminal_session = code_execution_tool.CodeExecution.terminal_session
+
+    start = time.perf_counter()
+    with patched(ChatPromptTemplate, "format", timer.wrap(format_prompt, "prompt_build")), \
+         patched(extract_tools, "json_parse_dirty", timer.wrap(parse, "parse")), \
+         patched(code_execution_tool.CodeExecution, "terminal_session", timer.wrap(terminal_session, "shell_round_trip")), \
+         contextlib.redirect_stdout(io.StringIO()):
+        for index in range(len(turns)):
+            agent.message_loop(f"Please do benchmark step {index}.")
+    wall = time.perf_counter() - start
+
+    agent.context.release_shell()
+    shutil.rmtree(agent.context.get_memory_dir(), ignore_errors=True)
+
+    cache = agent.get_utility_cache_stats()
+    return {
+        "scenario": name,
+        "turns": len(turns),
+        "llm_calls": len(timer.samples.get("llm_stream", [])),
+        "wall_ms": wall * 1000,
+        "history_messages": len(agent.history),
+        "context_chars": agent.get_context_size(),
+        "utility_cache_hit_rate": cache.hit_rate if cache else None,
+        "phases": timer.report(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="small,medium,large", help=f"comma separated, available: {', '.join(scenarios.SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-shell", action="store_true", help="skip code execution steps (each costs at least 3s of idle wait)")
+    parser.add_argument("--auto-memory-count", type=int, default=3)
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--no-utility-cache", action="store_true")
+    parser.add_argument("--output", default="", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenarios.split(","):
+        name = name.strip()
+        for run in range(args.repeat):
+            result = run_scenario(name, scenarios.build(scenarios.SCENARIOS[name], shell=not args.no_shell), args)
+            result["run"] = run
+            results.append(result)
+            print(f"{name} #{run}: {result['wall_ms']:.1f} ms", file=sys.stderr)
+
+    report = json.dumps({"benchmark": "agent_loop", "python": sys.version.split()[0], "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f: f.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import json
+
+# Each scenario is a list of user turns, each turn a list of scripted agent responses.
+# message_loop allows 5 iterations per user message, so a turn is at most 4 tool calls and a response.
+
+def tool_call(tool_name: str, **tool_args) -> str:
+    return json.dumps({
+        "thoughts": [f"I will use {tool_name} to continue with the task."],
+        "tool_name": tool_name,
+        "tool_args": tool_args,
+    }, indent=4)
+
+def turn(index: int, shell: bool = True) -> list[str]:
+    responses = []
+    if shell:
+        responses.append(tool_call("code_execution_tool", runtime="terminal", code=f"echo step {index} && ls"))
+    responses.append(tool_call("memory_tool", memorize=f"# Step {index}\nResult of benchmark step {index} with details " + "x" * 200))
+    responses.append(tool_call("memory_tool", query=f"benchmark step {index}", threshold=0.1))
+    responses.append(tool_call("response", text=f"Step {index} is done."))
+    return responses
+
+def build(turns: int, shell: bool = True) -> list[list[str]]:
+    return [turn(i, shell) for i in range(turns)]
+
+SCENARIOS = {
+    "small": 1,
+    "medium": 4,
+    "large": 12,
+    "xlarge": 32,
+}
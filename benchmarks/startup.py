@@ -0,0 +1,97 @@
+"""
+Startup benchmark and import-time report.
+
+Starts a fresh interpreter per run with python -X importtime, imports the given modules (main.py by default,
+which is what terminal mode loads before the first prompt) and reports wall time plus the slowest top-level
+packages by cumulative import time. Results are written as JSON.
+
+    python benchmarks/startup.py --modules main --repeat 5 --top 15 --output startup.json
+    python benchmarks/startup.py --python venv/bin/python   # measure another interpreter, e.g. a virtualenv
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+MISSING = re.compile(r"^ModuleNotFoundError: No module named '([^']+)'", re.MULTILINE)
+
+class ImportFailed(Exception):
+    pass
+
+def parse_importtime(stderr: str) -> list[dict]:
+    # one entry per imported module, depth 0 are the ones imported directly by the measured code
+    entries = []
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if not match: continue
+        self_us, cumulative_us, indent, module = match.groups()
+        entries.append({"module": module, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000,
+                        "depth": (len(indent) - 1) // 2})
+    return entries
+
+def top_packages(entries: list[dict], top: int) -> list[dict]:
+    # cumulative time of outermost imports grouped by their top-level package
+    packages: dict[str, float] = {}
+    for entry in entries:
+        if entry["depth"] != 0: continue
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + entry["cumulative_ms"]
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": package, "cumulative_ms": round(ms, 1)} for package, ms in ranked]
+
+def run_once(modules: list[str], python: str = sys.executable) -> tuple[float, list[dict]]:
+    code = "; ".join(f"import {module}" for module in modules)
+    start = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        # the child's traceback without the import time lines, reported as one message instead of a crash
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        missing = MISSING.search("\n".join(errors))
+        if missing:
+            raise ImportFailed(f"importing {', '.join(modules)} failed, module '{missing.group(1)}' is not installed "
+                               f"(install requirements.txt into {python})")
+        raise ImportFailed(f"importing {', '.join(modules)} failed: {errors[-1] if errors else f'exit code {result.returncode}'}")
+    return wall_ms, parse_importtime(result.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default="main", help="comma separated modules to import, e.g. main or models,agent")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest packages to report")
+    parser.add_argument("--output", default="", help="write JSON here instead of stdout")
+    parser.add_argument("--python", default=sys.executable, help="interpreter to measure, the one running this script by default")
+    args = parser.parse_args()
+
+    modules = [module.strip() for module in args.modules.split(",") if module.strip()]
+    walls, entries = [], []
+    for run in range(args.repeat):
+        try:
+            wall_ms, entries = run_once(modules, args.python)
+        except ImportFailed as e:
+            sys.exit(f"startup benchmark: {e}")
+        walls.append(wall_ms)
+        print(f"{','.join(modules)} #{run}: {wall_ms:.1f} ms", file=sys.stderr)
+
+    # the first run warms the OS file cache, the package breakdown is taken from the last one
+    report = json.dumps({
+        "benchmark": "startup",
+        "python": args.python,
+        "modules": modules,
+        "wall_ms": {"runs": [round(w, 1) for w in walls], "min": round(min(walls), 1), "median": round(statistics.median(walls), 1)},
+        "imported_modules": len(entries),
+        "top_packages": top_packages(entries, args.top),
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f: f.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from python.helpers.replay_llm import hash_embedding
+
+class ScriptedChatModel(BaseChatModel):
+    # plays scripted responses in order with a configurable first-token delay and chunking
+    responses: List[str] = []
+    default_response: str = ""
+    first_token_delay: float = 0.0
+    chunk_delay: float = 0.0
+    chunk_size: int = 16
+    timer: Any = None
+    phase_prefix: str = "llm"
+    temperature: float = 0.0
+    model_name: str = "scripted"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def next_response(self) -> str:
+        return self.responses.pop(0) if self.responses else self.default_response
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        text = "".join(chunk.message.content for chunk in self._stream(messages)) # type: ignore
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text = self.next_response()
+        if self.first_token_delay: time.sleep(self.first_token_delay)
+        first = None
+        for i in range(0, len(text), self.chunk_size):
+            if first is None:
+                first = time.perf_counter()
+                if self.timer: self.timer.mark_first_token(self.phase_prefix, first)
+            elif self.chunk_delay: time.sleep(self.chunk_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[i:i + self.chunk_size]))
+        if self.timer and first is not None:
+            self.timer.record(f"{self.phase_prefix}_stream", time.perf_counter() - first)
+
+class StubEmbeddings(Embeddings):
+    def __init__(self, dimensions: int = 384, delay: float = 0.0):
+        self.dimensions = dimensions
+        self.delay = delay
+        self.model = f"stub-{dimensions}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.delay: time.sleep(self.delay)
+        return [hash_embedding(text, self.dimensions) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
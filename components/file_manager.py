@@ -6,11 +6,12 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTreeView, QPush
                              QLabel, QSizePolicy, QFileDialog, QFrame)
 from PyQt6.QtCore import Qt, QDir
 from PyQt6.QtGui import QStandardItemModel, QStandardItem, QPixmap
+from python.helpers import files
 
 class FileManagerPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.work_dir = os.path.abspath(os.path.join(os.getcwd(), "work_dir"))
+        self.work_dir = files.get_abs_path("work_dir")
         self.setup_ui()
 
     def setup_ui(self):
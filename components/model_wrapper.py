@@ -37,4 +37,5 @@ def get_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL):
         return None
 
 def reload_models():
+    models.invalidate()
     importlib.reload(models)
\ No newline at end of file
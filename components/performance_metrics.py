@@ -8,6 +8,7 @@ class PerformanceMetricsWidget(QWidget):
         super().__init__(parent)
         self.response_times = []
         self.token_usage = []
+        self.cached_tokens = []
         self.setup_ui()
 
     def setup_ui(self):
@@ -19,13 +20,21 @@ class PerformanceMetricsWidget(QWidget):
         self.token_usage_label = QLabel("Total Token Usage: 0")
         layout.addWidget(self.token_usage_label)
 
+        self.cached_tokens_label = QLabel("Cached Prompt Tokens: 0")
+        layout.addWidget(self.cached_tokens_label)
+
+        # per route totals of the model router, hidden while routing is off
+        self.routing_label = QLabel("")
+        self.routing_label.setVisible(False)
+        layout.addWidget(self.routing_label)
+
         self.chart_view = QChartView()
         self.chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
         layout.addWidget(self.chart_view)
 
         self.update_chart()
 
-    def update_metrics(self, response_time=None, tokens_used=None):
+    def update_metrics(self, response_time=None, tokens_used=None, cached_tokens=None, routing=None):
         if response_time is not None:
             self.response_times.append(response_time)
             avg_time = sum(self.response_times) / len(self.response_times)
@@ -36,6 +45,22 @@ class PerformanceMetricsWidget(QWidget):
             total_tokens = sum(self.token_usage)
             self.token_usage_label.setText(f"Total Token Usage: {total_tokens}")
 
+        if cached_tokens is not None:
+            # prompt tokens served from the provider's prefix cache
+            self.cached_tokens.append(cached_tokens)
+            total_cached = sum(self.cached_tokens)
+            total_tokens = sum(self.token_usage)
+            share = f" ({total_cached / total_tokens:.0%} of tokens)" if total_tokens else ""
+            self.cached_tokens_label.setText(f"Cached Prompt Tokens: {total_cached}{share}")
+
+        if routing:
+            lines = []
+            for route, stats in routing.items():
+                per_dollar = f", {stats['tokens_per_dollar']} tokens/$" if stats["tokens_per_dollar"] else ""
+                lines.append(f"{route.capitalize()} route: {stats['calls']} calls, ${stats['cost']:.4f}{per_dollar}, {stats['mean_ms']:.0f} ms mean")
+            self.routing_label.setText("\n".join(lines))
+            self.routing_label.setVisible(True)
+
         self.update_chart()
 
     def update_chart(self):
@@ -52,14 +77,21 @@ class PerformanceMetricsWidget(QWidget):
         for i, tokens in enumerate(self.token_usage):
             token_usage_series.append(i, tokens)
 
+        cached_tokens_series = QLineSeries()
+        cached_tokens_series.setName("Cached Tokens")
+        for i, tokens in enumerate(self.cached_tokens):
+            cached_tokens_series.append(i, tokens)
+
         chart.addSeries(response_time_series)
         chart.addSeries(token_usage_series)
+        chart.addSeries(cached_tokens_series)
 
         axis_x = QValueAxis()
         axis_x.setTitleText("Interactions")
         chart.addAxis(axis_x, Qt.AlignmentFlag.AlignBottom)
         response_time_series.attachAxis(axis_x)
         token_usage_series.attachAxis(axis_x)
+        cached_tokens_series.attachAxis(axis_x)
 
         axis_y_time = QValueAxis()
         axis_y_time.setTitleText("Response Time (s)")
@@ -70,6 +102,7 @@ class PerformanceMetricsWidget(QWidget):
         axis_y_tokens.setTitleText("Token Usage")
         chart.addAxis(axis_y_tokens, Qt.AlignmentFlag.AlignRight)
         token_usage_series.attachAxis(axis_y_tokens)
+        cached_tokens_series.attachAxis(axis_y_tokens)
 
         self.chart_view.setChart(chart)
 
@@ -80,7 +113,7 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     widget = PerformanceMetricsWidget()
     widget.show()
-    widget.update_metrics(response_time=1.5, tokens_used=100)
-    widget.update_metrics(response_time=2.0, tokens_used=150)
-    widget.update_metrics(response_time=1.8, tokens_used=120)
+    widget.update_metrics(response_time=1.5, tokens_used=100, cached_tokens=0)
+    widget.update_metrics(response_time=2.0, tokens_used=150, cached_tokens=90)
+    widget.update_metrics(response_time=1.8, tokens_used=120, cached_tokens=100)
     sys.exit(app.exec())
\ No newline at end of file
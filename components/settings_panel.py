@@ -5,6 +5,8 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QComboBox,
                              QTextEdit, QFileDialog, QMessageBox, QDialog, QLabel)
 from PyQt6.QtCore import Qt, pyqtSignal
 from dotenv import load_dotenv, set_key
+import models
+from python.helpers import files
 
 class APIKeyDialog(QDialog):
     def __init__(self, service, parent=None):
@@ -23,7 +25,7 @@ class APIKeyDialog(QDialog):
     def save_key(self):
         key = self.key_input.toPlainText().strip()
         if key:
-            set_key('.env', f"API_KEY_{self.service.upper()}", key)
+            set_key(files.get_abs_path(".env"), f"API_KEY_{self.service.upper()}", key)
             self.accept()
         else:
             QMessageBox.warning(self, "Invalid Input", "Please enter a valid API key.")
@@ -34,7 +36,7 @@ class SettingsPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
-        self.settings_file = "settings.json"
+        self.settings_file = files.get_abs_path("settings.json")
         self.setup_ui()
         self.load_settings()
 
@@ -133,6 +135,8 @@ class SettingsPanel(QWidget):
     def set_api_key(self, service):
         dialog = APIKeyDialog(service, self)
         if dialog.exec():
+            # cached clients still hold the old key, drop them so the next get_* call builds new ones
+            models.invalidate(service)
             QMessageBox.information(self, "Success", f"{service} API key has been saved to .env file")
             self.refresh_model_lists()
 
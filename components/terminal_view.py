@@ -2,6 +2,7 @@
 
 from PyQt6.QtWidgets import QTextEdit
 from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QTextCursor
 
 class TerminalView(QTextEdit):
     def __init__(self, parent=None):
@@ -12,6 +13,14 @@ class TerminalView(QTextEdit):
         self.append(text)
         self.ensureCursorVisible()
 
+    def stream_output(self, text):
+        # streamed chunks continue the current line instead of starting a new paragraph each
+        cursor = self.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        self.setTextCursor(cursor)
+        self.ensureCursorVisible()
+
 class TerminalHandler(QObject):
     output_received = pyqtSignal(str)
 
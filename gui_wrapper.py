@@ -301,13 +301,13 @@ class PromptButtonsToolBar(QToolBar):
 
     def load_prompts(self):
         try:
-            with open("prompts.json", "r") as f:
+            with open(files.get_abs_path("prompts.json"), "r") as f:
                 return json.load(f)
         except FileNotFoundError:
             return {}
 
     def save_prompts(self):
-        with open("prompts.json", "w") as f:
+        with open(files.get_abs_path("prompts.json"), "w") as f:
             json.dump(self.prompts, f)
 
     def insert_prompt(self, text):
@@ -438,4 +438,5 @@ def run_gui(agent):
     app = QApplication(sys.argv)
     window = MainWindow(agent)
     window.show()
+    app.aboutToQuit.connect(agent.context.close)
     sys.exit(app.exec())
\ No newline at end of file
@@ -10,7 +10,6 @@ from python.helpers import files
 import python.helpers.timed_input as timed_input
 
 input_lock = threading.Lock()
-os.chdir(files.get_abs_path("./work_dir"))
 
 # Set up logging
 log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_zero.log')
@@ -206,7 +205,10 @@ def run_terminal_mode():
         logger.info("Started key capture thread")
         agent0 = initialize()
         logger.info("Starting chat loop...")
-        chat(agent0)
+        try:
+            chat(agent0)
+        finally:
+            agent0.context.close()
     except Exception as e:
         logger.error(f"An error occurred during initialization: {str(e)}")
         logger.error(traceback.format_exc())
@@ -1,96 +1,198 @@
 import os
+import re
+import hashlib
+import importlib
+import inspect
+import functools
+import threading
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAI, OpenAIEmbeddings, AzureChatOpenAI, AzureOpenAIEmbeddings, AzureOpenAI
-from langchain_community.llms.ollama import Ollama
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_anthropic import ChatAnthropic
-from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI, HarmBlockThreshold, HarmCategory
-from pydantic.v1.types import SecretStr
+from python.helpers import files
 
 
-# Load environment variables
-load_dotenv()
+# Load environment variables, .env next to the code wherever the process was started from
+load_dotenv(files.get_abs_path(".env"))
 
 # Configuration
 DEFAULT_TEMPERATURE = 0.0
 
+# Provider classes are imported on first use only, so startup does not pay for every SDK
+# (langchain_huggingface alone pulls in sentence-transformers and torch)
+PROVIDERS = {
+    "ChatOpenAI": "langchain_openai",
+    "OpenAI": "langchain_openai",
+    "OpenAIEmbeddings": "langchain_openai",
+    "AzureChatOpenAI": "langchain_openai",
+    "AzureOpenAI": "langchain_openai",
+    "AzureOpenAIEmbeddings": "langchain_openai",
+    "Ollama": "langchain_community.llms.ollama",
+    "OllamaEmbeddings": "langchain_community.embeddings",
+    "ChatAnthropic": "langchain_anthropic",
+    "ChatGroq": "langchain_groq",
+    "HuggingFaceEmbeddings": "langchain_huggingface",
+    "ChatGoogleGenerativeAI": "langchain_google_genai",
+    "HarmBlockThreshold": "langchain_google_genai",
+    "HarmCategory": "langchain_google_genai",
+}
+
+loaded_providers: dict = {}
+providers_lock = threading.Lock()
+
+def provider(name: str):
+    with providers_lock:
+        if name not in loaded_providers:
+            loaded_providers[name] = getattr(importlib.import_module(PROVIDERS[name]), name)
+        return loaded_providers[name]
+
 # Utility function to get API keys from environment variables
 def get_api_key(service):
     return os.getenv(f"API_KEY_{service.upper()}") or os.getenv(f"{service.upper()}_API_KEY")
 
+# Model instances are cached by factory and arguments, so agents with the same configuration share
+# one client and its connection pool. Only a hash of the API key is part of the key.
+model_cache: dict[tuple, tuple[str, object]] = {}
+model_cache_lock = threading.Lock()
+
+def service_name(service: str) -> str:
+    # "Azure OpenAI", "openai_azure" and "OPENAI-AZURE" all name the same service
+    return "_".join(sorted(re.split(r"[\s_\-]+", service.lower().strip())))
+
+def cached(service: str = ""):
+    def decorator(factory):
+        signature = inspect.signature(factory)
+
+        @functools.wraps(factory)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            arguments = dict(arguments.arguments)
+            api_key = arguments.pop("api_key", None) or (get_api_key(service) if service else None)
+            key = (factory.__name__, tuple(sorted((name, repr(value)) for name, value in arguments.items())),
+                   hashlib.sha256(str(api_key).encode()).hexdigest() if api_key else "")
+            with model_cache_lock:
+                if key in model_cache: return model_cache[key][1]
+            model = factory(*args, **kwargs)
+            with model_cache_lock:
+                return model_cache.setdefault(key, (service_name(service), model))[1]
+        return wrapper
+    return decorator
+
+def invalidate(service: str = "") -> int:
+    # drops cached models of a service (all when empty) after its API key changed, reloading .env first
+    load_dotenv(files.get_abs_path(".env"), override=True)
+    name = service_name(service) if service else ""
+    with model_cache_lock:
+        keys = [key for key, (cached_service, _) in model_cache.items() if not name or cached_service == name]
+        for key in keys: del model_cache[key]
+    return len(keys)
+
 
 # Ollama models
+@cached()
 def get_ollama_chat(model_name:str, temperature=DEFAULT_TEMPERATURE, base_url="http://localhost:11434"):
-    return Ollama(model=model_name,temperature=temperature, base_url=base_url)
+    return provider("Ollama")(model=model_name,temperature=temperature, base_url=base_url)
 
+@cached()
 def get_ollama_embedding(model_name:str, temperature=DEFAULT_TEMPERATURE):
-    return OllamaEmbeddings(model=model_name,temperature=temperature)
+    return provider("OllamaEmbeddings")(model=model_name,temperature=temperature)
 
 # HuggingFace models
 
+@cached()
 def get_huggingface_embedding(model_name:str):
-    return HuggingFaceEmbeddings(model_name=model_name)
+    return provider("HuggingFaceEmbeddings")(model_name=model_name)
 
 # LM Studio and other OpenAI compatible interfaces
+@cached()
 def get_lmstudio_chat(model_name:str, base_url="http://localhost:1234/v1", temperature=DEFAULT_TEMPERATURE):
-    return ChatOpenAI(model_name=model_name, base_url=base_url, temperature=temperature, api_key="none") # type: ignore
+    return provider("ChatOpenAI")(model_name=model_name, base_url=base_url, temperature=temperature, api_key="none") # type: ignore
 
+@cached()
 def get_lmstudio_embedding(model_name:str, base_url="http://localhost:1234/v1"):
-    return OpenAIEmbeddings(model_name=model_name, base_url=base_url) # type: ignore
+    return provider("OpenAIEmbeddings")(model_name=model_name, base_url=base_url) # type: ignore
 
 # Anthropic models
+@cached("anthropic")
 def get_anthropic_chat(model_name:str, api_key=None, temperature=DEFAULT_TEMPERATURE):
     api_key = api_key or get_api_key("anthropic")
-    return ChatAnthropic(model_name=model_name, temperature=temperature, api_key=api_key) # type: ignore
+    # the beta header enables cache_control blocks, see python/helpers/prompt_cache.py
+    return provider("ChatAnthropic")(model_name=model_name, temperature=temperature, api_key=api_key, default_headers={"anthropic-beta": "prompt-caching-2024-07-31"}) # type: ignore
 
 # OpenAI models
+@cached("openai")
 def get_openai_chat(model_name:str, api_key=None, temperature=DEFAULT_TEMPERATURE):
     api_key = api_key or get_api_key("openai")
-    return ChatOpenAI(model_name=model_name, temperature=temperature, api_key=api_key) # type: ignore
+    # stream_usage reports prompt token usage, including cached tokens, at the end of a stream
+    return provider("ChatOpenAI")(model_name=model_name, temperature=temperature, api_key=api_key, stream_usage=True) # type: ignore
 
+@cached("openai")
 def get_openai_instruct(model_name:str,api_key=None, temperature=DEFAULT_TEMPERATURE):
     api_key = api_key or get_api_key("openai")
-    return OpenAI(model=model_name, temperature=temperature, api_key=api_key) # type: ignore
+    return provider("OpenAI")(model=model_name, temperature=temperature, api_key=api_key) # type: ignore
 
+@cached("openai")
 def get_openai_embedding(model_name:str, api_key=None):
     api_key = api_key or get_api_key("openai")
-    return OpenAIEmbeddings(model=model_name, api_key=api_key) # type: ignore
+    return provider("OpenAIEmbeddings")(model=model_name, api_key=api_key) # type: ignore
 
+@cached("openai_azure")
 def get_azure_openai_chat(deployment_name:str, api_key=None, temperature=DEFAULT_TEMPERATURE, azure_endpoint=None):
     api_key = api_key or get_api_key("openai_azure")
     azure_endpoint = azure_endpoint or os.getenv("OPENAI_AZURE_ENDPOINT")
-    return AzureChatOpenAI(deployment_name=deployment_name, temperature=temperature, api_key=api_key, azure_endpoint=azure_endpoint) # type: ignore
+    return provider("AzureChatOpenAI")(deployment_name=deployment_name, temperature=temperature, api_key=api_key, azure_endpoint=azure_endpoint) # type: ignore
 
+@cached("openai_azure")
 def get_azure_openai_instruct(deployment_name:str, api_key=None, temperature=DEFAULT_TEMPERATURE, azure_endpoint=None):
     api_key = api_key or get_api_key("openai_azure")
     azure_endpoint = azure_endpoint or os.getenv("OPENAI_AZURE_ENDPOINT")
-    return AzureOpenAI(deployment_name=deployment_name, temperature=temperature, api_key=api_key, azure_endpoint=azure_endpoint) # type: ignore
+    return provider("AzureOpenAI")(deployment_name=deployment_name, temperature=temperature, api_key=api_key, azure_endpoint=azure_endpoint) # type: ignore
 
+@cached("openai_azure")
 def get_azure_openai_embedding(deployment_name:str, api_key=None, azure_endpoint=None):
     api_key = api_key or get_api_key("openai_azure")
     azure_endpoint = azure_endpoint or os.getenv("OPENAI_AZURE_ENDPOINT")
-    return AzureOpenAIEmbeddings(deployment_name=deployment_name, api_key=api_key, azure_endpoint=azure_endpoint) # type: ignore
+    return provider("AzureOpenAIEmbeddings")(deployment_name=deployment_name, api_key=api_key, azure_endpoint=azure_endpoint) # type: ignore
 
 # Google models
+@cached("google")
 def get_google_chat(model_name:str, api_key=None, temperature=DEFAULT_TEMPERATURE):
     api_key = api_key or get_api_key("google")
-    return ChatGoogleGenerativeAI(model=model_name, temperature=temperature, google_api_key=api_key, safety_settings={HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE }) # type: ignore
+    return provider("ChatGoogleGenerativeAI")(model=model_name, temperature=temperature, google_api_key=api_key, safety_settings={provider("HarmCategory").HARM_CATEGORY_DANGEROUS_CONTENT: provider("HarmBlockThreshold").BLOCK_NONE }) # type: ignore
 
 # Groq models
+@cached("groq")
 def get_groq_chat(model_name:str, api_key=None, temperature=DEFAULT_TEMPERATURE):
     api_key = api_key or get_api_key("groq")
-    return ChatGroq(model_name=model_name, temperature=temperature, api_key=api_key) # type: ignore
+    return provider("ChatGroq")(model_name=model_name, temperature=temperature, api_key=api_key) # type: ignore
    
 # OpenRouter models
+@cached("openrouter")
 def get_openrouter(model_name: str="meta-llama/llama-3.1-8b-instruct:free", api_key=None, temperature=DEFAULT_TEMPERATURE):
     api_key = api_key or get_api_key("openrouter")
-    return ChatOpenAI(api_key=api_key, base_url="https://openrouter.ai/api/v1", model=model_name, temperature=temperature) # type: ignore
+    return provider("ChatOpenAI")(api_key=api_key, base_url="https://openrouter.ai/api/v1", model=model_name, temperature=temperature) # type: ignore
         
+@cached()
 def get_embedding_hf(model_name="sentence-transformers/all-MiniLM-L6-v2"):
-    return HuggingFaceEmbeddings(model_name=model_name)
+    return provider("HuggingFaceEmbeddings")(model_name=model_name)
 
+@cached("openai")
 def get_embedding_openai(api_key=None):
     api_key = api_key or get_api_key("openai")
-    return OpenAIEmbeddings(api_key=api_key) #type: ignore
+    return provider("OpenAIEmbeddings")(api_key=api_key) #type: ignore
+
+
+# Record/replay models for offline benchmarking, wrap a live model to record a session and replay it later without network
+def get_recording_chat(model, path:str):
+    from python.helpers import replay_llm
+    return replay_llm.RecordingChatModel(model=model, recorder=replay_llm.SessionRecorder(path))
+
+def get_replay_chat(path:str, realtime=False, strict=False):
+    from python.helpers import replay_llm
+    return replay_llm.ReplayChatModel(session=replay_llm.ReplaySession(path, strict=strict), realtime=realtime)
+
+def get_recording_embedding(model, path:str):
+    from python.helpers import replay_llm
+    return replay_llm.RecordingEmbeddings(model, replay_llm.SessionRecorder(path))
+
+def get_replay_embedding(path:str, dimensions=0, strict=False):
+    from python.helpers import replay_llm
+    return replay_llm.ReplayEmbeddings(replay_llm.ReplaySession(path, strict=strict), dimensions=dimensions)
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass
+from . import files
+
+# Large tool outputs live in a content addressed store in the agent's memory directory, history only keeps
+# a reference and a preview. The same content is stored once, the id is a prefix of its sha256.
+
+ID_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+@dataclass
+class Artifact:
+    id: str
+    path: str
+    chars: int
+    lines: int
+
+class ArtifactStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, artifact_id: str) -> str:
+        if not ID_PATTERN.match(artifact_id): raise ValueError(f"Invalid artifact id: {artifact_id}")
+        return os.path.join(self.directory, f"{artifact_id}.txt")
+
+    def put(self, text: str) -> Artifact:
+        artifact_id = hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()[:16]
+        path = self.path(artifact_id)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                # written aside and renamed, a reader never sees half an artifact
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "w", encoding="utf-8", newline="") as f: f.write(text)
+                os.replace(tmp, path)
+        return Artifact(id=artifact_id, path=path, chars=len(text), lines=text.count("\n") + 1)
+
+    def exists(self, artifact_id: str) -> bool:
+        return ID_PATTERN.match(artifact_id) is not None and os.path.exists(self.path(artifact_id))
+
+    def get(self, artifact_id: str) -> Artifact:
+        path = self.path(artifact_id)
+        chars, lines = 0, 0
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for line in f:
+                chars += len(line)
+                lines += 1
+        return Artifact(id=artifact_id, path=path, chars=chars, lines=max(lines, 1))
+
+    def read_lines(self, artifact_id: str, start_line: int = 1, max_chars: int = 3000, end_line: int = 0) -> tuple[str, int]:
+        # lines from start_line to end_line (1-based, inclusive, 0 for no end) until max_chars is used up,
+        # returns the text and the next line number (0 at the end of the artifact),
+        # a single line longer than max_chars is cut so paging always moves forward
+        out, used, next_line = [], 0, start_line
+        with open(self.path(artifact_id), "r", encoding="utf-8", newline="") as f:
+            for no, line in enumerate(f, start=1):
+                if no < start_line: continue
+                if end_line and no > end_line: break
+                line = line.rstrip("\r\n")
+                if used + len(line) + 1 > max_chars:
+                    if not out:
+                        out.append(line[:max_chars] + f" ... [{len(line) - max_chars} characters of this line omitted]")
+                        next_line = no + 1
+                    break
+                out.append(line)
+                used += len(line) + 1
+                next_line = no + 1
+            else:
+                next_line = 0  # end of artifact
+        return "\n".join(out), next_line
+
+# one store per directory, so agents sharing a directory share its lock
+stores: dict[str, ArtifactStore] = {}
+stores_lock = threading.Lock()
+
+def get_store(directory: str) -> ArtifactStore:
+    with stores_lock:
+        if directory not in stores:
+            stores[directory] = ArtifactStore(directory)
+        return stores[directory]
+
+def reference(artifact: Artifact) -> str:
+    return files.read_file("./prompts/fw.artifact_reference.md", artifact_id=artifact.id, chars=artifact.chars, lines=artifact.lines)
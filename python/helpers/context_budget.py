@@ -0,0 +1,51 @@
+from . import knowledge_packing
+
+# picks conversation context for one-shot helper calls (BigBrain) within a token budget,
+# tokens are estimated as characters / 4 like everywhere else in the agent
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / 4)
+
+def truncate_middle(text: str, max_tokens: int) -> str:
+    # long tool outputs keep their start and their end, which is where commands and errors are
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars: return text
+    half = max(0, max_chars // 2 - 20)
+    return f"{text[:half]}\n... [{len(text) - 2 * half} characters omitted] ...\n{text[-half:]}"
+
+def select_turns(history: list, max_tokens: int, max_message_tokens: int) -> list[str]:
+    # newest messages first until the budget is spent, returned in chronological order
+    selected, used = [], 0
+    for message in reversed(history):
+        text = truncate_middle(f"{message.type}: {message.content}", max_message_tokens)
+        tokens = estimate_tokens(text)
+        if used + tokens > max_tokens: break
+        selected.append(text)
+        used += tokens
+    return list(reversed(selected))
+
+def select_memories(query: str, memories: list[str], max_tokens: int) -> list[str]:
+    snippets = [knowledge_packing.Snippet(source="memory", text=text) for text in memories if text]
+    for snippet in snippets:
+        snippet.score = knowledge_packing.lexical_score(query, snippet.text)
+    return [snippet.text for snippet in knowledge_packing.pack(knowledge_packing.dedupe(snippets, []), max_tokens)]
+
+def build(query: str, history: list, task_summary: str = "", memories: list[str] | None = None, max_tokens: int = 4000,
+          summary_share: float = 0.2, memory_share: float = 0.3) -> str:
+    # task summary and memories get capped shares, recent turns fill whatever is left
+    sections = []
+    used = 0
+    if task_summary:
+        summary = truncate_middle(task_summary, int(max_tokens * summary_share))
+        sections.append(f"# Task summary\n{summary}")
+        used += estimate_tokens(summary)
+    if memories:
+        selected = select_memories(query, memories, int(max_tokens * memory_share))
+        if selected:
+            text = "\n\n".join(selected)
+            sections.append(f"# Relevant memories\n{text}")
+            used += estimate_tokens(text)
+    remaining = max(0, max_tokens - used)
+    turns = select_turns(history, remaining, max(1, remaining // 2))
+    if turns: sections.append("# Recent conversation\n" + "\n".join(turns))
+    return "\n\n".join(sections)
@@ -22,6 +22,15 @@ class DockerContainerManager:
             except Exception as e:
                 print(f"Failed to stop and remove the container: {e}")
 
+    def stop_container(self) -> None:
+        # stopped but kept, start_container starts it again with its state
+        if self.container:
+            try:
+                self.container.stop()
+                print(f"Stopped the container: {self.container.id}")
+            except Exception as e:
+                print(f"Failed to stop the container: {e}")
+
     def start_container(self) -> None:
         existing_container = None
         for container in self.client.containers.list(all=True):
@@ -0,0 +1,98 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+from . import files, thread_pool
+
+# a member is anything that turns a prompt into an answer: a model call or a whole agent message loop
+Member = Callable[[str], str]
+
+TOPOLOGIES = ("independent", "critique", "sequential")
+
+@dataclass
+class Draft:
+    member: str
+    content: str = ""
+    error: str = ""
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.content) and not self.error
+
+class DreamTeam:
+    # independent: all members draft concurrently, latency is the slowest member within its timeout
+    # critique: independent drafts, then each member revises its answer after reading the others
+    # sequential: each member sees all previous answers, the original serial behaviour
+
+    def __init__(self, members: dict[str, Member], topology: str = "independent", timeouts: Optional[dict[str, float]] = None,
+                 default_timeout: float = 120, quorum: int = 0, critique_rounds: int = 1):
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown DreamTeam topology '{topology}', expected one of {', '.join(TOPOLOGIES)}")
+        self.members = members
+        self.topology = topology
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.quorum = quorum
+        self.critique_rounds = critique_rounds
+
+    def run(self, query: str) -> list[Draft]:
+        if self.topology == "sequential":
+            return self._sequential(query)
+        drafts = self._concurrent({name: query for name in self.members})
+        if self.topology == "critique":
+            for _ in range(self.critique_rounds):
+                answered = [d for d in drafts if d.ok]
+                if len(answered) < 2: break
+                prompts = {d.member: critique_prompt(query, [o for o in answered if o is not d]) for d in answered}
+                revised = {d.member: d for d in self._concurrent(prompts) if d.ok}
+                # a member that fails to revise keeps its first draft
+                drafts = [revised.get(d.member, d) for d in drafts]
+        return drafts
+
+    def _call(self, name: str, prompt: str) -> Draft:
+        start = time.monotonic()
+        content = self.members[name](prompt)
+        return Draft(member=name, content=content, elapsed_ms=(time.monotonic() - start) * 1000)
+
+    def _concurrent(self, prompts: dict[str, str]) -> list[Draft]:
+        futures = {name: thread_pool.submit(self._call, name, prompt) for name, prompt in prompts.items()}
+        done = thread_pool.wait_with_deadlines(futures, self.timeouts, self.default_timeout, quorum=self.quorum)
+        drafts = []
+        for name in prompts:
+            if name in done.results: drafts.append(done.results[name])
+            elif name in done.timed_out: drafts.append(Draft(member=name, error=f"timed out after {done.timed_out[name]:g}s"))
+            elif name in done.not_started: drafts.append(Draft(member=name, error=f"not started within {done.not_started[name]:g}s, all workers were busy"))
+            elif name in done.failed: drafts.append(Draft(member=name, error=f"{type(done.failed[name]).__name__}: {done.failed[name]}"))
+            else: drafts.append(Draft(member=name, error="not needed, quorum reached"))
+        return drafts
+
+    def _sequential(self, query: str) -> list[Draft]:
+        drafts: list[Draft] = []
+        for name in self.members:
+            answered = [d for d in drafts if d.ok]
+            prompt = critique_prompt(query, answered) if answered else query
+            drafts += self._concurrent({name: prompt})
+        return drafts
+
+def render_drafts(drafts: list[Draft]) -> str:
+    return "\n\n".join(f"## {d.member}\n{d.content}" for d in drafts if d.ok)
+
+def critique_prompt(query: str, drafts: list[Draft]) -> str:
+    return files.read_file("./prompts/fw.dreamteam_critique.md", query=query, drafts=render_drafts(drafts))
+
+def consolidation_prompt(query: str, drafts: list[Draft]) -> str:
+    return files.read_file("./prompts/fw.dreamteam_consolidate.md", query=query, drafts=render_drafts(drafts))
+
+def consolidate(query: str, drafts: list[Draft], stream: Callable[[str], Iterable[str]], on_chunk: Optional[Callable[[str], None]] = None) -> str:
+    # streams the consolidation so the first tokens show up while the rest is generated,
+    # a single surviving draft needs no consolidation at all
+    answered = [d for d in drafts if d.ok]
+    if not answered: return ""
+    if len(answered) == 1:
+        if on_chunk: on_chunk(answered[0].content)
+        return answered[0].content
+    response = ""
+    for content in stream(consolidation_prompt(query, answered)):
+        if on_chunk: on_chunk(content)
+        response += content
+    return response
@@ -12,19 +12,31 @@
 #     result = api.run(query)
 #     return result
 
+import threading
 from duckduckgo_search import DDGS
+from . import search_cache, http_client
+
+# DDGS keeps its own http client, reuse one per thread instead of one per query
+local = threading.local()
+
+def get_client() -> DDGS:
+    if not hasattr(local, "ddgs"):
+        local.ddgs = DDGS(timeout=http_client.DEFAULT_TIMEOUT)
+    return local.ddgs
 
 def search(query: str, results = 5, region = "wt-wt", time="y") -> list[str]:
+    return [str(r) for r in search_results(query, results, region, time)]
+
+def search_results(query: str, results = 5, region = "wt-wt", time="y") -> list[dict]:
+    # cached per normalised query, region and time window, duplicates removed by url and content
+    return search_cache.cached("duckduckgo", f"{query}|{results}", lambda: fetch(query, results, region, time), region=region, time_window=time)
 
-    ddgs = DDGS()
-    src = ddgs.text(
+def fetch(query: str, results = 5, region = "wt-wt", time="y") -> list[dict]:
+    src = get_client().text(
         query,
         region=region,  # Specify region 
         safesearch="off",  # SafeSearch setting
         timelimit=time,  # Time limit (y = past year)
         max_results=results  # Number of results to return
     )
-    results = []
-    for s in src:
-        results.append(str(s))
-    return results
\ No newline at end of file
+    return search_cache.dedupe_results(list(src or []))
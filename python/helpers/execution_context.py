@@ -0,0 +1,70 @@
+import os
+import logging
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from . import files
+
+@dataclass
+class ExecutionContext:
+    # everything an agent used to get from the process-global working directory
+    # lives here, so several agents can run side by side in one interpreter
+    work_dir: str
+    memory_subdir: str = ""
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    logger: logging.Logger = field(default_factory=lambda: logging.getLogger("agent"))
+    shell: Any = None
+    children: list["ExecutionContext"] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get_abs_path(self, *relative_paths) -> str:
+        return os.path.join(self.work_dir, *relative_paths)
+
+    def get_memory_dir(self) -> str:
+        return files.get_abs_path("memory", self.memory_subdir)
+
+    def get_artifacts_dir(self) -> str:
+        # next to the memory, outside work_dir, which is mounted into the container and belongs to the user
+        return os.path.join(self.get_memory_dir(), "artifacts")
+
+    def lease_shell(self, factory: Callable[[], Any]) -> Any:
+        # the shell is created on first use and kept for the lifetime of the context
+        with self._lock:
+            if self.shell is None:
+                self.shell = factory()
+            return self.shell
+
+    def release_shell(self):
+        with self._lock:
+            shell, self.shell = self.shell, None
+        if shell is not None and hasattr(shell, "close"):
+            shell.close()
+
+    def set_work_dir(self, work_dir: str):
+        # a leased shell stays in the directory it was started in, it is released so the next use starts in work_dir
+        self.work_dir = work_dir
+        self.release_shell()
+        for child in list(self.children):
+            child.set_work_dir(work_dir)
+
+    def close(self):
+        for child in list(self.children):
+            child.close()
+        with self._lock:
+            self.children.clear()
+        self.release_shell()
+
+    def derive(self, name: Optional[str] = None) -> "ExecutionContext":
+        # subordinates share directories and session with their superior but get their own shell
+        logger = self.logger.getChild(name) if name else self.logger
+        child = ExecutionContext(work_dir=self.work_dir, memory_subdir=self.memory_subdir, session_id=self.session_id, logger=logger)
+        with self._lock:
+            self.children.append(child)
+        return child
+
+    def drop(self, child: "ExecutionContext"):
+        # a derived context that is replaced, e.g. by a subordinate reset, gives its shell back
+        with self._lock:
+            self.children = [c for c in self.children if c is not child]
+        child.close()
@@ -0,0 +1,103 @@
+import sys
+from typing import TYPE_CHECKING, Iterable, Optional
+if TYPE_CHECKING: from langchain_core.messages import BaseMessage
+
+# Conversation history of an agent. Consecutive messages of the same type are merged into one entry,
+# the entry keeps the parts in a list and joins them only when the content is read, so appending
+# never copies the growing text. Lengths are kept up to date on append, size queries do not rescan.
+
+SEPARATOR = "\n\n"
+
+class Entry:
+    __slots__ = ("type", "segments", "_content", "_length", "_message")
+
+    def __init__(self, type: str, content: str = ""):
+        self.type = type
+        self.segments = [content]
+        self._content: Optional[str] = content
+        self._length = len(content)
+        self._message: Optional["BaseMessage"] = None
+
+    def add(self, text: str) -> int:
+        # returns the number of characters added, separator included
+        self.segments.append(text)
+        self._content = None
+        self._message = None
+        added = len(SEPARATOR) + len(text)
+        self._length += added
+        return added
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = SEPARATOR.join(self.segments)
+            # the joined text replaces the parts, so it is not held twice
+            self.segments = [self._content]
+        return self._content
+
+    @property
+    def tokens(self) -> int:
+        return int(self._length / 4)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def to_message(self) -> "BaseMessage":
+        if self._message is None:
+            # imported on use, the history itself does not need langchain
+            from langchain_core.messages import AIMessage, HumanMessage
+            self._message = HumanMessage(content=self.content) if self.type == "human" else AIMessage(content=self.content)
+        return self._message
+
+    def size(self) -> int:
+        # bytes held by the entry, for memory usage reporting
+        return sys.getsizeof(self) + sys.getsizeof(self.segments) + sum(sys.getsizeof(s) for s in self.segments)
+
+class History:
+    def __init__(self, entries: Optional[Iterable[Entry]] = None):
+        self.entries: list[Entry] = list(entries or [])
+        self._chars = sum(len(e) for e in self.entries)
+
+    def append(self, type: str, text: str) -> Entry:
+        if self.entries and self.entries[-1].type == type:
+            entry = self.entries[-1]
+            self._chars += entry.add(text)
+        else:
+            entry = Entry(type, text)
+            self.entries.append(entry)
+            self._chars += len(entry)
+        return entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        # slices are plain lists of entries, like slicing the old message list
+        return self.entries[index]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __reversed__(self):
+        return reversed(self.entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    @property
+    def chars(self) -> int:
+        return self._chars
+
+    @property
+    def tokens(self) -> int:
+        return int(self._chars / 4)
+
+    def to_messages(self) -> list["BaseMessage"]:
+        return [e.to_message() for e in self.entries]
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.entries) + sum(e.size() for e in self.entries)
+
+def concat(entries: Iterable) -> str:
+    # entries or langchain messages, as "type: content" lines
+    return "\n".join(f"{e.type}: {e.content}" for e in entries)
@@ -0,0 +1,59 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# one place for timeouts, retries and connection pools of all online helpers
+DEFAULT_TIMEOUT = 30
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+POOL_SIZE = 32
+HTTP2 = True  # used by the httpx client when the h2 package is installed
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+session: requests.Session | None = None
+httpx_client = None
+lock = threading.Lock()
+
+class TimeoutSession(requests.Session):
+    # a hung upstream must not freeze an agent thread, so every request gets a timeout
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+def get_session() -> requests.Session:
+    global session
+    with lock:
+        if session is None:
+            # urllib3's default method set, only idempotent requests are repeated, a POST is never sent twice
+            retry = Retry(total=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, status_forcelist=RETRY_STATUSES,
+                          allowed_methods=Retry.DEFAULT_ALLOWED_METHODS, respect_retry_after_header=True, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+            session = TimeoutSession()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        return session
+
+def get_httpx_client():
+    # shared client for SDKs built on httpx (openai), keeps connections alive between queries
+    global httpx_client
+    with lock:
+        if httpx_client is None:
+            import httpx
+            try:
+                import h2 # noqa: F401
+                http2 = HTTP2
+            except ImportError:
+                http2 = False
+            # with an explicit transport httpx ignores the client's limits and http2, so they are set on the transport
+            transport = httpx.HTTPTransport(http2=http2, retries=MAX_RETRIES,
+                                            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE))
+            httpx_client = httpx.Client(timeout=httpx.Timeout(DEFAULT_TIMEOUT), transport=transport)
+        return httpx_client
+
+def get(url: str, **kwargs) -> requests.Response:
+    return get_session().get(url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return get_session().post(url, **kwargs)
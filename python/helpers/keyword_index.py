@@ -0,0 +1,105 @@
+import re
+import sqlite3
+import threading
+from typing import Callable
+
+MAX_QUERY_TERMS = 64
+MIN_TERM_CHARS = 3
+
+# words that match nearly every memory and only add noise to an OR query
+STOP_WORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being between both but by can could did do
+does doing down during each few for from further had has have having he her here hers him his how i if in into is it its
+just me more most my no nor not now of off on once only or other our out over own same she should so some such than that
+the their them then there these they this those through to too under until up very was we were what when where which while
+who whom why will with would you your yours
+""".split())
+
+def query_terms(query: str) -> list[str]:
+    # identifiers like file names, error codes and GUIDs stay together as phrase terms,
+    # stop words and very short words are dropped unless they carry a digit (e.g. "e5", "42")
+    terms = []
+    for term in re.findall(r"[\w][\w.\-/:]*", query.lower()):
+        term = term.strip(".-/:")
+        if not term or term in STOP_WORDS: continue
+        if len(term) < MIN_TERM_CHARS and not any(c.isdigit() for c in term): continue
+        if term not in terms: terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+def matched_terms(terms: list[str], content: str) -> int:
+    content = content.lower()
+    return sum(1 for term in terms if term in content)
+
+def rrf(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    # reciprocal-rank fusion of several ranked id lists
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking):
+            scores[id] = scores.get(id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class KeywordIndex:
+    # local full-text index kept next to the vector store, BM25 ranked by SQLite FTS5
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS memories USING fts5(id UNINDEXED, content)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # sqlite built without FTS5, fall back to a plain table and term counting
+            self.conn.execute("CREATE TABLE IF NOT EXISTS memories_plain (id TEXT PRIMARY KEY, content TEXT)")
+            self.fts = False
+        self.conn.commit()
+
+    @property
+    def table(self) -> str:
+        return "memories" if self.fts else "memories_plain"
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute(f"SELECT count(*) FROM {self.table}").fetchone()[0]
+
+    def add(self, items: list[tuple[str, str]]):
+        with self._lock:
+            self.conn.executemany(f"INSERT INTO {self.table} (id, content) VALUES (?, ?)", items)
+            self.conn.commit()
+
+    def sync(self, ids: list[str], load: Callable[[], list[tuple[str, str]]]) -> bool:
+        # rebuilt from the store when it holds other documents than the index, e.g. after a crash between the two writes,
+        # load is only called then, returns True when the index was rebuilt
+        with self._lock:
+            indexed = {row[0] for row in self.conn.execute(f"SELECT id FROM {self.table}")}
+        if indexed == set(ids): return False
+        items = load()
+        with self._lock:
+            self.conn.execute(f"DELETE FROM {self.table}")
+            self.conn.executemany(f"INSERT INTO {self.table} (id, content) VALUES (?, ?)", items)
+            self.conn.commit()
+        return True
+
+    def delete(self, ids: list[str]):
+        if not ids: return
+        with self._lock:
+            self.conn.executemany(f"DELETE FROM {self.table} WHERE id = ?", [(id,) for id in ids])
+            self.conn.commit()
+
+    def search(self, query: str, results: int = 5, min_terms: int = 2) -> list[tuple[str, float]]:
+        # a hit has to contain min_terms of the query terms (all of them for shorter queries),
+        # so one shared common word is not enough to be recalled
+        terms = query_terms(query)
+        if not terms: return []
+        required = min(min_terms, len(terms))
+        with self._lock:
+            if self.fts:
+                match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+                rows = self.conn.execute("SELECT id, content, bm25(memories) FROM memories WHERE memories MATCH ? ORDER BY bm25(memories) LIMIT ?",
+                                         (match, results * 4)).fetchall()
+                return [(id, -score) for id, content, score in rows if matched_terms(terms, content) >= required][:results]
+
+            where = " OR ".join("content LIKE ?" for _ in terms)
+            rows = self.conn.execute(f"SELECT id, content FROM memories_plain WHERE {where}", [f"%{t}%" for t in terms]).fetchall()
+        scored = [(id, float(sum(content.lower().count(t) for t in terms))) for id, content in rows if matched_terms(terms, content) >= required]
+        return sorted(scored, key=lambda item: item[1], reverse=True)[:results]
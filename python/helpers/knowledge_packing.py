@@ -0,0 +1,107 @@
+import math
+import re
+from dataclasses import dataclass, replace
+from typing import Any
+from . import search_cache
+
+@dataclass
+class Snippet:
+    source: str
+    text: str
+    title: str = ""
+    url: str = ""
+    id: str = ""
+    score: float = 0.0
+
+    @property
+    def tokens(self) -> int:
+        return int(len(self.render()) / 4)
+
+    def render(self) -> str:
+        head = " - ".join(part for part in (self.title, self.url, f"id: {self.id}" if self.id else "") if part)
+        return f"[{head}] {self.text}" if head else self.text
+
+def from_perplexity(text: str, min_chars: int = 80) -> list[Snippet]:
+    # split the answer into paragraphs, short ones are merged with the next
+    snippets, buffer = [], ""
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        buffer = f"{buffer}\n{paragraph}".strip() if buffer else paragraph.strip()
+        if len(buffer) >= min_chars:
+            snippets.append(Snippet(source="perplexity", text=buffer))
+            buffer = ""
+    if buffer: snippets.append(Snippet(source="perplexity", text=buffer))
+    return snippets
+
+def from_duckduckgo(results: list[dict]) -> list[Snippet]:
+    return [Snippet(source="duckduckgo", text=r.get("body", ""), title=r.get("title", ""), url=r.get("href", ""))
+            for r in results or [] if r.get("body")]
+
+def from_memory(docs: list[Any]) -> list[Snippet]:
+    return [Snippet(source="memory", text=doc.page_content, id=str(doc.metadata.get("id", "")))
+            for doc in docs or []]
+
+def cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def lexical_score(question: str, text: str) -> float:
+    terms = set(re.findall(r"\w+", question.lower()))
+    words = set(re.findall(r"\w+", text.lower()))
+    return len(terms & words) / len(terms) if terms else 0.0
+
+def score(question: str, snippets: list[Snippet], embeddings_model=None) -> list[list[float]]:
+    # one query embedding and one batch for the snippets, lexical overlap if embedding fails
+    vectors: list[list[float]] = []
+    if embeddings_model is not None and snippets:
+        try:
+            query = embeddings_model.embed_query(question)
+            vectors = embeddings_model.embed_documents([s.text for s in snippets])
+            for snippet, vector in zip(snippets, vectors):
+                snippet.score = cosine(query, vector)
+            return vectors
+        except Exception:
+            vectors = []
+    for snippet in snippets:
+        snippet.score = lexical_score(question, snippet.text)
+    return vectors
+
+def dedupe(snippets: list[Snippet], vectors: list[list[float]], near_duplicate: float = 0.95) -> list[Snippet]:
+    # best scored first, exact copies by content hash and near copies by embedding are dropped
+    order = sorted(range(len(snippets)), key=lambda i: snippets[i].score, reverse=True)
+    kept, hashes, kept_vectors = [], set(), []
+    for i in order:
+        digest = search_cache.content_hash(snippets[i].text)
+        if digest in hashes: continue
+        if vectors and any(cosine(vectors[i], v) >= near_duplicate for v in kept_vectors): continue
+        hashes.add(digest)
+        if vectors: kept_vectors.append(vectors[i])
+        kept.append(snippets[i])
+    return kept
+
+def truncate(snippet: Snippet, max_tokens: int) -> Snippet:
+    # cut at a word boundary so the rendered snippet, title and url included, fits max_tokens
+    room = max_tokens * 4 - (len(snippet.render()) - len(snippet.text)) - 4
+    text = snippet.text[:max(0, room)]
+    if " " in text: text = text[:text.rindex(" ")]
+    return replace(snippet, text=text + " ...")
+
+def pack(snippets: list[Snippet], max_tokens: int, min_tokens: int = 16) -> list[Snippet]:
+    # greedy by score, a snippet that does not fit is skipped so smaller ones can still use the budget,
+    # except the best one larger than the whole budget (a single long answer), which is cut to what is left
+    packed, used, truncated = [], 0, False
+    for snippet in sorted(snippets, key=lambda s: s.score, reverse=True):
+        remaining = max_tokens - used
+        if snippet.tokens > remaining:
+            if truncated or snippet.tokens <= max_tokens or remaining < min_tokens: continue
+            snippet, truncated = truncate(snippet, remaining), True
+        packed.append(snippet)
+        used += snippet.tokens
+    return packed
+
+def select(question: str, snippets: list[Snippet], max_tokens: int, embeddings_model=None) -> list[Snippet]:
+    vectors = score(question, snippets, embeddings_model)
+    return pack(dedupe(snippets, vectors), max_tokens)
+
+def render(snippets: list[Snippet], sources: tuple[str, ...]) -> str:
+    return "\n\n".join(s.render() for s in snippets if s.source in sources)
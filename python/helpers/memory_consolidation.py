@@ -0,0 +1,79 @@
+import threading
+import numpy as np
+from . import files, memory_metadata, thread_pool, tracing
+
+# saves per database since the last compaction, and databases with a compaction in progress
+writes: dict[int, int] = {}
+running: set[int] = set()
+lock = threading.Lock()
+
+def relevance(similarity: np.ndarray) -> np.ndarray:
+    # cosine similarity to the relevance scale used by memory thresholds, Chroma's 1 - L2 distance / sqrt(2)
+    return 1.0 - (2.0 - 2.0 * similarity) / np.sqrt(2.0)
+
+def cluster(items: list[tuple[str, str, list[float], dict]], threshold: float, max_size: int = 8,
+            block: int = 1024) -> list[list[tuple[str, str, dict]]]:
+    # greedy single pass: each unassigned memory seeds a cluster of its unassigned near neighbours,
+    # similarities are computed for one block of seeds at a time, never the whole n x n matrix
+    if len(items) < 2: return []
+    matrix = np.asarray([item[2] for item in items], dtype=np.float32)
+    matrix /= np.where((norms := np.linalg.norm(matrix, axis=1, keepdims=True)) == 0, 1, norms)
+    assigned = np.zeros(len(items), dtype=bool)
+    clusters = []
+    for start in range(0, len(items), block):
+        close = relevance(matrix[start:start + block] @ matrix.T) >= threshold
+        for seed in range(start, min(start + block, len(items))):
+            if assigned[seed]: continue
+            members = [i for i in np.nonzero(close[seed - start] & ~assigned)[0][:max_size]]
+            assigned[members] = True
+            if len(members) > 1:
+                clusters.append([(items[i][0], items[i][1], items[i][3]) for i in members])
+    return sorted(clusters, key=len, reverse=True)
+
+def merge(agent, texts: list[str]) -> str:
+    # one memory that keeps every detail of the given ones, written by the utility model
+    from langchain_core.messages import HumanMessage, SystemMessage
+    system = files.read_file("./prompts/msg.memory_merge.md")
+    msg = "\n\n".join(f"# Memory {i + 1}\n{text}" for i, text in enumerate(texts))
+    with tracing.span("memory_merge", agent, memories=len(texts)):
+        call = agent.rate_limiter.limit_call_and_input(int((len(system) + len(msg)) / 4))
+        response = agent.config.utility_model.invoke([SystemMessage(content=system), HumanMessage(content=msg)])
+        merged = str(getattr(response, "content", response)).strip()
+        agent.rate_limiter.set_output_tokens(int(len(merged) / 4), call)
+    return merged
+
+def consolidate(agent, db, threshold: float, max_clusters: int = 20) -> int:
+    # returns the number of memories removed by merging
+    removed = 0
+    with tracing.span("memory_consolidate", agent, threshold=threshold) as span:
+        for members in cluster(db.get_all(), threshold)[:max_clusters]:
+            merged = merge(agent, [text for _, text, _ in members])
+            if not merged: continue
+            metadata = memory_metadata.merged(agent, "memory_consolidation", [meta for _, _, meta in members])
+            db.replace_documents([id for id, _, _ in members], merged, metadata)
+            removed += len(members) - 1
+        span.set(removed=removed)
+    if removed: agent.context.logger.info("Memory consolidation merged away %d memories", removed)
+    return removed
+
+def schedule(agent, db):
+    # counts saves and starts a background compaction every memory_consolidate_every of them
+    every = agent.config.memory_consolidate_every
+    if every <= 0: return
+    key = id(db)
+    with lock:
+        writes[key] = writes.get(key, 0) + 1
+        if writes[key] < every or key in running: return
+        writes[key] = 0
+        running.add(key)
+    thread_pool.submit(run, agent, db, key)
+
+def run(agent, db, key: int):
+    # a trace of its own, the save that triggered the job has long finished its span
+    tracing.current_span.set(None)
+    try:
+        consolidate(agent, db, agent.config.memory_consolidate_threshold)
+    except Exception as e:
+        agent.context.logger.warning("Memory consolidation failed: %s", e)
+    finally:
+        with lock: running.discard(key)
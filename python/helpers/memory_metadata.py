@@ -0,0 +1,76 @@
+import re
+import time
+from typing import Any
+
+# memory metadata is kept flat (str, int, float, bool) so Chroma can index and filter it,
+# tags are stored both as one comma separated string and as boolean tag_<name> keys
+
+DAY = 86400
+
+def parse_tags(text: Any) -> list[str]:
+    if isinstance(text, (list, tuple)): text = ",".join(str(t) for t in text)
+    tags = []
+    for tag in str(text or "").split(","):
+        tag = re.sub(r"\W+", "_", tag.strip().lower()).strip("_")
+        if tag and tag not in tags: tags.append(tag)
+    return tags
+
+def build(agent, tool: str = "", tags: Any = (), timestamp: float = 0, session: str = "") -> dict:
+    metadata: dict[str, Any] = {
+        "agent": agent.number,
+        "session": session or agent.context.session_id,
+        "tool": tool,
+        "timestamp": timestamp or time.time(),
+    }
+    tags = parse_tags(tags)
+    metadata["tags"] = ",".join(tags)
+    metadata.update({f"tag_{tag}": True for tag in tags})
+    return metadata
+
+def merged(agent, tool: str, metadatas: list[dict]) -> dict:
+    # metadata of a memory merged from others, it is as old as the oldest of them and stays in its session
+    dated = [m for m in metadatas if m and m.get("timestamp")]
+    oldest = min(dated, key=lambda m: float(m["timestamp"])) if dated else {}
+    return build(agent, tool, merge_tags(metadatas), float(oldest.get("timestamp", 0)), str(oldest.get("session", "")))
+
+def merge_tags(metadatas: list[dict]) -> list[str]:
+    tags = []
+    for metadata in metadatas:
+        for tag in parse_tags((metadata or {}).get("tags", "")):
+            if tag not in tags: tags.append(tag)
+    return tags
+
+def where(session: str = "", agent: int | None = None, tags: Any = (), since: float = 0) -> dict | None:
+    # Chroma where clause, None when nothing is filtered
+    conditions: list[dict] = []
+    if session: conditions.append({"session": session})
+    if agent is not None: conditions.append({"agent": agent})
+    conditions += [{f"tag_{tag}": True} for tag in parse_tags(tags)]
+    if since: conditions.append({"timestamp": {"$gte": since}})
+    if not conditions: return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def matches(metadata: dict, clause: dict | None) -> bool:
+    # the subset of the Chroma where syntax produced above, for backends without a query engine
+    if not clause: return True
+    if "$and" in clause: return all(matches(metadata, c) for c in clause["$and"])
+    for key, condition in clause.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$gte" in condition and (value is None or value < condition["$gte"]): return False
+        elif value != condition: return False
+    return True
+
+def decay(metadata: dict, half_life_days: float, now: float = 0) -> float:
+    # 1 for a fresh memory, 0.5 after one half-life, memories without a timestamp count as fresh
+    timestamp = (metadata or {}).get("timestamp")
+    if half_life_days <= 0 or not timestamp: return 1.0
+    age = max(0.0, (now or time.time()) - float(timestamp))
+    return 0.5 ** (age / (half_life_days * DAY))
+
+def rank(scored: list[tuple[Any, float]], half_life_days: float = 0) -> list[Any]:
+    # documents by score, scaled down by age when decay is enabled
+    if half_life_days > 0:
+        now = time.time()
+        scored = [(doc, score * decay(doc.metadata, half_life_days, now)) for doc, score in scored]
+    return [doc for doc, _ in sorted(scored, key=lambda item: item[1], reverse=True)]
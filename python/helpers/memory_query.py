@@ -0,0 +1,37 @@
+from . import extract_tools
+
+# builds short retrieval queries for automatic memory recall instead of embedding the whole history
+
+def clip(text: str, max_chars: int) -> str:
+    # the end of a message is usually the most specific part, so keep that
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= max_chars else text[-max_chars:]
+
+def tool_intents(history: list, count: int = 2) -> list[str]:
+    # thoughts and tool calls of the latest agent messages, newest first
+    intents = []
+    for message in reversed(history):
+        if len(intents) >= count: break
+        if message.type != "ai": continue
+        data = extract_tools.json_parse_dirty(str(message.content))
+        if not data: continue
+        thoughts = data.get("thoughts") or []
+        if isinstance(thoughts, list): thoughts = " ".join(str(t) for t in thoughts[-2:])
+        args = data.get("tool_args") or {}
+        args = " ".join(str(v) for v in args.values()) if isinstance(args, dict) else str(args)
+        intents.append(f"{thoughts} {data.get('tool_name', '')} {args}".strip())
+    return intents
+
+def build(agent, max_chars: int = 2000, multi: bool = True) -> list[str]:
+    # last user message, latest tool intents and the running task summary, each capped;
+    # one query per part for multi-query retrieval or a single joined query
+    parts = [
+        clip(agent.last_user_message, max_chars),
+        clip(" ".join(tool_intents(agent.history)), max_chars),
+        clip(agent.task_summary, max_chars),
+    ]
+    queries = []
+    for part in parts:
+        if part and part not in queries: queries.append(part)
+    if multi or not queries: return queries
+    return [clip(" ".join(queries), max_chars)]
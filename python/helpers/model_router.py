@@ -0,0 +1,90 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+# signals that the cheap model is struggling with the current step
+SIGNALS = ("misformat", "repeat", "tool_error", "low_confidence", "error")
+
+LOW_CONFIDENCE = re.compile(r"\b(i('m| am) not sure|i don'?t know|i('m| am) unable to|i cannot determine|not certain|i('m| am) confused)\b", re.IGNORECASE)
+
+def is_low_confidence(text: str) -> bool:
+    return bool(LOW_CONFIDENCE.search(text or ""))
+
+@dataclass
+class RouteStats:
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_ms: float = 0.0
+    first_token_ms: float = 0.0
+    cost: float = 0.0
+    signals: dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "mean_ms": round(self.total_ms / calls, 1),
+            "mean_first_token_ms": round(self.first_token_ms / calls, 1),
+            "cost": round(self.cost, 6),
+            "tokens_per_dollar": round((self.input_tokens + self.output_tokens) / self.cost) if self.cost else None,
+            "signals": dict(self.signals),
+        }
+
+class ModelRouter:
+    # every step starts on the cheap route, escalate_after signals in a row move to the expensive route
+    # and deescalate_after clean steps there move back
+
+    def __init__(self, cheap, expensive, escalate_after: int = 2, deescalate_after: int = 3, prices: dict[str, tuple[float, float]] | None = None):
+        self.models = {"cheap": cheap, "expensive": expensive}
+        self.escalate_after = escalate_after
+        self.deescalate_after = deescalate_after
+        self.prices = prices or {}  # per model id: (USD per 1M input tokens, USD per 1M output tokens)
+        self.route = "cheap"
+        self.failures = 0
+        self.successes = 0
+        self.signalled = False
+        self.stats = {route: RouteStats() for route in self.models}
+        self._lock = threading.Lock()
+
+    def select(self) -> tuple[str, Any]:
+        self.signalled = False
+        return self.route, self.models[self.route]
+
+    def signal(self, kind: str):
+        with self._lock:
+            self.signalled = True
+            stats = self.stats[self.route]
+            stats.signals[kind] = stats.signals.get(kind, 0) + 1
+            self.successes = 0
+            self.failures += 1
+            # a repeated message means the model is stuck, no point in retrying it
+            if self.route == "cheap" and (kind == "repeat" or self.failures >= self.escalate_after):
+                self.route, self.failures = "expensive", 0
+
+    def end_step(self):
+        # a step without signals counts as success
+        with self._lock:
+            if self.signalled: return
+            self.failures = 0
+            self.successes += 1
+            if self.route == "expensive" and self.successes >= self.deescalate_after:
+                self.route, self.successes = "cheap", 0
+
+    def record(self, route: str, model_id: str, input_tokens: int, output_tokens: int, elapsed_ms: float, first_token_ms: float = 0.0):
+        price_in, price_out = self.prices.get(model_id, (0.0, 0.0))
+        with self._lock:
+            stats = self.stats[route]
+            stats.calls += 1
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.total_ms += elapsed_ms
+            stats.first_token_ms += first_token_ms
+            stats.cost += (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {route: stats.to_dict() for route, stats in self.stats.items()}
@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from . import files
+from .keyword_index import KeywordIndex, rrf
+from . import memory_metadata
+
+class NumpyVectorDB:
+    # In-process alternative to the Chroma backed VectorDB for small and medium memory stores.
+    # Normalised embeddings live in one contiguous float32 file mapped into memory, documents and
+    # deletions in an append-only JSON lines log. Deleted rows are tombstoned and the files are
+    # compacted once enough of them pile up. Same public methods as VectorDB, no chromadb import.
+    # A document is logged before its vector is appended, a crash in between leaves a log record
+    # without vector, which is dropped on the next load. Compaction writes a new generation of both
+    # files and switches to it by rewriting meta.json, so the two files always belong together.
+
+    def __init__(self, embeddings_model: Embeddings, in_memory=False, cache_dir="./cache", compact_ratio=0.25):
+        print("Initializing NumpyVectorDB...")
+        self.embeddings_model = embeddings_model
+        self.compact_ratio = compact_ratio
+        self.dir = files.get_abs_path(cache_dir, "numpy")
+        os.makedirs(self.dir, exist_ok=True)
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self._lock = threading.RLock()
+
+        self.dim = 0
+        self.generation = 0
+        self.ids: list[str] = []
+        self.texts: list[str] = []
+        self.metadatas: list[dict] = []
+        self.rows: dict[str, int] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.matrix: np.ndarray | None = None
+        self._load()
+
+        # an index of its own, the Chroma backend keeps other ids in the same memory directory
+        self.keywords = KeywordIndex(os.path.join(self.dir, "keywords.db"))
+        self.keywords.sync(list(self.rows), lambda: [(id, self.texts[row]) for id, row in self.rows.items()])
+
+    def _paths(self, generation: int) -> tuple[str, str]:
+        suffix = f".{generation}" if generation else ""
+        return os.path.join(self.dir, f"vectors{suffix}.f32"), os.path.join(self.dir, f"documents{suffix}.jsonl")
+
+    @property
+    def vectors_path(self) -> str:
+        return self._paths(self.generation)[0]
+
+    @property
+    def log_path(self) -> str:
+        return self._paths(self.generation)[1]
+
+    def _write_meta(self):
+        with open(self.meta_path + ".tmp", "w") as f: json.dump({"dim": self.dim, "generation": self.generation}, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def _load(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f: meta = json.load(f)
+            self.dim, self.generation = meta["dim"], meta.get("generation", 0)
+        deleted = set()
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip(): continue
+                    try: record = json.loads(line)
+                    except json.JSONDecodeError: continue # torn last line of an interrupted write
+                    if "deleted" in record:
+                        deleted.add(record["deleted"])
+                        continue
+                    self.rows[record["id"]] = len(self.ids)
+                    self.ids.append(record["id"])
+                    self.texts.append(record["text"])
+                    self.metadatas.append(record["metadata"])
+        self._repair()
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        for id in deleted:
+            row = self.rows.pop(id, None)
+            if row is not None: self.alive[row] = False
+
+    def _repair(self):
+        # the vector file has to hold exactly one row per logged document, a partial vector write is cut off
+        # and documents whose vector never made it to disk are dropped from the log
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if size == len(self.ids) * row_bytes: return
+        rows = min(len(self.ids), size // row_bytes if row_bytes else 0)
+        print(f"NumpyVectorDB: repairing {self.dir}, {len(self.ids)} documents, {size / row_bytes if row_bytes else 0:g} vectors, keeping {rows}")
+        with open(self.vectors_path, "ab") as f: f.truncate(rows * row_bytes)
+        if rows < len(self.ids):
+            dropped = set(self.ids[rows:])
+            del self.ids[rows:], self.texts[rows:], self.metadatas[rows:]
+            for id in dropped: self.rows.pop(id, None)
+            with open(self.log_path + ".tmp", "w", encoding="utf-8") as f:
+                for id, text, metadata in zip(self.ids, self.texts, self.metadatas):
+                    f.write(json.dumps({"id": id, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+            os.replace(self.log_path + ".tmp", self.log_path)
+
+    def _get_matrix(self) -> np.ndarray:
+        # remapped lazily after appends, the OS page cache keeps it warm
+        if self.matrix is None or len(self.matrix) != len(self.ids):
+            if not self.ids: return np.zeros((0, self.dim or 1), dtype=np.float32)
+            self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+        return self.matrix
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        array = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(array, axis=-1, keepdims=True)
+        return array / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def relevance(similarity: np.ndarray) -> np.ndarray:
+        # Chroma's default space reports squared L2 distance, 2 - 2 * cosine for normalised vectors,
+        # and langchain turns it into 1 - distance / sqrt(2), the same formula keeps thresholds equal
+        return 1.0 - (2.0 - 2.0 * similarity) / np.sqrt(2.0)
+
+    def _scores(self, query_vector, filter=None) -> np.ndarray:
+        matrix = self._get_matrix()
+        if not len(matrix): return np.zeros(0, dtype=np.float32)
+        scores = matrix @ self._normalize(query_vector)
+        scores[~self.alive] = -np.inf
+        if filter:
+            # no query engine here, metadata filters are evaluated row by row
+            scores[[row for row, meta in enumerate(self.metadatas) if not memory_metadata.matches(meta, filter)]] = -np.inf
+        return scores
+
+    def _top(self, scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, int(self.alive.sum()))
+        if k <= 0: return np.zeros(0, dtype=int)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top[np.isfinite(scores[top])]
+
+    def _document(self, row: int) -> Document:
+        return Document(self.texts[row], metadata=self.metadatas[row])
+
+    def search_similarity(self, query, results=3):
+        with self._lock:
+            scores = self._scores(self.embeddings_model.embed_query(query))
+            return [self._document(row) for row in self._top(scores, results)]
+
+    def search_similarity_threshold(self, query, results=3, threshold=0.5, filter=None, half_life_days=0):
+        fetch = results * 2 if half_life_days > 0 else results
+        scored = [(doc, score) for doc, score in self.search_similarity_scored(query, fetch, filter) if score >= threshold]
+        return memory_metadata.rank(scored, half_life_days)[:results]
+
+    def search_similarity_scored(self, query, results=3, filter=None):
+        with self._lock:
+            scores = self._scores(self.embeddings_model.embed_query(query), filter)
+            top = self._top(scores, results)
+            return [(self._document(row), float(score)) for row, score in zip(top, self.relevance(scores[top]))]
+
+    def search_max_rel(self, query, results=3, fetch_k=20, lambda_mult=0.5):
+        with self._lock:
+            scores = self._scores(self.embeddings_model.embed_query(query))
+            candidates = list(self._top(scores, fetch_k))
+            matrix = self._get_matrix()
+            selected: list[int] = []
+            while candidates and len(selected) < results:
+                redundancy = (matrix[candidates] @ matrix[selected].T).max(axis=1) if selected else np.zeros(len(candidates))
+                best = int(np.argmax(lambda_mult * scores[candidates] - (1 - lambda_mult) * redundancy))
+                selected.append(candidates.pop(best))
+            return [self._document(row) for row in selected]
+
+    def search_keyword(self, query, results=3, filter=None):
+        ids = [id for id, _ in self.keywords.search(query, results * 4 if filter else results)]
+        return self.get_documents_by_ids(ids, filter)[:results]
+
+    def search_hybrid(self, query, results=3, threshold=0.5, mode="hybrid", filter=None, half_life_days=0):
+        if mode == "vector": return self.search_similarity_threshold(query, results, threshold, filter, half_life_days)
+        keyword_ids = [doc.metadata["id"] for doc in self.search_keyword(query, results * 2, filter)]
+        with self._lock:
+            if mode == "keyword":
+                fused = rrf([keyword_ids])
+            else:
+                # keyword hits have to pass the same relevance threshold as the vector ones
+                scores = self._scores(self.embeddings_model.embed_query(query), filter)
+                relevance = self.relevance(scores)
+                vector_ids = [self.ids[row] for row in self._top(scores, results * 2) if relevance[row] >= threshold]
+                keyword_ids = [id for id in keyword_ids if id in self.rows and relevance[self.rows[id]] >= threshold]
+                fused = rrf([vector_ids, keyword_ids])
+            scored = [(self._document(self.rows[id]), score) for id, score in fused if id in self.rows]
+        return memory_metadata.rank(scored, half_life_days)[:results]
+
+    def get_documents_by_ids(self, ids: list[str], filter=None):
+        with self._lock:
+            docs = [self._document(self.rows[id]) for id in ids if id in self.rows]
+        return [doc for doc in docs if memory_metadata.matches(doc.metadata, filter)]
+
+    def insert_document(self, data, metadata: dict | None = None):
+        id = str(uuid.uuid4())
+        metadata = {**(metadata or {}), "id": id}
+        vector = self._normalize(self.embeddings_model.embed_documents([data])[0])
+        with self._lock:
+            if not self.dim:
+                self.dim = len(vector)
+                self._write_meta()
+            # log first, a vector without its document can not be told apart from the next one
+            self._append_log({"id": id, "text": data, "metadata": metadata})
+            with open(self.vectors_path, "ab") as f: f.write(vector.tobytes())
+            self.rows[id] = len(self.ids)
+            self.ids.append(id)
+            self.texts.append(data)
+            self.metadatas.append(metadata)
+            self.alive = np.append(self.alive, True)
+        self.keywords.add([(id, data)])
+        return id
+
+    def replace_documents(self, ids: list[str], data, metadata: dict | None = None):
+        id = self.insert_document(data, metadata)
+        self.delete_documents_by_ids(ids)
+        return id
+
+    def get_all(self):
+        with self._lock:
+            matrix = self._get_matrix()
+            return [(id, self.texts[row], np.array(matrix[row]), self.metadatas[row]) for id, row in self.rows.items()]
+
+    def delete_documents_by_ids(self, ids: list[str]):
+        with self._lock:
+            found = [id for id in ids if id in self.rows]
+            for id in found:
+                self.alive[self.rows.pop(id)] = False
+                self._append_log({"deleted": id})
+            self._maybe_compact()
+        self.keywords.delete(found)
+        return len(found)
+
+    def delete_documents_by_query(self, query: str, threshold=0.1):
+        return self.forget(query, threshold)["deleted"]
+
+    def forget(self, query: str, threshold=0.1, dry_run=False, max_scan=10000, preview_chars=100):
+        with self._lock:
+            scores = self._scores(self.embeddings_model.embed_query(query))
+            relevance = self.relevance(scores)
+            top = self._top(scores, max_scan)
+            ids = [self.ids[row] for row in top if relevance[row] >= threshold]
+            previews = [self.texts[self.rows[id]][:preview_chars] for id in ids]
+        if ids and not dry_run:
+            self.delete_documents_by_ids(ids)
+        return {"matched": len(ids), "deleted": 0 if dry_run else len(ids), "ids": ids, "previews": previews}
+
+    def _append_log(self, record: dict):
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _maybe_compact(self):
+        dead = len(self.ids) - int(self.alive.sum())
+        if dead and dead >= self.compact_ratio * len(self.ids):
+            self.compact()
+
+    def compact(self):
+        # both files without tombstoned rows are written as the next generation, rewriting meta.json switches to it
+        with self._lock:
+            keep = np.nonzero(self.alive)[0]
+            vectors = np.array(self._get_matrix()[keep]) if len(keep) else np.zeros((0, self.dim), dtype=np.float32)
+            self.matrix = None
+            old_paths = self._paths(self.generation)
+            vectors_path, log_path = self._paths(self.generation + 1)
+            with open(vectors_path, "wb") as f: f.write(vectors.astype(np.float32).tobytes())
+            with open(log_path, "w", encoding="utf-8") as f:
+                for row in keep:
+                    f.write(json.dumps({"id": self.ids[row], "text": self.texts[row], "metadata": self.metadatas[row]}, ensure_ascii=False) + "\n")
+            self.generation += 1
+            self._write_meta()
+            for path in old_paths:
+                if os.path.exists(path): os.remove(path)
+            self.ids = [self.ids[row] for row in keep]
+            self.texts = [self.texts[row] for row in keep]
+            self.metadatas = [self.metadatas[row] for row in keep]
+            self.rows = {id: row for row, id in enumerate(self.ids)}
+            self.alive = np.ones(len(self.ids), dtype=bool)
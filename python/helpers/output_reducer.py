@@ -0,0 +1,130 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from . import files, messages
+from .artifacts import ArtifactStore, reference
+
+# Tool outputs over the length limit are reduced by a pipeline of steps instead of cutting out the middle.
+# Every step sees the whole output and may shorten the text or collect highlights, the lines worth keeping
+# from the part that will not fit (errors, tracebacks, test summaries). The raw output goes to the artifact store.
+
+TRACEBACK_START = re.compile(r"^Traceback \(most recent call last\):")
+ERROR_LINE = re.compile(r"\b(error|exception|fatal|failed|failure|panic|segmentation fault|cannot|not found|denied)\b|^E\s", re.IGNORECASE)
+TEST_SUMMARY = re.compile(r"^=+ .*\b(passed|failed|error|errors|skipped)\b.* =+$|^(FAILED|ERROR) \S+|^Ran \d+ tests? in|^(OK|FAILED)( \(.*\))?$"
+                          r"|^Tests?:\s+\d+|^Test Suites?:|\b\d+ (passing|failing|pending)\b", re.IGNORECASE)
+DIGITS = re.compile(r"\d+")
+
+@dataclass
+class Reduction:
+    raw: str
+    text: str
+    max_chars: int
+    highlights: list[tuple[int, str]] = field(default_factory=list)  # (line number, text)
+    summary: str = ""
+    artifact_id: str = ""
+    steps: list[str] = field(default_factory=list)
+
+    def highlight(self, line_no: int, text: str):
+        if not any(no == line_no for no, _ in self.highlights):
+            self.highlights.append((line_no, text))
+
+Step = Callable[[Reduction], None]
+
+def collapse_run(run: list[str]) -> list[str]:
+    # identical lines become one, lines that differ only in numbers (progress bars, counters, retries)
+    # keep the first and the last, so where the run started and ended is still visible
+    if all(line == run[0] for line in run):
+        return run[:1] + ([f"    [previous line repeated {len(run) - 1} more times]"] if len(run) > 1 else [])
+    if len(run) < 3: return run
+    return [run[0], f"    [{len(run) - 2} similar lines omitted]", run[-1]]
+
+def dedupe_lines(r: Reduction):
+    out, run, previous = [], [], None
+    for line in r.text.splitlines():
+        key = DIGITS.sub("#", line)
+        if run and key != previous:
+            out += collapse_run(run)
+            run = []
+        run.append(line)
+        previous = key
+    if run: out += collapse_run(run)
+    text = "\n".join(out)
+    if len(text) < len(r.text):
+        r.text = text
+        r.steps.append("dedupe")
+
+def extract_tracebacks(r: Reduction):
+    lines = r.raw.splitlines()
+    i = 0
+    while i < len(lines):
+        if TRACEBACK_START.match(lines[i]):
+            start = i
+            i += 1
+            while i < len(lines) and (lines[i].startswith((" ", "\t")) or not lines[i].strip()): i += 1
+            # the frames closest to the error and the exception line itself
+            block = lines[start:i + 1]
+            if len(block) > 8: block = block[:1] + ["  ..."] + block[-6:]
+            r.highlight(start, "\n".join(block))
+        i += 1
+    if r.highlights: r.steps.append("tracebacks")
+
+def extract_errors(r: Reduction, context: int = 1, limit: int = 30):
+    lines = r.raw.splitlines()
+    found = 0
+    for no, line in enumerate(lines):
+        if found >= limit: break
+        if ERROR_LINE.search(line) and not TEST_SUMMARY.search(line):
+            block = lines[max(0, no - context):no + context + 1]
+            r.highlight(no, "\n".join(block))
+            found += 1
+    if found: r.steps.append("errors")
+
+def extract_test_summary(r: Reduction):
+    found = False
+    for no, line in enumerate(r.raw.splitlines()):
+        if TEST_SUMMARY.search(line.strip()):
+            r.highlight(no, line)
+            found = True
+    if found: r.steps.append("test_summary")
+
+DEFAULT_STEPS: list[Step] = [dedupe_lines, extract_tracebacks, extract_test_summary, extract_errors]
+
+def render_highlights(r: Reduction, max_chars: int) -> str:
+    # in output order, the ones that do not fit are dropped from the end
+    out, used = [], 0
+    for _, text in sorted(r.highlights):
+        if used + len(text) > max_chars: continue
+        out.append(text)
+        used += len(text) + 1
+    return "\n".join(out)
+
+def compose(r: Reduction, ref: str) -> str:
+    if not r.summary and len(r.text) + (1 + len(ref) if ref else 0) <= r.max_chars:
+        # shortened enough by the steps, the exact lines are still one read away
+        return r.text + "\n" + ref if ref else r.text
+    highlights = render_highlights(r, r.max_chars // 2)
+    summary = "\n" + files.read_file("./prompts/fw.msg_reduced_summary.md", summary=r.summary) if r.summary else ""
+    notice = lambda removed: files.read_file("./prompts/fw.msg_reduced.md", removed_chars=removed, reference=ref,
+                                             highlights=highlights or "nothing detected", summary=summary)
+    # separators included, the result has to stay within max_chars or the tool would cut it again
+    room = max(0, r.max_chars - len(notice(len(r.text))) - 2)
+    if len(r.text) <= room: return r.text + "\n" + notice(0)
+    head = room * 2 // 5
+    tail = room - head
+    return r.text[:head] + "\n" + notice(len(r.text) - head - tail) + "\n" + (r.text[-tail:] if tail else "")
+
+def reduce(text: str, max_chars: int, store: Optional[ArtifactStore] = None, summarize: Optional[Callable[[str], str]] = None,
+           summary_threshold: int = 0, steps: Optional[list[Step]] = None) -> Reduction:
+    r = Reduction(raw=text, text=text, max_chars=max_chars)
+    if len(text) <= max_chars: return r
+    for step in steps if steps is not None else DEFAULT_STEPS:
+        step(r)
+    if summarize and summary_threshold and len(r.text) > summary_threshold:
+        # the cheap model gets a bounded view, never the whole output
+        r.summary = summarize(messages.truncate_text(r.text, summary_threshold)).strip()
+        if r.summary: r.steps.append("summary")
+    artifact = store.put(text) if store else None
+    r.artifact_id = artifact.id if artifact else ""
+    r.text = compose(r, reference(artifact) if artifact else "")
+    r.steps.append("compose")
+    return r
@@ -1,12 +1,11 @@
 
-import requests
-
 from langchain.llms import BaseLLM # type: ignore
 from langchain_core.callbacks import CallbackManagerForLLMRun
 from langchain_core.outputs.llm_result import LLMResult
 from typing import List, Optional, Any
 from openai import OpenAI
 import os
+from . import search_cache, http_client
 
 
 api_key_from_env = os.getenv("API_KEY_PERPLEXITY")
@@ -37,7 +36,7 @@ class PerplexityCrewLLM(BaseLLM):
             "content-type": "application/json"
         }
 
-        response = requests.post(url, json=payload, headers=headers)
+        response = http_client.post(url, json=payload, headers=headers)
 
         # Convert the response JSON to dictionary
         json_response = response.json()
@@ -63,7 +62,7 @@ class PerplexityCrewLLM(BaseLLM):
     
 
 def PerplexitySearchLLM(api_key,model_name="sonar-medium-online",base_url="https://api.perplexity.ai"):    
-    client = OpenAI(api_key=api_key_from_env, base_url=base_url)
+    client = OpenAI(api_key=api_key_from_env, base_url=base_url, http_client=http_client.get_httpx_client(), timeout=http_client.DEFAULT_TIMEOUT)
         
     def call_model(query:str):
         messages = [
@@ -97,4 +96,4 @@ def PerplexitySearchLLM(api_key,model_name="sonar-medium-online",base_url="https
 call_llm = PerplexitySearchLLM(api_key=api_key_from_env,model_name="llama-3-sonar-large-32k-online")
 
 def perplexity_search(search_query: str):
-    return call_llm(search_query)
\ No newline at end of file
+    return search_cache.cached("perplexity", search_query, lambda: call_llm(search_query))
\ No newline at end of file
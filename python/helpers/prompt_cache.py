@@ -0,0 +1,62 @@
+from typing import Any
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+# Requests are laid out as stable system prompt, then history, then per-iteration context (memories),
+# so the longest possible prefix is identical between loop iterations. OpenAI caches such prefixes
+# automatically, Anthropic needs explicit cache_control breakpoints.
+
+ANTHROPIC_BETA = "prompt-caching-2024-07-31"
+EPHEMERAL = {"type": "ephemeral"}
+
+def provider(model) -> str:
+    name = type(model).__name__.lower()
+    if "anthropic" in name: return "anthropic"
+    if "openai" in name: return "openai"
+    return ""
+
+def with_breakpoint(message: BaseMessage) -> BaseMessage:
+    # a copy with the content as one text block marked as cache breakpoint, history itself stays untouched
+    content = message.content
+    if isinstance(content, str): content = [{"type": "text", "text": content}]
+    else: content = [dict(block) if isinstance(block, dict) else {"type": "text", "text": str(block)} for block in content]
+    if content: content[-1]["cache_control"] = EPHEMERAL
+    return message.__class__(content=content) # type: ignore
+
+def build(model, system: str, history: list[BaseMessage], dynamic: str = "") -> tuple[BaseMessage, list[BaseMessage]]:
+    # returns the system message and the message list that follows it
+    messages = list(history)
+    if provider(model) == "anthropic":
+        system_message: BaseMessage = SystemMessage(content=[{"type": "text", "text": system, "cache_control": EPHEMERAL}])
+        # the end of the history is the next iteration's prefix, it is cached on this call already
+        if messages: messages[-1] = with_breakpoint(messages[-1])
+    else:
+        system_message = SystemMessage(content=system)
+    if dynamic: messages.append(HumanMessage(content=dynamic))
+    return system_message, messages
+
+def usage(chunk: Any) -> dict[str, int]:
+    # input, cached (read) and cache write tokens reported with a response chunk, in any provider format
+    out = {"input_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0}
+    usage_metadata = getattr(chunk, "usage_metadata", None) or {}
+    details = usage_metadata.get("input_token_details") or {}
+    out["input_tokens"] = int(usage_metadata.get("input_tokens") or 0)
+    out["cached_tokens"] = int(details.get("cache_read") or 0)
+    out["cache_write_tokens"] = int(details.get("cache_creation") or 0)
+
+    metadata = getattr(chunk, "response_metadata", None) or {}
+    raw = metadata.get("usage") or metadata.get("token_usage") or {}
+    if isinstance(raw, dict):
+        # anthropic reports cache reads and writes on top of input_tokens, openai inside prompt_tokens
+        out["cached_tokens"] = out["cached_tokens"] or int(raw.get("cache_read_input_tokens") or
+                                                           (raw.get("prompt_tokens_details") or {}).get("cached_tokens") or 0)
+        out["cache_write_tokens"] = out["cache_write_tokens"] or int(raw.get("cache_creation_input_tokens") or 0)
+        out["input_tokens"] = out["input_tokens"] or int(raw.get("input_tokens") or raw.get("prompt_tokens") or 0)
+    return out
+
+def merge_usage(chunks: list[Any]) -> dict[str, int]:
+    # providers send usage once per stream, or split over the first and last chunk
+    total = {"input_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0}
+    for chunk in chunks:
+        for key, value in usage(chunk).items():
+            total[key] = max(total[key], value)
+    return total
@@ -1,7 +1,8 @@
+import threading
 import time
 from collections import deque
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from .print_style import PrintStyle
 
 @dataclass
@@ -17,6 +18,8 @@ class RateLimiter:
         self.max_output_tokens = max_output_tokens
         self.window_seconds = window_seconds
         self.call_records: deque = deque()
+        # shared by the agent, its helper calls and background jobs, the records are only touched under the lock
+        self._lock = threading.Lock()
 
     def _clean_old_records(self, current_time: float):
         while self.call_records and current_time - self.call_records[0].timestamp > self.window_seconds:
@@ -28,39 +31,50 @@ class RateLimiter:
         output_tokens = sum(record.output_tokens for record in self.call_records)
         return calls, input_tokens, output_tokens
 
-    def _wait_if_needed(self, current_time: float, new_input_tokens: int):
+    def _wait_if_needed(self, current_time: float, new_input_tokens: int) -> CallRecord:
         while True:
-            self._clean_old_records(current_time)
-            calls, input_tokens, output_tokens = self._get_counts()
-            
-            wait_reasons = []
-            if self.max_calls > 0 and calls >= self.max_calls:
-                wait_reasons.append("max calls")
-            if self.max_input_tokens > 0 and input_tokens + new_input_tokens > self.max_input_tokens:
-                wait_reasons.append("max input tokens")
-            if self.max_output_tokens > 0 and output_tokens >= self.max_output_tokens:
-                wait_reasons.append("max output tokens")
-            
-            if not wait_reasons:
-                break
-            
-            oldest_record = self.call_records[0]
-            wait_time = oldest_record.timestamp + self.window_seconds - current_time
+            with self._lock:
+                self._clean_old_records(current_time)
+                calls, input_tokens, output_tokens = self._get_counts()
+
+                wait_reasons = []
+                if self.max_calls > 0 and calls >= self.max_calls:
+                    wait_reasons.append("max calls")
+                if self.max_input_tokens > 0 and input_tokens + new_input_tokens > self.max_input_tokens:
+                    wait_reasons.append("max input tokens")
+                if self.max_output_tokens > 0 and output_tokens >= self.max_output_tokens:
+                    wait_reasons.append("max output tokens")
+
+                if not wait_reasons:
+                    # checked and recorded in one step, two threads can not both take the last slot
+                    record = CallRecord(current_time, new_input_tokens)
+                    self.call_records.append(record)
+                    return record
+
+                wait_time = self.call_records[0].timestamp + self.window_seconds - current_time if self.call_records else 0
+
+            # waiting happens outside the lock, other calls can still report their output tokens
             if wait_time > 0:
                 PrintStyle(font_color="yellow", padding=True).print(f"Rate limit exceeded. Waiting for {wait_time:.2f} seconds due to: {', '.join(wait_reasons)}")
                 time.sleep(wait_time)
             current_time = time.time()
 
     def limit_call_and_input(self, input_token_count: int) -> CallRecord:
-        current_time = time.time()
-        self._wait_if_needed(current_time, input_token_count)
-        new_record = CallRecord(current_time, input_token_count)
-        self.call_records.append(new_record)
-        return new_record
+        return self._wait_if_needed(time.time(), input_token_count)
+
+    def get_total_tokens(self) -> int:
+        # input and output tokens of calls still inside the window
+        with self._lock:
+            self._clean_old_records(time.time())
+            _, input_tokens, output_tokens = self._get_counts()
+        return input_tokens + output_tokens
 
-    def set_output_tokens(self, output_token_count: int):
-        if self.call_records:
-            self.call_records[-1].output_tokens += output_token_count
+    def set_output_tokens(self, output_token_count: int, record: Optional[CallRecord] = None):
+        # record is the one returned by limit_call_and_input, the last call is only a fallback
+        # as concurrent calls would book their output on each other
+        with self._lock:
+            if record is None and self.call_records: record = self.call_records[-1]
+            if record is not None: record.output_tokens += output_token_count
         return self
 
 # Example usage
@@ -68,11 +82,11 @@ rate_limiter = RateLimiter(max_calls=5, max_input_tokens=1000, max_output_tokens
 
 def rate_limited_function(input_token_count: int, output_token_count: int):
     # First, limit the call and input tokens (this may wait)
-    rate_limiter.limit_call_and_input(input_token_count)
+    record = rate_limiter.limit_call_and_input(input_token_count)
     
     # Your function logic here
     print(f"Function called with {input_token_count} input tokens")
     
     # After processing, set the output tokens (this doesn't wait)
-    rate_limiter.set_output_tokens(output_token_count)
+    rate_limiter.set_output_tokens(output_token_count, record)
     print(f"Function completed with {output_token_count} output tokens")
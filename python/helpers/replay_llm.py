@@ -0,0 +1,193 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from array import array
+from collections import defaultdict, deque
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Sessions are gzip-compressed JSON lines, one record per LLM call or embedding:
+#   {"kind": "chat", "key": ..., "chunks": [[delay_seconds, text], ...]}
+#   {"kind": "embed", "key": ..., "vector": <base64 float32>}
+# Chat records are matched by a hash of the prompt messages, embeddings by a hash of the text.
+
+def messages_key(messages: List[BaseMessage]) -> str:
+    payload = json.dumps([(m.type, m.content) for m in messages], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def encode_vector(vector: List[float]) -> str:
+    return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+def decode_vector(data: str) -> List[float]:
+    vector = array("f")
+    vector.frombytes(base64.b64decode(data))
+    return vector.tolist()
+
+class SessionRecorder:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(line)
+
+class ReplaySession:
+    def __init__(self, path: str, strict: bool = False):
+        self.path = path
+        self.strict = strict
+        self._lock = threading.Lock()
+        self.chats: dict[str, deque] = defaultdict(deque)
+        self.last_chats: dict[str, list] = {}
+        self.sequence: deque = deque()
+        self.embeddings: dict[str, List[float]] = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                if record["kind"] == "chat":
+                    self.chats[record["key"]].append(record["chunks"])
+                    self.sequence.append(record["chunks"])
+                elif record["kind"] == "embed":
+                    self.embeddings[record["key"]] = decode_vector(record["vector"])
+
+    def next_chat(self, key: str) -> list:
+        # identical prompts replay their recorded answers in order, the last one repeats
+        # unknown prompts fall back to the recording order unless the session is strict
+        with self._lock:
+            if self.chats.get(key):
+                chunks = self.chats[key].popleft()
+                self.last_chats[key] = chunks
+            elif key in self.last_chats:
+                chunks = self.last_chats[key]
+            elif self.strict or not self.sequence:
+                raise KeyError(f"No recorded response for prompt {key[:12]} in {self.path}")
+            else:
+                chunks = self.sequence[0]
+                for queue in self.chats.values():
+                    if chunks in queue: queue.remove(chunks)
+            self._consume(chunks)
+            return chunks
+
+    def _consume(self, chunks: list):
+        if self.sequence and self.sequence[0] is chunks:
+            self.sequence.popleft()
+        else:
+            try: self.sequence.remove(chunks)
+            except ValueError: pass
+
+    def embedding(self, text: str, dimensions: int = 0) -> List[float]:
+        key = text_key(text)
+        if key in self.embeddings:
+            return self.embeddings[key]
+        if self.strict or dimensions <= 0:
+            raise KeyError(f"No recorded embedding for text {key[:12]} in {self.path}")
+        return hash_embedding(text, dimensions)
+
+def hash_embedding(text: str, dimensions: int) -> List[float]:
+    # deterministic stand-in vector for texts that were never recorded
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    values = [(digest[i % len(digest)] / 255.0) - 0.5 for i in range(dimensions)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+def chunk_text(chunk) -> str:
+    if isinstance(chunk, str): return chunk
+    if hasattr(chunk, "content"): return str(chunk.content)
+    return str(chunk)
+
+class RecordingChatModel(BaseChatModel):
+    model: Any
+    recorder: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        text = chunk_text(self.model.invoke(messages, stop=stop, **kwargs))
+        self.recorder.write({"kind": "chat", "key": messages_key(messages), "chunks": [[time.perf_counter() - start, text]]})
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        chunks = []
+        last = time.perf_counter()
+        try:
+            for chunk in self.model.stream(messages, stop=stop, **kwargs):
+                now = time.perf_counter()
+                text = chunk_text(chunk)
+                chunks.append([now - last, text])
+                last = now
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+        finally:
+            # partial streams are recorded too, the replay then stops at the same point
+            self.recorder.write({"kind": "chat", "key": messages_key(messages), "chunks": chunks})
+
+class ReplayChatModel(BaseChatModel):
+    session: Any
+    realtime: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        text = "".join(chunk for _, chunk in self._chunks(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for _, text in self._chunks(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    def _chunks(self, messages: List[BaseMessage]) -> Iterator[tuple]:
+        for delay, text in self.session.next_chat(messages_key(messages)):
+            if self.realtime and delay > 0: time.sleep(delay)
+            yield delay, text
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self, model: Embeddings, recorder: SessionRecorder):
+        self.model = model
+        self.recorder = recorder
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.embed_documents(texts)
+        for text, vector in zip(texts, vectors):
+            self.recorder.write({"kind": "embed", "key": text_key(text), "vector": encode_vector(vector)})
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.model.embed_query(text)
+        self.recorder.write({"kind": "embed", "key": text_key(text), "vector": encode_vector(vector)})
+        return vector
+
+class ReplayEmbeddings(Embeddings):
+    def __init__(self, session: ReplaySession, dimensions: int = 0):
+        # with dimensions > 0, unknown texts get a deterministic hash vector instead of an error
+        self.session = session
+        self.dimensions = dimensions
+        self.model = "replay"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.session.embedding(text, self.dimensions) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.session.embedding(text, self.dimensions)
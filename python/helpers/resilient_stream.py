@@ -0,0 +1,155 @@
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+# a stream source is a callable that starts a new model stream, so it can be retried or hedged
+Source = Callable[[], Iterable[Any]]
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504, 529)
+RETRY_PATTERN = re.compile(r"\b(429|50[0234]|529)\b|rate.?limit|overloaded|temporarily unavailable|timed? ?out", re.IGNORECASE)
+
+class StreamTimeout(Exception):
+    pass
+
+def chunk_text(chunk) -> str:
+    if isinstance(chunk, str): return chunk
+    if hasattr(chunk, "content"): return str(chunk.content)
+    return str(chunk)
+
+def status_code(e: Exception) -> Optional[int]:
+    code = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, StreamTimeout): return True
+    code = status_code(e)
+    if code is not None: return code in RETRY_STATUSES
+    return bool(RETRY_PATTERN.search(f"{type(e).__name__} {e}"))
+
+def retry_after(e: Exception) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try: return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError): return 0.0
+
+class ResilientStream:
+    # streams one model response with a time-to-first-token and an inter-chunk deadline,
+    # retries stalls and 429/5xx before the first token with jittered backoff, and optionally
+    # hedges with a secondary model when the first token is slower than usual
+
+    def __init__(self, first_token_timeout: float = 60, chunk_timeout: float = 30, max_retries: int = 2,
+                 backoff: float = 1.0, max_backoff: float = 30, rate_limiter=None,
+                 hedge_percentile: float = 0.95, hedge_min_samples: int = 20):
+        self.first_token_timeout = first_token_timeout
+        self.chunk_timeout = chunk_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.first_token_ms: deque = deque(maxlen=200)
+        self.last_source = ""
+        self.last_metadata: list = []  # chunks of the winning stream that carried usage or response metadata
+        self.last_call = None  # rate limiter record of the attempt that produced the response
+
+    def hedge_after(self) -> Optional[float]:
+        # seconds to wait for the first token before the secondary starts, None until there is enough history
+        if len(self.first_token_ms) < self.hedge_min_samples: return None
+        samples = sorted(self.first_token_ms)
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile))] / 1000
+
+    def delay(self, attempt: int, e: Exception) -> float:
+        # full jitter exponential backoff, a Retry-After header wins when it asks for longer
+        return max(retry_after(e), random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def stream(self, primary: Source, secondary: Optional[Source] = None, input_tokens: int = 0, call=None) -> Iterator[str]:
+        # call is the rate limiter record of the first attempt, last_call follows the retries
+        attempt = 0
+        self.last_call = call
+        while True:
+            emitted = [False]
+            try:
+                yield from self._attempt(primary, secondary, emitted)
+                return
+            except Exception as e:
+                # once text went out a retry would duplicate it, so only clean failures are retried
+                if emitted[0] or attempt >= self.max_retries or not is_retryable(e): raise
+                time.sleep(self.delay(attempt, e))
+                attempt += 1
+                # the retried call counts against the rate limit like any other call
+                if self.rate_limiter: self.last_call = self.rate_limiter.limit_call_and_input(input_tokens)
+
+    def _attempt(self, primary: Source, secondary: Optional[Source], emitted: list) -> Iterator[str]:
+        events: queue.Queue = queue.Queue()
+        cancel = threading.Event()
+        start = time.monotonic()
+        # each source is timed from its own start, a hedge win must not count the primary's wait
+        started = {"primary": start}
+        hedge_after = self.hedge_after() if secondary else None
+        running = {"primary"}
+        hedged = False
+        self._start("primary", primary, events, cancel)
+        winner = None
+        failure: Optional[Exception] = None
+        metadata: dict[str, list] = {}
+        try:
+            while True:
+                now = time.monotonic()
+                if winner is None:
+                    timeout = start + self.first_token_timeout - now
+                    if hedge_after is not None and not hedged: timeout = min(timeout, start + hedge_after - now)
+                else:
+                    timeout = self.chunk_timeout
+                try:
+                    source, kind, value = events.get(timeout=max(0.0, timeout))
+                except queue.Empty:
+                    if winner is None and hedge_after is not None and not hedged and time.monotonic() < start + self.first_token_timeout:
+                        hedged = True
+                        running.add("secondary")
+                        started["secondary"] = time.monotonic()
+                        self._start("secondary", secondary, events, cancel) # type: ignore
+                        continue
+                    raise StreamTimeout(f"no {'first token' if winner is None else 'chunk'} from the model within "
+                                        f"{self.first_token_timeout if winner is None else self.chunk_timeout:g}s")
+
+                if winner is not None and source != winner: continue
+                if kind == "meta":
+                    metadata.setdefault(source, []).append(value)
+                elif kind == "chunk":
+                    if winner is None:
+                        winner = source
+                        self.last_source = source
+                        self.first_token_ms.append((time.monotonic() - started[source]) * 1000)
+                    emitted[0] = True
+                    yield value
+                elif kind == "done":
+                    if winner is None: self.last_source = source
+                    self.last_metadata = metadata.get(source, [])
+                    return
+                else:
+                    # before the first token a hedged request can still win on its own
+                    running.discard(source)
+                    failure = value
+                    if winner is None and running: continue
+                    raise failure
+        finally:
+            cancel.set()
+
+    @staticmethod
+    def _start(name: str, source: Source, events: queue.Queue, cancel: threading.Event):
+        def run():
+            try:
+                for chunk in source():
+                    if cancel.is_set(): return
+                    if getattr(chunk, "usage_metadata", None) or getattr(chunk, "response_metadata", None):
+                        events.put((name, "meta", chunk))
+                    content = chunk_text(chunk)
+                    if content: events.put((name, "chunk", content))
+                events.put((name, "done", None))
+            except Exception as e:
+                events.put((name, "error", e))
+        threading.Thread(target=run, name=f"stream-{name}", daemon=True).start()
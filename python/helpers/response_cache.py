@@ -0,0 +1,134 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class ResponseCache:
+    # content-addressed cache of utility model responses
+    # memory tier is an LRU, the optional disk tier is a single sqlite file
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 3600, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.stats = CacheStats()
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, response TEXT)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # sqlite's own context manager only commits, the connection is closed here
+        conn = sqlite3.connect(self.db_path, timeout=10) # type: ignore
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model_id: str, system: str, msg: str) -> str:
+        payload = json.dumps([model_id, system, msg], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.stats.hits += 1
+                return entry[1]
+            if entry: del self._memory[key]
+
+        if self.db_path:
+            with self._connect() as conn:
+                row = conn.execute("SELECT created, response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and not self._expired(row[0]):
+                with self._lock:
+                    self._put_memory(key, row[0], row[1])
+                    self.stats.hits += 1
+                return row[1]
+
+        with self._lock:
+            self.stats.misses += 1
+        return None
+
+    def put(self, key: str, response: str):
+        created = time.time()
+        with self._lock:
+            self._put_memory(key, created, response)
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, created, response))
+                if self.ttl_seconds > 0:
+                    conn.execute("DELETE FROM responses WHERE created < ?", (created - self.ttl_seconds,))
+
+    def _put_memory(self, key: str, created: float, response: str):
+        self._memory[key] = (created, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM responses")
+
+def get_model_id(model) -> str:
+    # identify a model by its class and the attributes that change its output
+    name = getattr(model, "model_name", None) or getattr(model, "model", None) or ""
+    base_url = getattr(model, "openai_api_base", None) or getattr(model, "base_url", None) or ""
+    return f"{type(model).__name__}:{name}:{base_url}:{get_temperature(model)}"
+
+def get_temperature(model) -> Optional[float]:
+    # None when the model does not say, providers then sample with their own default (1.0 for anthropic)
+    temperature = getattr(model, "temperature", None)
+    try: return float(temperature) if temperature is not None else None
+    except (TypeError, ValueError): return None
+
+def is_cacheable(model) -> bool:
+    # sampled responses are not reproducible, only explicitly greedy ones are worth caching
+    return get_temperature(model) == 0.0
+
+def replay_chunks(response: str, chunk_size: int = 32):
+    for i in range(0, len(response), chunk_size):
+        yield response[i:i + chunk_size]
+
+caches: dict[str, ResponseCache] = {}
+caches_lock = threading.Lock()
+
+def get_cache(max_entries: int, ttl_seconds: int, db_path: Optional[str] = None) -> ResponseCache:
+    # agents with the same settings share one cache, subordinates included
+    key = f"{max_entries}:{ttl_seconds}:{db_path or ''}"
+    with caches_lock:
+        if key not in caches:
+            caches[key] = ResponseCache(max_entries=max_entries, ttl_seconds=ttl_seconds, db_path=db_path)
+        return caches[key]
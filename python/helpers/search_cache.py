@@ -0,0 +1,96 @@
+import contextlib
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+from urllib.parse import urlsplit
+from . import files
+
+DEFAULT_TTL_SECONDS = 6 * 3600
+
+def normalize_query(query: str) -> str:
+    # near-identical questions should share a cache entry
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.strip(" ?!.,;:")
+
+def normalize_url(url: str) -> str:
+    # scheme and host are case-insensitive, path and query are not
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."): host = host[4:]
+    return host + parts.path.rstrip("/") + (f"?{parts.query}" if parts.query else "")
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(re.sub(r"\W+", " ", text.lower()).strip().encode("utf-8")).hexdigest()
+
+def dedupe_results(results: list[dict]) -> list[dict]:
+    # drop results pointing to the same page or carrying the same snippet
+    seen_urls, seen_content, unique = set(), set(), []
+    for result in results:
+        url = normalize_url(result.get("href", "") or result.get("url", ""))
+        text = result.get("body", "") or result.get("snippet", "")
+        body = content_hash(text) if text.strip() else ""
+        # results without a snippet are only compared by url
+        if (url and url in seen_urls) or (body and body in seen_content): continue
+        if url: seen_urls.add(url)
+        if body: seen_content.add(body)
+        unique.append(result)
+    return unique
+
+class SearchCache:
+    def __init__(self, db_path: str, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS searches (key TEXT PRIMARY KEY, created REAL, result TEXT)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # sqlite's own context manager only commits, the connection is closed here
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn: yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(source: str, query: str, region: str = "", time_window: str = "") -> str:
+        payload = json.dumps([source, normalize_query(query), region, time_window])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT created, result FROM searches WHERE key = ?", (key,)).fetchone()
+        if row and time.time() - row[0] <= self.ttl_seconds:
+            return json.loads(row[1])
+        return None
+
+    def put(self, key: str, result: Any):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?)", (key, now, json.dumps(result)))
+            conn.execute("DELETE FROM searches WHERE created < ?", (now - self.ttl_seconds,))
+
+cache: SearchCache | None = None
+cache_lock = threading.Lock()
+
+def get_cache() -> SearchCache:
+    global cache
+    with cache_lock:
+        if cache is None:
+            cache = SearchCache(files.get_abs_path("memory", "search_cache.db"))
+        return cache
+
+def cached(source: str, query: str, fetch: Callable[[], Any], region: str = "", time_window: str = "") -> Any:
+    # returns a cached result for the normalised query if still fresh, otherwise fetches and stores it
+    store = get_cache()
+    key = store.make_key(source, query, region, time_window)
+    result = store.get(key)
+    if result is None:
+        result = fetch()
+        if result: store.put(key, result)
+    return result
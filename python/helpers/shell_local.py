@@ -5,7 +5,8 @@ import sys
 from typing import Optional, Tuple
 
 class LocalInteractiveSession:
-    def __init__(self):
+    def __init__(self, cwd: Optional[str] = None):
+        self.cwd = cwd
         self.process = None
         self.full_output = ''
 
@@ -19,7 +20,8 @@ class LocalInteractiveSession:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
-                bufsize=1
+                bufsize=1,
+                cwd=self.cwd
             )
         else:
             # macOS and Linux
@@ -29,7 +31,8 @@ class LocalInteractiveSession:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
-                bufsize=1
+                bufsize=1,
+                cwd=self.cwd
             )
 
     def close(self):
@@ -0,0 +1,86 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+executor: ThreadPoolExecutor | None = None
+executor_lock = threading.Lock()
+
+def get_executor(max_workers: int = 16) -> ThreadPoolExecutor:
+    # one long-lived pool for tool fan-out instead of a new pool per call
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-zero")
+        return executor
+
+def submit(fn, *args, **kwargs) -> Future:
+    # runs in a copy of the caller's context, so tracing spans opened in the task get the caller's span as parent,
+    # the future carries the time the task actually started, for deadlines that do not count time in the queue
+    context = contextvars.copy_context()
+    started: list[float] = []
+    def run():
+        started.append(time.monotonic())
+        return context.run(fn, *args, **kwargs)
+    future = get_executor().submit(run)
+    future.started = started # type: ignore
+    return future
+
+def started_at(future: Future, default: float) -> Optional[float]:
+    # futures not created by submit() count as started when the wait began
+    started = getattr(future, "started", None)
+    if started is None: return default
+    return started[0] if started else None
+
+@dataclass
+class DeadlineResults:
+    results: dict[str, Any] = field(default_factory=dict)
+    timed_out: dict[str, float] = field(default_factory=dict)
+    not_started: dict[str, float] = field(default_factory=dict)
+    failed: dict[str, Exception] = field(default_factory=dict)
+    abandoned: list[str] = field(default_factory=list)
+
+def wait_with_deadlines(futures: dict[str, Future], timeouts: dict[str, float], default_timeout: float = 30, budget: float = 0, quorum: int = 0) -> DeadlineResults:
+    # collects whatever finishes before its own deadline, counted from when the task started running,
+    # a task still queued after its timeout is reported as not started, the overall budget caps both
+    # late futures keep running in the pool, their results are discarded
+    # with a quorum, waiting stops as soon as that many results are in, the rest is abandoned
+    start = time.monotonic()
+    timeout = {name: timeouts.get(name, default_timeout) for name in futures}
+    end = start + budget if budget > 0 else float("inf")
+
+    def deadline(name: str) -> float:
+        began = started_at(futures[name], start)
+        return min(end, (began if began is not None else start) + timeout[name])
+
+    out = DeadlineResults()
+    pending = dict(futures)
+    while pending:
+        now = time.monotonic()
+        for name in [n for n in pending if deadline(n) <= now and not pending[n].done()]:
+            future = pending[name]
+            # cancel only stops queued tasks, a running one is left to finish in the pool
+            if started_at(future, start) is None and future.cancel():
+                out.not_started[name] = round(now - start, 3)
+                del pending[name]
+            elif deadline(name) <= now:
+                out.timed_out[name] = min(timeout[name], round(now - start, 3))
+                del pending[name]
+            # otherwise it started just now and has its own deadline from here
+        if not pending: break
+
+        # a queued task may start any moment and move its deadline, so it is checked again soon
+        nearest = min(deadline(n) if started_at(pending[n], start) is not None else min(deadline(n), now + 0.05) for n in pending)
+        done, _ = wait(list(pending.values()), timeout=max(0, nearest - now), return_when=FIRST_COMPLETED)
+        for name in [n for n, f in pending.items() if f in done]:
+            future = pending.pop(name)
+            try: out.results[name] = future.result()
+            except Exception as e: out.failed[name] = e
+        if quorum > 0 and len(out.results) >= quorum:
+            for name, future in pending.items():
+                future.cancel()
+                out.abandoned.append(name)
+            break
+    return out
@@ -0,0 +1,171 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# the innermost open span of the running thread or task, work handed to thread_pool.submit inherits it
+current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    agent: Optional[int] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    status: str = "ok"
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "agent": self.agent,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class JsonlExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def flush(self):
+        pass
+
+class OtlpExporter:
+    # sends spans as OTLP/JSON to a local collector, e.g. http://localhost:4318/v1/traces
+    def __init__(self, endpoint: str, service_name: str = "agent-zero", batch_size: int = 64):
+        self.path = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._batch: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._batch.append(span)
+            if len(self._batch) < self.batch_size: return
+            batch, self._batch = self._batch, []
+        self._send(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if batch: self._send(batch)
+
+    def _send(self, batch: list[Span]):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "agent-zero"}, "spans": [self._convert(span) for span in batch]}],
+        }]}
+        request = urllib.request.Request(self.path, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except Exception:
+            pass # tracing must never break the agent
+
+    def _convert(self, span: Span) -> dict:
+        attributes = dict(span.attributes)
+        if span.agent is not None: attributes["agent.number"] = span.agent
+        result = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [attribute(k, v) for k, v in attributes.items()],
+            "status": {"code": 2 if span.status == "error" else 1},
+        }
+        if span.parent_id: result["parentSpanId"] = span.parent_id
+        return result
+
+def attribute(key: str, value) -> dict:
+    if isinstance(value, bool): return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int): return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float): return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class Tracer:
+    def __init__(self):
+        self.exporters: list = []
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter):
+        with self._lock:
+            if not any(type(e) is type(exporter) and e.path == exporter.path for e in self.exporters):
+                self.exporters.append(exporter)
+
+    def current(self) -> Optional[Span]:
+        return current_span.get()
+
+    @contextmanager
+    def span(self, name: str, agent=None, **attributes):
+        # the parent comes from the context, never from shared agent state that other threads change
+        parent = current_span.get()
+
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            agent=agent.number if agent is not None else None,
+            start_ns=time.time_ns(),
+            attributes=attributes)
+
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            try: current_span.reset(token)
+            except ValueError: current_span.set(parent) # closed in another context than it was opened in
+            for exporter in self.exporters:
+                try: exporter.export(span)
+                except Exception: pass
+
+    def flush(self):
+        for exporter in self.exporters:
+            exporter.flush()
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+def configure(jsonl_path: str = "", otlp_endpoint: str = ""):
+    if jsonl_path: tracer.add_exporter(JsonlExporter(jsonl_path))
+    if otlp_endpoint: tracer.add_exporter(OtlpExporter(otlp_endpoint))
+
+def span(name: str, agent=None, **attributes):
+    return tracer.span(name, agent, **attributes)
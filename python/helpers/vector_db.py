@@ -3,7 +3,10 @@ from langchain.embeddings import CacheBackedEmbeddings
 from langchain_chroma import Chroma
 
 from . import files
+from .keyword_index import KeywordIndex, rrf
+from . import memory_metadata
 from langchain_core.documents import Document
+import os
 import uuid
 
 
@@ -30,55 +33,120 @@ class VectorDB:
 
 
         self.db = Chroma(embedding_function=self.embedder,persist_directory=db_cache)
+
+        # full-text index maintained alongside the collection for exact-match recall,
+        # in a directory of its own as the numpy backend keeps other ids in the same memory directory
+        keywords_dir = files.get_abs_path(cache_dir, "chroma")
+        os.makedirs(keywords_dir, exist_ok=True)
+        self.keywords = KeywordIndex(os.path.join(keywords_dir, "keywords.db"))
+        self.keywords.sync(self.db.get(include=[])["ids"], self.load_keyword_items)
         
         
+    def load_keyword_items(self) -> list[tuple[str, str]]:
+        existing = self.db.get(include=["documents"])
+        return list(zip(existing["ids"], existing["documents"]))
+
     def search_similarity(self, query, results=3):
         return self.db.similarity_search(query,results)
     
-    def search_similarity_threshold(self, query, results=3, threshold=0.5):
-        return self.db.search(query, search_type="similarity_score_threshold", k=results, score_threshold=threshold)
+    def search_similarity_threshold(self, query, results=3, threshold=0.5, filter=None, half_life_days=0):
+        # filters go into Chroma's where clause, time decay re-ranks a deeper candidate list
+        fetch = results * 2 if half_life_days > 0 else results
+        scored = [(doc, score) for doc, score in self.search_similarity_scored(query, fetch, filter) if score >= threshold]
+        return memory_metadata.rank(scored, half_life_days)[:results]
+
+    def search_similarity_scored(self, query, results=3, filter=None):
+        # (document, relevance) pairs, relevance on the same 0..1 scale as the thresholds
+        return self.db.similarity_search_with_relevance_scores(query, k=results, filter=filter)
+
+    def search_keyword(self, query, results=3, filter=None):
+        # no embedding call at all, ranked by BM25, filtered searches look deeper as some hits drop out
+        ids = [id for id, _ in self.keywords.search(query, results * 4 if filter else results)]
+        return self.get_documents_by_ids(ids, filter)[:results]
+
+    def search_hybrid(self, query, results=3, threshold=0.5, mode="hybrid", filter=None, half_life_days=0):
+        if mode == "vector": return self.search_similarity_threshold(query, results, threshold, filter, half_life_days)
+        keyword_docs = [doc for doc in self.search_keyword(query, results * 2, filter) if "id" in doc.metadata]
+        docs = []
+        if mode == "keyword":
+            rankings = [[doc.metadata["id"] for doc in keyword_docs]]
+        else:
+            # one query embedding for both sides, keyword hits get their vector relevance too
+            # so the threshold applies to everything that is fused
+            embedding = self.embedder.embed_query(query)
+            relevance_fn = self.db._select_relevance_score_fn()
+            docs = [doc for doc, distance in self.db.similarity_search_by_vector_with_relevance_scores(embedding, k=results * 2, filter=filter)
+                    if "id" in doc.metadata and relevance_fn(distance) >= threshold]
+            vector_ids = {doc.metadata["id"] for doc in docs}
+            relevance = self._relevance_by_ids(embedding, [doc.metadata["id"] for doc in keyword_docs if doc.metadata["id"] not in vector_ids])
+            keyword_docs = [doc for doc in keyword_docs if doc.metadata["id"] in vector_ids or relevance.get(doc.metadata["id"], 0.0) >= threshold]
+            rankings = [[doc.metadata["id"] for doc in docs], [doc.metadata["id"] for doc in keyword_docs]]
+        by_id = {doc.metadata["id"]: doc for doc in docs + keyword_docs}
+        fused = [(by_id[id], score) for id, score in rrf(rankings) if id in by_id]
+        return memory_metadata.rank(fused, half_life_days)[:results]
+
+    def _relevance_by_ids(self, embedding, ids: list[str]) -> dict[str, float]:
+        if not ids: return {}
+        # documents are stored with their id as chroma id and in the metadata
+        res = self.db._collection.query(query_embeddings=[embedding], n_results=len(ids), where={"id": {"$in": ids}}, include=["distances"])
+        relevance_fn = self.db._select_relevance_score_fn()
+        return {id: relevance_fn(distance) for id, distance in zip(res["ids"][0], res["distances"][0])} # type: ignore
+
+    def get_documents_by_ids(self, ids:list[str], filter=None):
+        if not ids: return []
+        found = self.db.get(ids=ids, where=filter)
+        docs = {id: Document(text, metadata=meta or {"id": id}) for id, text, meta in zip(found["ids"], found["documents"], found["metadatas"])}
+        return [docs[id] for id in ids if id in docs]
 
     def search_max_rel(self, query, results=3):
         return self.db.max_marginal_relevance_search(query,results)
 
     def delete_documents_by_query(self, query:str, threshold=0.1):
-        k = 100
-        tot = 0
-        while True:
-            # Perform similarity search with score
-            docs = self.search_similarity_threshold(query, results=k, threshold=threshold)
-
-            # Extract document IDs and filter based on score
-            # document_ids = [result[0].metadata["id"] for result in docs if result[1] < score_limit]
-            document_ids = [result.metadata["id"] for result in docs]
-            
-
-            # Delete documents with IDs over the threshold score
-            if document_ids:
-                # fnd = self.db.get(where={"id": {"$in": document_ids}})
-                # if fnd["ids"]: self.db.delete(ids=fnd["ids"])
-                # tot += len(fnd["ids"])
-                self.db.delete(ids=document_ids)
-                tot += len(document_ids)
-                                    
-            # If fewer than K document IDs, break the loop
-            if len(document_ids) < k:
-                break
-        
-        return tot
+        return self.forget(query, threshold)["deleted"]
+
+    def forget(self, query:str, threshold=0.1, dry_run=False, max_scan=10000, preview_chars=100):
+        # one embedding, one bounded scan over the collection, one batch delete
+        collection = self.db._collection
+        k = min(collection.count(), max_scan)
+        if k == 0: return {"matched": 0, "deleted": 0, "ids": [], "previews": []}
+
+        emb = self.embedder.embed_query(query)
+        res = collection.query(query_embeddings=[emb], n_results=k, include=["documents", "distances"])
+        relevance = self.db._select_relevance_score_fn()
+        matches = [(id, doc) for id, doc, dist in zip(res["ids"][0], res["documents"][0], res["distances"][0]) # type: ignore
+                   if relevance(dist) >= threshold]
+
+        ids = [id for id, _ in matches]
+        if ids and not dry_run:
+            self.delete_documents_by_ids(ids)
+        return {"matched": len(ids), "deleted": 0 if dry_run else len(ids), "ids": ids,
+                "previews": [(doc or "")[:preview_chars] for _, doc in matches]}
 
     def delete_documents_by_ids(self, ids:list[str]):
         # pre = self.db.get(ids=ids)["ids"]
         self.db.delete(ids=ids)
+        self.keywords.delete(ids)
         # post = self.db.get(ids=ids)["ids"]
         #TODO? compare pre and post
         return len(ids)
         
-    def insert_document(self, data):
+    def insert_document(self, data, metadata:dict|None=None):
         id = str(uuid.uuid4())
-        self.db.add_documents(documents=[ Document(data, metadata={"id": id}) ], ids=[id])
+        self.db.add_documents(documents=[ Document(data, metadata={**(metadata or {}), "id": id}) ], ids=[id])
+        self.keywords.add([(id, data)])
         
         return id
+
+    def replace_documents(self, ids:list[str], data, metadata:dict|None=None):
+        # merged memory is inserted before the originals go, so a failure never loses both
+        id = self.insert_document(data, metadata)
+        self.delete_documents_by_ids(ids)
+        return id
+
+    def get_all(self):
+        # (id, text, embedding, metadata) of every stored memory, used by the consolidation job
+        res = self.db._collection.get(include=["documents", "embeddings", "metadatas"])
+        return list(zip(res["ids"], res["documents"], res["embeddings"], [meta or {} for meta in res["metadatas"]])) # type: ignore
         
 
 
@@ -0,0 +1,18 @@
+from python.helpers.tool import Tool, Response
+from python.helpers import files
+
+class ArtifactTool(Tool):
+
+    def execute(self, artifact_id="", start_line=1, end_line=0, **kwargs):
+        artifact_id = str(artifact_id).strip()
+        if not self.agent.artifacts.exists(artifact_id):
+            return Response(message=files.read_file("./prompts/fw.artifact_not_found.md", artifact_id=artifact_id), break_loop=False)
+
+        start_line = max(1, int(start_line or 1))
+        # the page is sized to fit the tool response limit, so it is never reduced or truncated again
+        max_chars = max(200, self.agent.config.max_tool_response_length - 200)
+        text, next_line = self.agent.artifacts.read_lines(artifact_id, start_line, max_chars, int(end_line or 0))
+        artifact = self.agent.artifacts.get(artifact_id)
+        header = files.read_file("./prompts/fw.artifact_page.md", artifact_id=artifact_id, start_line=start_line, lines=artifact.lines,
+                                 next_line=next_line or "none, end of artifact")
+        return Response(message=header + "\n" + text, break_loop=False)
@@ -2,8 +2,9 @@ from dataclasses import dataclass
 import os, json, contextlib, subprocess, ast, shlex
 from io import StringIO
 import time
+import threading
 from typing import Literal
-from python.helpers import files, messages
+from python.helpers import files, messages, tracing
 from agent import Agent
 from python.helpers.tool import Tool, Response
 from python.helpers import files
@@ -12,10 +13,22 @@ from python.helpers.shell_local import LocalInteractiveSession
 from python.helpers.shell_ssh import SSHInteractiveSession
 from python.helpers.docker import DockerContainerManager
 
+# agents share the container by name, it is stopped when the last shell using it is closed
+docker_users: dict[str, int] = {}
+docker_lock = threading.Lock()
+
 @dataclass
 class State:
     shell: LocalInteractiveSession | SSHInteractiveSession
     docker: DockerContainerManager | None
+
+    def close(self):
+        self.shell.close()
+        if self.docker:
+            with docker_lock:
+                docker_users[self.docker.name] = docker_users.get(self.docker.name, 1) - 1
+                last = docker_users[self.docker.name] <= 0
+            if last: self.docker.stop_container()
         
 
 class CodeExecution(Tool):
@@ -25,8 +38,6 @@ class CodeExecution(Tool):
         if self.agent.handle_intervention(): return Response(message="", break_loop=False)  # wait for intervention and handle it, if paused
         
         self.prepare_state()
-
-        # os.chdir(files.get_abs_path("./work_dir")) #change CWD to work_dir
         
         runtime = self.args["runtime"].lower().strip()
         if runtime == "python":
@@ -48,23 +59,25 @@ class CodeExecution(Tool):
         self.agent.append_message(msg_response, human=True)
 
     def prepare_state(self):
-        self.state = self.agent.get_data("cot_state")
-        if not self.state:
-
-            #initialize docker container if execution in docker is configured
-            if self.agent.config.code_exec_docker_enabled:
-                docker = DockerContainerManager(name=self.agent.config.code_exec_docker_name, image=self.agent.config.code_exec_docker_image, ports=self.agent.config.code_exec_docker_ports, volumes=self.agent.config.code_exec_docker_volumes)
-                docker.start_container()
-            else: docker = None
-
-            #initialize local or remote interactive shell insterface
-            if self.agent.config.code_exec_ssh_enabled:
-                shell = SSHInteractiveSession(self.agent.config.code_exec_ssh_addr,self.agent.config.code_exec_ssh_port,self.agent.config.code_exec_ssh_user,self.agent.config.code_exec_ssh_pass)
-            else: shell = LocalInteractiveSession()
-                
-            self.state = State(shell=shell,docker=docker)
-            shell.connect()
-        self.agent.set_data("cot_state", self.state)
+        # the shell is leased from the agent's execution context, one per agent
+        self.state = self.agent.context.lease_shell(self.create_state)
+
+    def create_state(self) -> State:
+        #initialize docker container if execution in docker is configured
+        if self.agent.config.code_exec_docker_enabled:
+            docker = DockerContainerManager(name=self.agent.config.code_exec_docker_name, image=self.agent.config.code_exec_docker_image, ports=self.agent.config.code_exec_docker_ports, volumes=self.agent.config.code_exec_docker_volumes)
+            docker.start_container()
+            with docker_lock:
+                docker_users[docker.name] = docker_users.get(docker.name, 0) + 1
+        else: docker = None
+
+        #initialize local or remote interactive shell insterface
+        if self.agent.config.code_exec_ssh_enabled:
+            shell = SSHInteractiveSession(self.agent.config.code_exec_ssh_addr,self.agent.config.code_exec_ssh_port,self.agent.config.code_exec_ssh_user,self.agent.config.code_exec_ssh_pass)
+        else: shell = LocalInteractiveSession(cwd=self.agent.context.work_dir)
+            
+        shell.connect()
+        return State(shell=shell,docker=docker)
     
     def execute_python_code(self, code):
         escaped_code = shlex.quote(code)
@@ -83,10 +96,13 @@ class CodeExecution(Tool):
 
         if self.agent.handle_intervention(): return ""  # wait for intervention and handle it, if paused
        
-        self.state.shell.send_command(command)
+        with tracing.span("shell_command", self.agent, command=command[:200]) as span:
+            self.state.shell.send_command(command)
 
-        PrintStyle(background_color="white",font_color="#1B4F72",bold=True).print(f"{self.agent.agent_name} code execution output:")
-        return self.get_terminal_output()
+            PrintStyle(background_color="white",font_color="#1B4F72",bold=True).print(f"{self.agent.agent_name} code execution output:")
+            output = self.get_terminal_output()
+            span.set(output_chars=len(output))
+            return output
 
     def get_terminal_output(self):
         idle=0
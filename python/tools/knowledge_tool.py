@@ -3,9 +3,9 @@ from agent import Agent
 from . import online_knowledge_tool
 from python.helpers import perplexity_search
 from python.helpers import duckduckgo_search
+from python.helpers import thread_pool, knowledge_packing
 
 from . import memory_tool
-import concurrent.futures
 
 
 
@@ -14,29 +14,39 @@ from python.helpers import files
 
 class Knowledge(Tool):
     def execute(self, question="", **kwargs):
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            # Schedule the two functions to be run in parallel
+        # run all sources in parallel on the shared pool, each with its own deadline
+        futures = {}
 
-            # perplexity search, if API provided
-            if os.getenv("API_KEY_PERPLEXITY"):
-                perplexity = executor.submit(perplexity_search.perplexity_search, question)
-            else: perplexity = None
+        # perplexity search, if API provided
+        if os.getenv("API_KEY_PERPLEXITY"):
+            futures["perplexity"] = thread_pool.submit(perplexity_search.perplexity_search, question)
 
-            # duckduckgo search
-            duckduckgo = executor.submit(duckduckgo_search.search, question)
+        # duckduckgo search
+        futures["duckduckgo"] = thread_pool.submit(duckduckgo_search.search_results, question)
 
-            # memory search
-            future_memory = executor.submit(memory_tool.search, self.agent, question)
+        # memory search
+        futures["memory"] = thread_pool.submit(memory_tool.search_documents, self.agent, question)
 
-            # Wait for both functions to complete
-            perplexity_result = (perplexity.result() if perplexity else "") or ""
-            duckduckgo_result = duckduckgo.result()
-            memory_result = future_memory.result()
+        # sources that miss their deadline are reported, the rest is returned as it is
+        done = thread_pool.wait_with_deadlines(futures,
+                                               timeouts=self.agent.config.knowledge_source_timeouts,
+                                               budget=self.agent.config.knowledge_timeout_seconds)
 
-        msg = files.read_file("prompts/tool.knowledge.response.md", 
-                              online_sources = perplexity_result + "\n\n" + str(duckduckgo_result),
-                              memory = memory_result )
+        # parse sources into snippets, rank them against the question and keep the best within the token budget
+        snippets = knowledge_packing.from_perplexity(done.results.get("perplexity") or "")
+        snippets += knowledge_packing.from_duckduckgo(done.results.get("duckduckgo") or [])
+        snippets += knowledge_packing.from_memory(done.results.get("memory") or [])
+        packed = knowledge_packing.select(question, snippets, self.agent.config.knowledge_max_tokens, self.agent.config.embeddings_model)
+
+        unavailable = [f"{name}: timed out after {timeout:g}s" for name, timeout in done.timed_out.items()]
+        unavailable += [f"{name}: not started within {waited:g}s, all workers were busy" for name, waited in done.not_started.items()]
+        unavailable += [f"{name}: {type(e).__name__}: {e}" for name, e in done.failed.items()]
+
+        msg = files.read_file("prompts/tool.knowledge.response.md",
+                              online_sources = knowledge_packing.render(packed, ("perplexity", "duckduckgo")) or "No online results found.",
+                              memory = knowledge_packing.render(packed, ("memory",)) or "No relevant memories found.",
+                              unavailable_sources = "; ".join(unavailable) or "none" )
 
         if self.agent.handle_intervention(msg): pass # wait for intervention and handle it, if paused
 
-        return Response(message=msg, break_loop=False)
\ No newline at end of file
+        return Response(message=msg, break_loop=False)
@@ -1,13 +1,16 @@
 import re
 from agent import Agent
-from python.helpers.vector_db import VectorDB, Document
-from python.helpers import files
-import os, json
+from langchain_core.documents import Document
+from typing import Any
+from python.helpers import files, tracing, memory_consolidation, memory_metadata
+import os, json, threading, time
 from python.helpers.tool import Tool, Response
+from python.helpers.keyword_index import rrf
 from python.helpers.print_style import PrintStyle
 
-# TODO multiple DBs at once
-db: VectorDB | None= None
+# one database per backend and memory directory, shared by all agents using it
+dbs: dict[tuple[str, str], Any] = {}
+dbs_lock = threading.Lock()
 
 class Memory(Tool):
     def execute(self,**kwargs):
@@ -18,44 +21,104 @@ class Memory(Tool):
             else: threshold = 0.1
             if "count" in kwargs: count = int(kwargs["count"]) 
             else: count = 5
-            result = search(self.agent, kwargs["query"], count, threshold)
+            mode = str(kwargs.get("mode", self.agent.config.memory_search_mode)).lower().strip()
+            scope = str(kwargs.get("scope", "")).lower().strip()
+            recent_days = float(kwargs.get("recent_days", 0) or 0)
+            result = search(self.agent, kwargs["query"], count, threshold, mode, scope, kwargs.get("tags", ""), recent_days)
         elif "memorize" in kwargs:
-            result = save(self.agent, kwargs["memorize"])
+            result = save(self.agent, kwargs["memorize"], tags=kwargs.get("tags", ""))
         elif "forget" in kwargs:
-            result = forget(self.agent, kwargs["forget"])
+            threshold = float(kwargs.get("threshold", 0.1))
+            dry_run = str(kwargs.get("dry_run", "")).lower().strip() == "true"
+            result = forget(self.agent, kwargs["forget"], threshold, dry_run)
         elif "delete" in kwargs:
             result = delete(self.agent, kwargs["delete"])
                         
         # result = process_query(self.agent, self.args["memory"],self.args["action"], result_count=self.agent.config.auto_memory_count)
         return Response(message=result, break_loop=False)
             
-def search(agent:Agent, query:str, count:int=5, threshold:float=0.1):
-    initialize(agent)
-    docs = db.search_similarity_threshold(query,count,threshold) # type: ignore
+def search(agent:Agent, query:str, count:int=5, threshold:float=0.1, mode:str="", scope:str="", tags:Any="", recent_days:float=0):
+    docs = search_documents(agent, query, count, threshold, mode, scope, tags, recent_days)
     if len(docs)==0: return files.read_file("./prompts/fw.memories_not_found.md", query=query)
     else: return str(docs)
 
-def save(agent:Agent, text:str):
-    initialize(agent)
-    id = db.insert_document(text) # type: ignore
+def search_multi(agent:Agent, queries:list[str], count:int=5, threshold:float=0.1):
+    # one search per query, hits are merged by reciprocal-rank fusion
+    rankings = [search_documents(agent, query, count, threshold) for query in queries]
+    by_id = {doc.metadata.get("id", doc.page_content): doc for docs in rankings for doc in docs}
+    fused = rrf([[doc.metadata.get("id", doc.page_content) for doc in docs] for docs in rankings])
+    docs = [by_id[id] for id, _ in fused[:count]]
+    if len(docs)==0: return files.read_file("./prompts/fw.memories_not_found.md", query=" | ".join(queries))
+    else: return str(docs)
+
+def search_documents(agent:Agent, query:str, count:int=5, threshold:float=0.1, mode:str="", scope:str="", tags:Any="", recent_days:float=0) -> list[Document]:
+    # mode is "hybrid" (vector + keyword), "vector" or "keyword" (no embedding call)
+    db = initialize(agent)
+    mode = mode or agent.config.memory_search_mode
+    filter = build_filter(agent, scope or agent.config.memory_search_scope, tags, recent_days)
+    with tracing.span("memory_search", agent, count=count, threshold=threshold, mode=mode, filtered=filter is not None) as span:
+        docs = db.search_hybrid(query,count,threshold,mode,filter,agent.config.memory_decay_half_life_days)
+        span.set(results=len(docs))
+    return docs
+
+def build_filter(agent:Agent, scope:str="all", tags:Any="", recent_days:float=0):
+    # scope "session" is this conversation and its subordinates, "agent" only this agent's own memories in it
+    return memory_metadata.where(
+        session=agent.context.session_id if scope in ("session", "agent") else "",
+        agent=agent.number if scope == "agent" else None,
+        tags=tags,
+        since=time.time() - recent_days * memory_metadata.DAY if recent_days > 0 else 0)
+
+def save(agent:Agent, text:str, tool:str="memory_tool", tags:Any=""):
+    db = initialize(agent)
+    mode = agent.config.memory_dedup_mode
+    metadata = memory_metadata.build(agent, tool, tags)
+
+    # near-duplicates of an existing memory are skipped or merged into it instead of piling up,
+    # defer leaves merging to the background consolidation so saving never waits for the utility model
+    if mode in ("skip", "merge", "defer"):
+        similar = db.search_similarity_scored(text, 1)
+        if similar and similar[0][1] >= agent.config.memory_dedup_threshold:
+            doc = similar[0][0]
+            existing = doc.metadata["id"]
+            if mode == "skip" or doc.page_content.strip() == text.strip():
+                return files.read_file("./prompts/fw.memory_duplicate.md", memory_id=existing)
+            merged = memory_consolidation.merge(agent, [doc.page_content, text]) if mode == "merge" else ""
+            if merged:
+                metadata = memory_metadata.merged(agent, tool, [doc.metadata, metadata])
+                id = db.replace_documents([existing], merged, metadata)
+                memory_consolidation.schedule(agent, db)
+                return files.read_file("./prompts/fw.memory_merged.md", memory_id=id, replaced_id=existing)
+
+    id = db.insert_document(text, metadata)
+    memory_consolidation.schedule(agent, db)
     return files.read_file("./prompts/fw.memory_saved.md", memory_id=id)
 
 def delete(agent:Agent, ids_str:str):
-    initialize(agent)
+    db = initialize(agent)
     ids = extract_guids(ids_str)
-    deleted = db.delete_documents_by_ids(ids) # type: ignore
+    deleted = db.delete_documents_by_ids(ids)
     return files.read_file("./prompts/fw.memories_deleted.md", memory_count=deleted)    
 
-def forget(agent:Agent, query:str):
-    initialize(agent)
-    deleted = db.delete_documents_by_query(query) # type: ignore
-    return files.read_file("./prompts/fw.memories_deleted.md", memory_count=deleted)
+def forget(agent:Agent, query:str, threshold:float=0.1, dry_run:bool=False):
+    db = initialize(agent)
+    result = db.forget(query, threshold, dry_run=dry_run)
+    if dry_run:
+        previews = "\n".join(f"{id}: {preview}" for id, preview in zip(result["ids"], result["previews"]))
+        return files.read_file("./prompts/fw.memories_forget_preview.md", memory_count=result["matched"], memories=previews)
+    return files.read_file("./prompts/fw.memories_deleted.md", memory_count=result["deleted"])
 
 def initialize(agent:Agent):
-    global db
-    if not db:
-        dir = os.path.join("memory",agent.config.memory_subdir)
-        db = VectorDB(embeddings_model=agent.config.embeddings_model, in_memory=False, cache_dir=dir)
+    key = (agent.config.memory_backend, agent.context.get_memory_dir())
+    with dbs_lock:
+        if key not in dbs:
+            # backends are imported on demand, the numpy one does not pull in chromadb
+            if key[0] == "numpy":
+                from python.helpers.numpy_vector_db import NumpyVectorDB as VectorDB
+            else:
+                from python.helpers.vector_db import VectorDB
+            dbs[key] = VectorDB(embeddings_model=agent.config.embeddings_model, in_memory=False, cache_dir=key[1])
+        return dbs[key]
 
 def extract_guids(text):
     pattern = r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}-[0-9a-fA-F]{12}\b'
@@ -0,0 +1,23 @@
+import pytest
+from python.helpers import artifacts
+from python.helpers.execution_context import ExecutionContext
+
+def test_artifacts_stay_out_of_work_dir():
+    context = ExecutionContext(work_dir="/work", memory_subdir="project")
+    assert not context.get_artifacts_dir().startswith("/work")
+    assert artifacts.get_store(context.get_artifacts_dir()) is artifacts.get_store(context.get_artifacts_dir())
+
+def test_same_content_is_stored_once_and_paged(tmp_path):
+    store = artifacts.ArtifactStore(str(tmp_path))
+    text = "\n".join(f"line {i}" for i in range(1, 11))
+    first, second = store.put(text), store.put(text)
+    assert first.id == second.id and (first.lines, first.chars) == (10, len(text))
+    assert len(list(tmp_path.iterdir())) == 1
+    page, next_line = store.read_lines(first.id, 3, max_chars=14)
+    assert (page, next_line) == ("line 3\nline 4", 5)
+    assert store.read_lines(first.id, 9)[1] == 0
+
+def test_invalid_id_is_rejected(tmp_path):
+    store = artifacts.ArtifactStore(str(tmp_path))
+    assert not store.exists("../../etc/passwd")
+    with pytest.raises(ValueError): store.path("../x")
@@ -0,0 +1,37 @@
+from python.helpers.execution_context import ExecutionContext
+
+class FakeShell:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_set_work_dir_releases_shells_and_updates_children():
+    root = ExecutionContext(work_dir="/a")
+    child = root.derive("sub")
+    root_shell = root.lease_shell(FakeShell)
+    child_shell = child.lease_shell(FakeShell)
+
+    root.set_work_dir("/b")
+
+    assert root.work_dir == child.work_dir == "/b"
+    assert root_shell.closed and child_shell.closed
+    assert root.shell is None and child.shell is None
+    assert root.lease_shell(FakeShell) is not root_shell
+
+def test_close_releases_all_derived_shells():
+    root = ExecutionContext(work_dir="/a")
+    grandchild = root.derive("sub").derive("sub2")
+    shell = grandchild.lease_shell(FakeShell)
+    root.close()
+    assert shell.closed
+    assert root.children == []
+
+def test_drop_closes_only_the_dropped_context():
+    root = ExecutionContext(work_dir="/a")
+    old, kept = root.derive("old"), root.derive("kept")
+    old_shell, kept_shell = old.lease_shell(FakeShell), kept.lease_shell(FakeShell)
+    root.drop(old)
+    assert old_shell.closed and not kept_shell.closed
+    assert root.children == [kept]
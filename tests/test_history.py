@@ -0,0 +1,37 @@
+import pytest
+from python.helpers.history import SEPARATOR, Entry, History, concat
+
+def test_chars_follow_appends_and_merges():
+    h = History()
+    h.append("human", "hello")
+    h.append("human", "again")
+    h.append("ai", "hi there")
+    assert len(h) == 2
+    assert h[0].content == "hello" + SEPARATOR + "again"
+    assert h.chars == sum(len(e.content) for e in h) == 10 + len(SEPARATOR) + 8
+    assert h.tokens == int(h.chars / 4)
+
+def test_chars_of_rebuilt_history():
+    h = History([Entry("human", "a" * 10), Entry("ai", "b" * 6)])
+    assert h.chars == 16
+    rebuilt = History(h[:1] + [Entry("ai", "summary")])
+    assert rebuilt.chars == 17
+
+def test_reading_content_keeps_length():
+    entry = Entry("ai", "one")
+    entry.add("two")
+    assert entry.content == "one" + SEPARATOR + "two"
+    assert entry.segments == [entry.content] and len(entry) == len(entry.content)
+    entry.add("three")
+    assert len(entry) == len(entry.content)
+
+def test_concat_lists_entries():
+    assert concat([Entry("human", "q"), Entry("ai", "a")]) == "human: q\nai: a"
+
+def test_messages_are_cached_until_changed():
+    pytest.importorskip("langchain_core")
+    entry = Entry("human", "q")
+    message = entry.to_message()
+    assert entry.to_message() is message and message.content == "q"
+    entry.add("more")
+    assert entry.to_message() is not message
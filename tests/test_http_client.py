@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip("requests")
+from python.helpers import http_client
+
+def test_post_is_never_retried():
+    retry = http_client.get_session().get_adapter("https://example.com").max_retries
+    assert retry.is_retry("GET", 503)
+    assert not retry.is_retry("POST", 503)
+
+def test_httpx_pool_uses_pool_size(monkeypatch):
+    pytest.importorskip("httpx")
+    monkeypatch.setattr(http_client, "httpx_client", None)
+    pool = http_client.get_httpx_client()._transport._pool
+    assert pool._max_connections == http_client.POOL_SIZE
+    assert pool._max_keepalive_connections == http_client.POOL_SIZE
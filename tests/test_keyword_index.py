@@ -0,0 +1,52 @@
+import sqlite3
+import pytest
+from python.helpers import keyword_index
+from python.helpers.keyword_index import KeywordIndex, query_terms, rrf
+
+def test_query_terms_drop_stop_words_and_short_words():
+    assert query_terms("What is the error E5 in foo.py?") == ["error", "e5", "foo.py"]
+    assert query_terms("is it on") == []
+
+def test_rrf_prefers_ids_ranked_by_both_lists():
+    fused = [id for id, _ in rrf([["a", "b", "c"], ["b", "d"]])]
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+
+@pytest.fixture(params=[True, False], ids=["fts5", "plain"])
+def index(request, tmp_path, monkeypatch):
+    if not request.param:
+        # simulates sqlite built without FTS5
+        real_connect = sqlite3.connect
+        class NoFts:
+            def __init__(self, conn): self.conn = conn
+            def execute(self, sql, *args):
+                if "fts5" in sql: raise sqlite3.OperationalError("no such module: fts5")
+                return self.conn.execute(sql, *args)
+            def __getattr__(self, name): return getattr(self.conn, name)
+        monkeypatch.setattr(keyword_index.sqlite3, "connect", lambda *a, **k: NoFts(real_connect(*a, **k)))
+    index = KeywordIndex(str(tmp_path / "keywords.db"))
+    assert index.fts == request.param
+    index.add([("1", "Docker container fails with exit code 137 out of memory"),
+               ("2", "The docker image was rebuilt"),
+               ("3", "Notes about the weather in the city")])
+    return index
+
+def test_hits_need_two_matched_terms(index):
+    assert [id for id, _ in index.search("docker exit code 137")] == ["1"]
+
+def test_single_term_query_needs_one_match(index):
+    assert {id for id, _ in index.search("docker")} == {"1", "2"}
+
+def test_stop_words_alone_match_nothing(index):
+    assert index.search("what is the in of") == []
+
+def test_delete_removes_hits(index):
+    index.delete(["1", "2"])
+    assert index.search("docker") == []
+    assert index.count() == 1
+
+def test_sync_rebuilds_only_when_ids_differ(index):
+    assert not index.sync(["1", "2", "3"], lambda: pytest.fail("loaded although in sync"))
+    assert index.sync(["4"], lambda: [("4", "docker exit code 137 again")])
+    assert index.count() == 1
+    assert [id for id, _ in index.search("docker exit code")] == ["4"]
@@ -0,0 +1,26 @@
+from python.helpers.knowledge_packing import Snippet, dedupe, pack
+
+def snippet(source, words, score, **kwargs):
+    return Snippet(source=source, text=" ".join(["word"] * words), score=score, **kwargs)
+
+def test_pack_keeps_best_snippets_within_budget():
+    snippets = [snippet("a", 40, 0.9), snippet("b", 40, 0.5), snippet("c", 10, 0.1)]
+    packed = pack(snippets, max_tokens=70)
+    assert [s.source for s in packed] == ["a", "c"]
+    assert sum(s.tokens for s in packed) <= 70
+
+def test_snippet_larger_than_budget_is_truncated_not_dropped():
+    long_answer = snippet("perplexity", 2000, 0.9, title="answer", url="https://example.com")
+    packed = pack([long_answer, snippet("ddg", 10, 0.5)], max_tokens=200)
+    assert packed[0].source == "perplexity"
+    assert packed[0].text.endswith(" ...")
+    assert sum(s.tokens for s in packed) <= 200
+    assert long_answer.text.count("word") == 2000  # the original is left untouched
+
+def test_only_one_oversized_snippet_is_truncated():
+    packed = pack([snippet("a", 2000, 0.9), snippet("b", 2000, 0.8)], max_tokens=300)
+    assert [s.source for s in packed] == ["a"]
+
+def test_dedupe_drops_exact_copies():
+    kept = dedupe([Snippet("a", "Same text!", score=0.2), Snippet("b", "same text", score=0.9)], [])
+    assert [s.source for s in kept] == ["b"]
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from python.helpers import memory_consolidation, memory_metadata
+
+def items(vectors):
+    return [(str(i), f"memory {i}", vector, {"tags": f"t{i}"}) for i, vector in enumerate(vectors)]
+
+def test_blocked_clusters_match_full_matrix():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(5, 16))
+    vectors = [list(centers[i % 5] + rng.normal(scale=0.05, size=16)) for i in range(40)]
+    full = memory_consolidation.cluster(items(vectors), 0.9, block=len(vectors))
+    blocked = memory_consolidation.cluster(items(vectors), 0.9, block=7)
+    assert blocked == full and len(full) == 5
+
+def test_relevance_uses_chroma_scale():
+    assert memory_consolidation.relevance(np.array([1.0, 0.9]))[0] == 1.0
+    assert memory_consolidation.relevance(np.array([0.9]))[0] == pytest.approx(1 - 0.2 / np.sqrt(2))
+
+def test_merged_memory_keeps_oldest_timestamp_and_session():
+    agent = SimpleNamespace(number=0, context=SimpleNamespace(session_id="now"))
+    metadata = memory_metadata.merged(agent, "memory_consolidation", [
+        {"timestamp": 200.0, "session": "b", "tags": "x"},
+        {"timestamp": 100.0, "session": "a", "tags": "y"}])
+    assert (metadata["timestamp"], metadata["session"], metadata["tags"]) == (100.0, "a", "x,y")
+    assert memory_metadata.merged(agent, "", [{}])["session"] == "now"
@@ -0,0 +1,65 @@
+import pytest
+from python.helpers.model_router import ModelRouter, is_low_confidence
+
+def router(**kwargs) -> ModelRouter:
+    return ModelRouter("cheap-model", "expensive-model", **kwargs)
+
+def step(r: ModelRouter, *signals: str) -> str:
+    route, _ = r.select()
+    for kind in signals: r.signal(kind)
+    r.end_step()
+    return route
+
+def test_repeat_escalates_immediately():
+    r = router(escalate_after=3)
+    step(r, "repeat")
+    assert r.select() == ("expensive", "expensive-model")
+
+def test_other_signals_escalate_after_count():
+    r = router(escalate_after=2)
+    step(r, "misformat")
+    assert r.route == "cheap"
+    step(r, "tool_error")
+    assert r.route == "expensive"
+
+def test_clean_step_resets_failure_count():
+    r = router(escalate_after=2)
+    step(r, "misformat")
+    step(r)
+    step(r, "misformat")
+    assert r.route == "cheap"
+
+def test_deescalates_after_clean_steps():
+    r = router(escalate_after=1, deescalate_after=2)
+    step(r, "error")
+    assert [step(r), step(r), step(r)] == ["expensive", "expensive", "cheap"]
+    # a signal on the expensive route restarts the count
+    r = router(escalate_after=1, deescalate_after=2)
+    step(r, "error")
+    step(r)
+    step(r, "misformat")
+    step(r)
+    assert r.route == "expensive"
+
+def test_cost_and_tokens_per_dollar():
+    r = router(prices={"gpt-big": (10.0, 30.0)})
+    r.record("expensive", "gpt-big", 100_000, 10_000, 2000, 400)
+    r.record("expensive", "gpt-big", 100_000, 10_000, 1000, 200)
+    r.record("cheap", "unpriced", 5000, 500, 100)
+    stats = r.get_stats()
+    assert stats["expensive"]["cost"] == pytest.approx(2 * (1.0 + 0.3))
+    assert stats["expensive"]["tokens_per_dollar"] == round(220_000 / 2.6)
+    assert (stats["expensive"]["mean_ms"], stats["expensive"]["mean_first_token_ms"]) == (1500.0, 300.0)
+    assert stats["cheap"]["cost"] == 0 and stats["cheap"]["tokens_per_dollar"] is None
+
+def test_signals_are_counted_per_route():
+    r = router(escalate_after=1)
+    step(r, "low_confidence")
+    step(r, "tool_error")
+    stats = r.get_stats()
+    assert stats["cheap"]["signals"] == {"low_confidence": 1}
+    assert stats["expensive"]["signals"] == {"tool_error": 1}
+
+def test_low_confidence_phrases():
+    assert is_low_confidence("Honestly, I'm not sure which file it is.")
+    assert not is_low_confidence("The file is config.json.")
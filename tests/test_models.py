@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("dotenv")
+import models
+
+@pytest.fixture(autouse=True)
+def fake_providers(monkeypatch):
+    # client objects that only remember their arguments, no SDK is imported
+    monkeypatch.setattr(models, "provider", lambda name: lambda **kwargs: SimpleNamespace(provider=name, **kwargs))
+    monkeypatch.setattr(models, "model_cache", {})
+    monkeypatch.setenv("API_KEY_OPENAI", "key-1")
+    monkeypatch.setenv("API_KEY_OPENAI_AZURE", "azure-key")
+
+def test_identical_arguments_share_one_instance():
+    assert models.get_openai_chat("gpt-4o") is models.get_openai_chat("gpt-4o", temperature=models.DEFAULT_TEMPERATURE)
+    assert models.get_lmstudio_chat("local") is models.get_lmstudio_chat(model_name="local")
+
+def test_other_arguments_get_a_new_instance():
+    chat = models.get_openai_chat("gpt-4o")
+    assert models.get_openai_chat("gpt-4o", temperature=0.7) is not chat
+    local = models.get_lmstudio_chat("local")
+    assert models.get_lmstudio_chat("local", base_url="http://other:1234/v1") is not local
+
+def test_api_key_is_part_of_the_key_as_hash(monkeypatch):
+    chat = models.get_openai_chat("gpt-4o")
+    monkeypatch.setenv("API_KEY_OPENAI", "key-2")
+    assert models.get_openai_chat("gpt-4o") is not chat
+    assert models.get_openai_chat("gpt-4o", api_key="key-1") is chat
+    assert not any("key-1" in repr(key) for key in models.model_cache)
+
+def test_invalidate_normalises_the_service_name(monkeypatch):
+    monkeypatch.setattr(models, "load_dotenv", lambda *args, **kwargs: None)
+    azure = models.get_azure_openai_chat("deployment", azure_endpoint="https://example.azure.com")
+    openai = models.get_openai_chat("gpt-4o")
+    assert models.invalidate("Azure OpenAI") == 1
+    assert models.get_openai_chat("gpt-4o") is openai
+    assert models.get_azure_openai_chat("deployment", azure_endpoint="https://example.azure.com") is not azure
+    assert models.invalidate() == 2
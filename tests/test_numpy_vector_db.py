@@ -0,0 +1,72 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+from python.helpers.numpy_vector_db import NumpyVectorDB
+
+class Embeddings:
+    # one axis per known word, enough to tell documents apart
+    words = ["docker", "python", "weather", "memory"]
+    def embed_documents(self, texts): return [self.embed_query(t) for t in texts]
+    def embed_query(self, text): return [float(w in text.lower()) + 0.01 for w in self.words]
+
+def open_db(tmp_path):
+    return NumpyVectorDB(Embeddings(), cache_dir=str(tmp_path))
+
+def test_reload_keeps_documents(tmp_path):
+    db = open_db(tmp_path)
+    first = db.insert_document("docker notes")
+    db.insert_document("python notes")
+    db.delete_documents_by_ids([first])
+    db = open_db(tmp_path)
+    assert [doc.page_content for doc in db.search_similarity("python")] == ["python notes"]
+
+def test_reload_drops_document_without_vector(tmp_path):
+    db = open_db(tmp_path)
+    db.insert_document("docker notes")
+    # crash after the log record, before the vector
+    db._append_log({"id": "lost", "text": "python notes", "metadata": {"id": "lost"}})
+    db = open_db(tmp_path)
+    assert db.ids == [db.ids[0]] and "lost" not in db.rows
+    assert os.path.getsize(db.vectors_path) == db.dim * 4
+    db.insert_document("weather notes")
+    assert db.search_similarity("weather", 1)[0].page_content == "weather notes"
+    assert len(open_db(tmp_path).ids) == 2
+
+def test_reload_cuts_partial_vector(tmp_path):
+    db = open_db(tmp_path)
+    db.insert_document("docker notes")
+    with open(db.vectors_path, "ab") as f: f.write(b"\0" * 6)
+    db = open_db(tmp_path)
+    assert os.path.getsize(db.vectors_path) == db.dim * 4
+    assert db.search_similarity("docker", 1)[0].page_content == "docker notes"
+
+def test_compact_switches_generation(tmp_path):
+    db = open_db(tmp_path)
+    ids = [db.insert_document(text) for text in ["docker notes", "python notes", "weather notes"]]
+    db.delete_documents_by_ids(ids[:2])  # over the compaction ratio
+    db = open_db(tmp_path)
+    assert db.generation == 1 and db.ids == ids[2:]
+    assert sorted(os.listdir(db.dir)) == ["documents.1.jsonl", "keywords.db", "meta.json", "vectors.1.f32"]
+
+def test_relevance_matches_chroma_scale():
+    assert NumpyVectorDB.relevance(np.array([0.9]))[0] == pytest.approx(1 - 0.2 / np.sqrt(2))
+
+def test_stale_keyword_index_is_rebuilt(tmp_path):
+    db = open_db(tmp_path)
+    id = db.insert_document("docker container notes")
+    # ids of another store, as left by the shared index of earlier versions
+    db.keywords.delete([id])
+    db.keywords.add([("other", "docker container notes from chroma")])
+    db = open_db(tmp_path)
+    assert [doc.metadata["id"] for doc in db.search_keyword("docker container")] == [id]
+
+def test_backends_keep_separate_keyword_indexes(tmp_path):
+    vector_db = pytest.importorskip("python.helpers.vector_db")
+    numpy_db = open_db(tmp_path)
+    numpy_id = numpy_db.insert_document("docker container notes")
+    chroma_db = vector_db.VectorDB(Embeddings(), cache_dir=str(tmp_path))
+    chroma_id = chroma_db.insert_document("python package notes")
+    assert [doc.metadata["id"] for doc in chroma_db.search_keyword("python package")] == [chroma_id]
+    assert [doc.metadata["id"] for doc in open_db(tmp_path).search_keyword("docker container")] == [numpy_id]
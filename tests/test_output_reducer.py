@@ -0,0 +1,40 @@
+import pytest
+from python.helpers import output_reducer
+from python.helpers.artifacts import ArtifactStore
+from python.helpers.output_reducer import Reduction, compose, dedupe_lines, reduce
+
+def test_identical_lines_collapse_into_one():
+    retry = "connection refused, retrying in a moment"
+    r = Reduction(raw="", text="\n".join(["start", retry, retry, retry, "end"]), max_chars=100)
+    dedupe_lines(r)
+    assert r.text == f"start\n{retry}\n    [previous line repeated 2 more times]\nend"
+
+def test_numbered_lines_keep_first_and_last():
+    r = Reduction(raw="", text="\n".join(f"line {i}" for i in range(80)), max_chars=100)
+    dedupe_lines(r)
+    assert r.text == "line 0\n    [78 similar lines omitted]\nline 79"
+
+def test_two_different_lines_are_kept():
+    r = Reduction(raw="", text="step 1\nstep 2", max_chars=100)
+    dedupe_lines(r)
+    assert r.text == "step 1\nstep 2" and "dedupe" not in r.steps
+
+@pytest.mark.parametrize("length", [2900, 2990, 3000, 3100, 10000])
+def test_compose_stays_within_max_chars(length):
+    ref = "[full output stored as artifact 0123456789abcdef (1 lines, 10000 characters), read it by line ranges with artifact_tool]"
+    r = Reduction(raw="x" * 10000, text="x" * length, max_chars=3000)
+    assert len(compose(r, ref)) <= 3000
+
+def test_notice_omits_empty_summary():
+    text = compose(Reduction(raw="", text="x" * 5000, max_chars=3000), "")
+    assert "Summary" not in text
+    text = compose(Reduction(raw="", text="x" * 5000, max_chars=3000, summary="all good"), "")
+    assert "Summary: all good" in text and len(text) <= 3000
+
+def test_reduce_keeps_traceback_and_stores_raw(tmp_path):
+    raw = "\n".join(f"progress {i}%" for i in range(2000)) + "\nTraceback (most recent call last):\n  File \"x.py\", line 1\nValueError: bad"
+    store = ArtifactStore(str(tmp_path))
+    r = reduce(raw, 1000, store)
+    assert len(r.text) <= 1000
+    assert "ValueError: bad" in r.text and r.artifact_id in r.text
+    assert store.read_lines(r.artifact_id, 1, 100000)[0] == raw
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.messages import AIMessage, HumanMessage
+from python.helpers import prompt_cache
+
+class ChatAnthropic: pass
+class ChatOpenAI: pass
+
+def test_anthropic_breakpoints_on_system_and_last_history_message():
+    history = [HumanMessage(content="question"), AIMessage(content="answer")]
+    system, messages = prompt_cache.build(ChatAnthropic(), "system prompt", history, "memories")
+    assert system.content == [{"type": "text", "text": "system prompt", "cache_control": {"type": "ephemeral"}}]
+    assert messages[0] is history[0]
+    assert isinstance(messages[1], AIMessage)
+    assert messages[1].content == [{"type": "text", "text": "answer", "cache_control": {"type": "ephemeral"}}]
+    # the history itself is not changed, the dynamic part comes last and is never cached
+    assert history[1].content == "answer"
+    assert messages[2].content == "memories" and len(messages) == 3
+
+def test_openai_prompt_is_left_plain():
+    history = [HumanMessage(content="question")]
+    system, messages = prompt_cache.build(ChatOpenAI(), "system prompt", history)
+    assert system.content == "system prompt"
+    assert messages == history
+
+def test_openai_cached_tokens():
+    chunk = SimpleNamespace(response_metadata={"token_usage": {"prompt_tokens": 1200, "prompt_tokens_details": {"cached_tokens": 1024}}})
+    assert prompt_cache.usage(chunk) == {"input_tokens": 1200, "cached_tokens": 1024, "cache_write_tokens": 0}
+
+def test_anthropic_cache_reads_and_writes():
+    chunk = SimpleNamespace(response_metadata={"usage": {"input_tokens": 50, "cache_read_input_tokens": 3000,
+                                                          "cache_creation_input_tokens": 200}})
+    assert prompt_cache.usage(chunk) == {"input_tokens": 50, "cached_tokens": 3000, "cache_write_tokens": 200}
+
+def test_usage_metadata_wins_and_chunks_are_merged():
+    first = SimpleNamespace(usage_metadata={"input_tokens": 900, "input_token_details": {"cache_read": 800}})
+    last = SimpleNamespace(response_metadata={"usage": {"cache_creation_input_tokens": 100}})
+    assert prompt_cache.merge_usage([first, SimpleNamespace(), last]) == {"input_tokens": 900, "cached_tokens": 800, "cache_write_tokens": 100}
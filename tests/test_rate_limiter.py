@@ -0,0 +1,22 @@
+import threading
+import pytest
+
+pytest.importorskip("webcolors")
+from python.helpers.rate_limiter import RateLimiter
+
+def test_output_tokens_go_to_the_given_call():
+    limiter = RateLimiter(max_calls=0, max_input_tokens=0, max_output_tokens=0)
+    first = limiter.limit_call_and_input(10)
+    second = limiter.limit_call_and_input(20)
+    limiter.set_output_tokens(5, first)
+    assert (first.output_tokens, second.output_tokens) == (5, 0)
+    assert limiter.get_total_tokens() == 35
+
+def test_concurrent_calls_never_exceed_max_calls():
+    limiter = RateLimiter(max_calls=3, max_input_tokens=0, max_output_tokens=0, window_seconds=60)
+    taken = []
+    threads = [threading.Thread(target=lambda: taken.append(limiter.limit_call_and_input(1)), daemon=True) for _ in range(5)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join(0.3)
+    # the other two wait for the window to pass
+    assert len(taken) == 3 and len(limiter.call_records) == 3
@@ -0,0 +1,66 @@
+import time
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.messages import HumanMessage
+from python.helpers.replay_llm import (RecordingChatModel, RecordingEmbeddings, ReplayChatModel, ReplayEmbeddings,
+                                       ReplaySession, SessionRecorder)
+
+class FakeChat:
+    # streams scripted answers per prompt, sleeping before a chunk when asked to
+    def __init__(self, answers):
+        self.answers = answers
+    def stream(self, messages, stop=None, **kwargs):
+        for step in self.answers[messages[-1].content].pop(0):
+            if isinstance(step, float): time.sleep(step)
+            else: yield step
+
+class FakeEmbeddings:
+    def embed_documents(self, texts): return [self.embed_query(t) for t in texts]
+    def embed_query(self, text): return [float(len(text)), 0.5, -1.0]
+
+def stream(model, prompt):
+    return [chunk.content for chunk in model.stream([HumanMessage(content=prompt)])]
+
+@pytest.fixture
+def session_path(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    recorder = SessionRecorder(path)
+    chat = RecordingChatModel(model=FakeChat({"hello": [["Hel", 0.1, "lo"], ["second ", "answer"]], "bye": [["see ", "you"]]}), recorder=recorder)
+    assert stream(chat, "hello") == ["Hel", "lo"]
+    assert stream(chat, "hello") == ["second ", "answer"]
+    assert stream(chat, "bye") == ["see ", "you"]
+    embeddings = RecordingEmbeddings(FakeEmbeddings(), recorder)
+    embeddings.embed_documents(["memory one", "memory"])
+    return path
+
+def test_replay_is_deterministic(session_path):
+    runs = []
+    for _ in range(2):
+        model = ReplayChatModel(session=ReplaySession(session_path))
+        runs.append([stream(model, "hello"), stream(model, "hello"), stream(model, "bye"), stream(model, "hello")])
+    assert runs[0] == runs[1]
+    # identical prompts replay in recorded order, the last answer repeats
+    assert runs[0] == [["Hel", "lo"], ["second ", "answer"], ["see ", "you"], ["second ", "answer"]]
+
+def test_full_speed_and_recorded_latency(session_path):
+    start = time.perf_counter()
+    stream(ReplayChatModel(session=ReplaySession(session_path)), "hello")
+    assert time.perf_counter() - start < 0.05
+    start = time.perf_counter()
+    stream(ReplayChatModel(session=ReplaySession(session_path), realtime=True), "hello")
+    assert time.perf_counter() - start >= 0.09
+
+def test_unrecorded_prompt(session_path):
+    # lenient sessions answer with the next unused recording, strict ones refuse
+    assert stream(ReplayChatModel(session=ReplaySession(session_path)), "unknown") == ["Hel", "lo"]
+    with pytest.raises(KeyError):
+        stream(ReplayChatModel(session=ReplaySession(session_path, strict=True)), "unknown")
+
+def test_embeddings_round_trip(session_path):
+    embeddings = ReplayEmbeddings(ReplaySession(session_path), dimensions=3)
+    assert embeddings.embed_documents(["memory one", "memory"]) == [[10.0, 0.5, -1.0], [6.0, 0.5, -1.0]]
+    unknown = embeddings.embed_query("never recorded")
+    assert unknown == embeddings.embed_query("never recorded") and sum(v * v for v in unknown) == pytest.approx(1.0)
+    with pytest.raises(KeyError):
+        ReplayEmbeddings(ReplaySession(session_path)).embed_query("never recorded")
@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+import pytest
+from python.helpers.resilient_stream import ResilientStream, StreamTimeout
+
+class ApiError(Exception):
+    def __init__(self, status_code: int, retry_after: str = ""):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers={"retry-after": retry_after} if retry_after else {})
+
+class Limiter:
+    def __init__(self): self.calls = []
+    def limit_call_and_input(self, tokens):
+        self.calls.append(SimpleNamespace(input_tokens=tokens))
+        return self.calls[-1]
+
+def source(*steps):
+    # steps are text chunks, seconds to sleep or exceptions to raise
+    def start():
+        for step in steps:
+            if isinstance(step, Exception): raise step
+            if isinstance(step, float): time.sleep(step)
+            else: yield step
+    return start
+
+def attempts(*sources):
+    calls = []
+    def start():
+        calls.append(len(calls))
+        return sources[len(calls) - 1]()
+    return start, calls
+
+def test_first_token_timeout_is_retried_on_a_new_call():
+    limiter = Limiter()
+    first = object()
+    stream = ResilientStream(first_token_timeout=0.1, max_retries=1, backoff=0, rate_limiter=limiter)
+    primary, calls = attempts(source(1.0, "late"), source("on ", "time"))
+    assert "".join(stream.stream(primary, input_tokens=7, call=first)) == "on time"
+    assert len(calls) == 2
+    # output tokens go to the record of the attempt that answered
+    assert stream.last_call is limiter.calls[0] and limiter.calls[0].input_tokens == 7
+
+def test_timeout_after_last_retry_is_raised():
+    stream = ResilientStream(first_token_timeout=0.05, max_retries=0)
+    with pytest.raises(StreamTimeout):
+        list(stream.stream(source(1.0, "late")))
+
+def test_rate_limit_waits_for_retry_after():
+    stream = ResilientStream(max_retries=1, backoff=0)
+    delays = []
+    delay = stream.delay
+    stream.delay = lambda attempt, e: delays.append(delay(attempt, e)) or 0
+    primary, calls = attempts(source(ApiError(429, "2.5")), source("ok"))
+    assert "".join(stream.stream(primary)) == "ok"
+    assert delays == [2.5] and len(calls) == 2
+
+def test_client_errors_are_not_retried():
+    primary, calls = attempts(source(ApiError(400)), source("ok"))
+    with pytest.raises(ApiError):
+        list(ResilientStream(max_retries=2, backoff=0).stream(primary))
+    assert len(calls) == 1
+
+def test_no_retry_once_text_was_emitted():
+    primary, calls = attempts(source("partial", ApiError(503)), source("again"))
+    received = []
+    with pytest.raises(ApiError):
+        for chunk in ResilientStream(max_retries=2, backoff=0).stream(primary): received.append(chunk)
+    assert received == ["partial"] and len(calls) == 1
+
+def hedged_stream(hedge_ms: float = 50) -> ResilientStream:
+    stream = ResilientStream(first_token_timeout=2, hedge_min_samples=1)
+    stream.first_token_ms.append(hedge_ms)
+    return stream
+
+def test_hedge_starts_after_hedge_after_and_wins():
+    stream = hedged_stream()
+    started = []
+    def secondary():
+        started.append(time.monotonic())
+        return source("fast")()
+    begin = time.monotonic()
+    assert "".join(stream.stream(source(1.0, "slow"), secondary)) == "fast"
+    assert stream.last_source == "secondary"
+    assert started and started[0] - begin >= 0.05
+    # timed from the secondary's own start, not from the primary's
+    assert stream.first_token_ms[-1] < 50
+
+def test_primary_error_while_hedge_runs():
+    stream = hedged_stream()
+    assert "".join(stream.stream(source(0.1, ApiError(500)), source(0.2, "hedged"))) == "hedged"
+    assert stream.last_source == "secondary"
+
+def test_no_hedge_without_enough_history():
+    stream = ResilientStream(first_token_timeout=2, hedge_min_samples=5)
+    assert "".join(stream.stream(source(0.1, "primary"), source("secondary"))) == "primary"
+    assert stream.last_source == "primary"
@@ -0,0 +1,15 @@
+from types import SimpleNamespace
+from python.helpers import response_cache
+from python.helpers.response_cache import ResponseCache
+
+def test_only_explicit_zero_temperature_is_cacheable():
+    assert response_cache.is_cacheable(SimpleNamespace(temperature=0))
+    assert not response_cache.is_cacheable(SimpleNamespace(temperature=0.7))
+    assert not response_cache.is_cacheable(SimpleNamespace(temperature=None))
+    assert not response_cache.is_cacheable(SimpleNamespace())
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.db")
+    key = ResponseCache.make_key("m", "system", "msg")
+    ResponseCache(db_path=path).put(key, "answer")
+    assert ResponseCache(db_path=path).get(key) == "answer"
@@ -0,0 +1,34 @@
+from python.helpers import search_cache
+from python.helpers.search_cache import SearchCache, dedupe_results, normalize_url
+
+def test_key_ignores_case_spacing_and_punctuation():
+    key = SearchCache.make_key("duckduckgo", "What is  Docker?")
+    assert SearchCache.make_key("duckduckgo", "what is docker") == key
+    assert SearchCache.make_key("perplexity", "what is docker") != key
+    assert SearchCache.make_key("duckduckgo", "what is docker", region="de-de") != key
+    assert SearchCache.make_key("duckduckgo", "what is docker", time_window="w") != key
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache = SearchCache(str(tmp_path / "search.db"), ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, "time", lambda: now[0])
+    cache.put("key", [{"title": "a"}])
+    now[0] += 60
+    assert cache.get("key") == [{"title": "a"}]
+    now[0] += 1
+    assert cache.get("key") is None
+
+def test_url_keeps_case_of_path_and_query():
+    assert normalize_url("HTTPS://WWW.Example.com/Foo/?q=A") == "example.com/Foo?q=A"
+    assert normalize_url("https://example.com/Foo") != normalize_url("https://example.com/foo")
+
+def test_dedupe_by_url_and_snippet():
+    results = [
+        {"href": "https://www.example.com/page/", "body": "Docker runs containers."},
+        {"href": "http://example.com/page", "body": "another snippet"},
+        {"href": "https://other.org/copy", "body": "docker runs containers"},
+        {"href": "https://example.com/Page", "body": ""},
+        {"href": "https://example.com/third", "body": ""},
+    ]
+    assert [r["href"] for r in dedupe_results(results)] == [
+        "https://www.example.com/page/", "https://example.com/Page", "https://example.com/third"]
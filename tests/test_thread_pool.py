@@ -0,0 +1,42 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from python.helpers import thread_pool
+
+def test_results_timeouts_and_failures_are_reported_separately():
+    def fail():
+        raise ValueError("boom")
+    futures = {
+        "fast": thread_pool.submit(lambda: "ok"),
+        "slow": thread_pool.submit(time.sleep, 0.5),
+        "broken": thread_pool.submit(fail),
+    }
+    done = thread_pool.wait_with_deadlines(futures, {"slow": 0.05}, default_timeout=2)
+    assert done.results == {"fast": "ok"}
+    assert set(done.timed_out) == {"slow"}
+    assert isinstance(done.failed["broken"], ValueError)
+
+def test_deadline_starts_when_the_task_starts(monkeypatch):
+    # one worker, queue time plus run time exceed the timeout, the run time alone does not
+    monkeypatch.setattr(thread_pool, "executor", ThreadPoolExecutor(max_workers=1))
+    thread_pool.submit(time.sleep, 0.15)
+    second = thread_pool.submit(lambda: time.sleep(0.1) or "ok")
+    done = thread_pool.wait_with_deadlines({"second": second}, {}, default_timeout=0.2)
+    assert done.results == {"second": "ok"}
+
+def test_queued_task_past_its_timeout_is_reported_as_not_started(monkeypatch):
+    monkeypatch.setattr(thread_pool, "executor", ThreadPoolExecutor(max_workers=1))
+    release = threading.Event()
+    blocker = thread_pool.submit(release.wait, 5)
+    queued = thread_pool.submit(lambda: "late")
+    done = thread_pool.wait_with_deadlines({"queued": queued}, {}, default_timeout=0.1)
+    release.set()
+    blocker.result()
+    assert "queued" in done.not_started and not done.timed_out
+    assert queued.cancelled()
+
+def test_quorum_abandons_the_rest():
+    futures = {"a": thread_pool.submit(lambda: 1), "b": thread_pool.submit(time.sleep, 0.3)}
+    done = thread_pool.wait_with_deadlines(futures, {}, default_timeout=2, quorum=1)
+    assert done.results == {"a": 1}
+    assert done.abandoned == ["b"]
@@ -0,0 +1,48 @@
+import threading
+from python.helpers import thread_pool, tracing
+
+class Recorder:
+    path = "memory"
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def flush(self):
+        pass
+
+def test_pool_work_gets_the_submitting_span_as_parent():
+    tracer = tracing.Tracer()
+    recorder = Recorder()
+    tracer.add_exporter(recorder)
+
+    def child():
+        with tracer.span("child") as span:
+            return span
+
+    with tracer.span("parent") as parent:
+        child_span = thread_pool.submit(child).result()
+    assert child_span.parent_id == parent.span_id
+    assert child_span.trace_id == parent.trace_id
+    assert tracer.current() is None
+
+def test_spans_on_other_threads_do_not_change_the_current_span():
+    tracer = tracing.Tracer()
+    opened, release = threading.Event(), threading.Event()
+
+    def other():
+        with tracer.span("other"):
+            opened.set()
+            release.wait(5)
+
+    with tracer.span("main") as main:
+        thread = threading.Thread(target=other)
+        thread.start()
+        opened.wait(5)
+        with tracer.span("nested") as nested:
+            assert nested.parent_id == main.span_id
+        release.set()
+        thread.join()
+        assert tracer.current() is main
@@ -1,4 +1,4 @@
-import requests
+from python.helpers import http_client
 
 SEARCH_URL = "https://api.duckduckgo.com/"
 session = None
@@ -6,14 +6,12 @@ session = None
 def activate():
     global session
     print("WebSearch tool activated")
-    session = requests.Session()
+    session = http_client.get_session()
 
 def deactivate():
     global session
     print("WebSearch tool deactivated")
-    if session:
-        session.close()
-        session = None
+    session = None  # the pooled session is shared, it stays open
 
 def execute(query, num_results=3):
     global session